@@ -1,840 +1,1477 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-
-# --- Nomes das Abas Esperadas no Arquivo ---
-SHEET_MAPA = "Mapa de Riscos"
-SHEET_PLANO = "Plano de Respostas"
-SHEET_INDICADORES = "1.1. Plano de Ação"
-
-# --- Nomes das Colunas (Programático) ---
-
-# Colunas dos arquivos de Risco (sem mudança)
-mapa_cols = [
-    'col_vazia', 'acao_estrategica', 'evento_risco', 'causas', 'consequencias',
-    'classificacao', 'gestor_risco', 'gp', 'gi', 'nivel_ri', 'avaliacao_ri',
-    'desc_controle', 'nivel_controle', 'avaliacao_controle_ac', 'nivel_rr',
-    'avaliacao_rr', 'resposta_risco', 'plano_resposta'
-]
-plano_cols = [
-    'col_vazia', 'acao_estrategica', 'evento_risco', 'causas', 'resposta',
-    'o_que', 'quando', 'onde', 'por_que', 'por_quem', 'como', 'custo'
-]
-# Colunas programáticas para '1.1. Plano de Ação' (28 colunas)
-indicadores_cols = [
-    'objetivo_estrategico', 'iniciativa', 'acao_estrategica', 'situacao_acao', 'responsavel_acao',  # A-E
-    'ind_titulo', 'ind_formula', 'ind_unidade', 'ind_sit_inicial', 'ind_valor', 'ind_parametro',  # F-K
-    'mes_01', 'mes_02', 'mes_03', 'mes_04', 'mes_05', 'mes_06',  # L-Q
-    'mes_07', 'mes_08', 'mes_09', 'mes_10', 'mes_11', 'mes_12',  # R-W
-    'ind_realizado',  # X (Unnamed: 23)
-    'ind_alcance_meta',  # Y (Unnamed: 24)
-    'ind_status_painel',  # Z (Para o cálculo no painel)
-    'unnamed_26', 'unnamed_27'  # AA-AB
-]
-
-# (ATUALIZADO) Constantes programáticas
-COL_OBJETIVO = "objetivo_estrategico"
-COL_INICIATIVA = "iniciativa"
-COL_ACAO = "acao_estrategica"
-COL_IND_TITULO = "ind_titulo"
-COL_IND_FORMULA = "ind_formula"
-COL_IND_UNIDADE = "ind_unidade"
-COL_IND_SIT_INICIAL = "ind_sit_inicial"
-COL_IND_VALOR = "ind_valor"
-COL_IND_PARAMETRO = "ind_parametro"
-# (NOVAS) Constantes para Monitoramento
-COL_IND_REALIZADO = "ind_realizado"
-COL_IND_ALCANCE = "ind_alcance_meta"
-COL_MESES = [f"mes_{i:02d}" for i in range(1, 13)]  # ['mes_01', 'mes_02', ...]
-
-# (ATUALIZADO) Lista de colunas que vamos extrair da aba de indicadores
-INDICADORES_COLS_REQUERIDAS = [
-                                  COL_OBJETIVO, COL_INICIATIVA, COL_ACAO,
-                                  COL_IND_TITULO, COL_IND_FORMULA, COL_IND_UNIDADE,
-                                  COL_IND_SIT_INICIAL, COL_IND_VALOR, COL_IND_PARAMETRO,
-                                  COL_IND_REALIZADO, COL_IND_ALCANCE  # <-- Adicionadas
-                              ] + COL_MESES  # <-- Adicionados os 12 meses
-
-# Colunas-chave que foram mescladas e precisarão de ffill()
-INDICADORES_COLS_FFILL = [COL_OBJETIVO, COL_INICIATIVA, COL_ACAO]
-
-# --- (ATUALIZADO) Dicionário de Nomes Amigáveis para Exibição ---
-FRIENDLY_NAMES = {
-    'acao_estrategica': 'Ação Estratégica',
-    'evento_risco': 'Evento de Risco',
-    'classificacao': 'Classificação',
-    'gestor_risco': 'Gestor de Risco',
-    'gp': 'Probabilidade (GP)',
-    'gi': 'Impacto (GI)',
-    'nivel_ri': 'Nível Risco Inerente (RI)',
-    'avaliacao_ri': 'Avaliação Risco Inerente',
-    'nivel_rr': 'Nível Risco Residual (RR)',
-    'avaliacao_rr': 'Avaliação Risco Residual',
-    'causas': 'Causas',
-    'consequencias': 'Consequências',
-    'desc_controle': 'Descrição dos Controles',
-    'nivel_controle': 'Nível do Controle',
-    'avaliacao_controle_ac': 'Avaliação do Controle Aceitável',
-    'resposta_risco': 'Resposta ao Risco',
-    'contagem': 'Contagem de Riscos',
-    'plano_resposta': 'Plano de Resposta',
-    'o_que': 'O Quê (Ação)', 'quando': 'Quando (Prazo)', 'onde': 'Onde (Local)',
-    'por_que': 'Por Quê (Justificativa)', 'por_quem': 'Por Quem (Responsável)',
-    'como': 'Como (Detalhamento)', 'custo': 'Custo Estimado',
-    # Nomes dos Indicadores
-    COL_OBJETIVO: 'Objetivo Estratégico',
-    COL_INICIATIVA: 'Iniciativa',
-    COL_ACAO: 'Ação Estratégica',
-    COL_IND_TITULO: 'Indicador (Título)',
-    COL_IND_FORMULA: 'Fórmula',
-    COL_IND_UNIDADE: 'Unidade de Medida',
-    COL_IND_SIT_INICIAL: 'Situação Inicial',
-    COL_IND_VALOR: 'Valor (Meta)',
-    COL_IND_PARAMETRO: 'Parâmetro',
-    # (NOVOS) Nomes do Monitoramento
-    COL_IND_REALIZADO: 'Realizado (Situação Atual)',
-    COL_IND_ALCANCE: 'Alcance da Meta (%)'
-}
-
-# --- Paletas de Cores e Categorias ---
-RISK_COLORS = {
-    'Inaceitável': '#D32F2F', 'Indesejável': '#F57C00',
-    'Gerenciável': '#FBC02D', 'Aceitável': '#388E3C'
-}
-CAT_AVALIACAO = ['Aceitável', 'Gerenciável', 'Indesejável', 'Inaceitável']
-CAT_IMPACTO_PROB = [1, 2, 3, 4]
-CONTROLES_PESOS = {
-    "INEXISTENTE": 1.0, "FRACO": 0.8, "MEDIANO": 0.6,
-    "SATISFATÓRIO": 0.4, "FORTE": 0.2
-}
-CONTROLES_NIVEIS = list(CONTROLES_PESOS.keys())
-
-
-# ==================================================================
-# FUNÇÕES AUXILIARES (CSS, KPIs, CARREGAMENTO DE DADOS)
-# ==================================================================
-
-def load_css():
-    """ Carrega CSS customizado para os KPIs e Cards de Indicadores. """
-    st.markdown("""
-        <style>
-        /* Estilo para os Cards de KPI */
-        .kpi-card {
-            background-color: #FFFFFF; border-radius: 8px; padding: 20px;
-            box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1); border: 1px solid #E0E0E0;
-            margin-bottom: 10px; height: 130px; /* (NOVO) Altura fixa */
-        }
-        .kpi-card h3 { 
-            font-size: 1.1rem; font-weight: 600; color: #4F4F4F; 
-            margin-bottom: 5px; height: 35px; /* (NOVO) Altura fixa */
-        }
-        .kpi-card h1 { 
-            font-size: 2.5rem; font-weight: 700; color: #0E6E52; 
-            margin: 0;
-        }
-
-        /* Cores de Alerta */
-        .kpi-card.inaceitavel h1 { color: #D32F2F; }
-
-        /* (NOVO) Cores de Monitoramento */
-        .kpi-card.neutral h1 { color: #003366; } /* Azul Marinho */
-        .kpi-card.alcance-bom h1 { color: #388E3C; } /* Verde Sucesso */
-        .kpi-card.alcance-ruim h1 { color: #D32F2F; } /* Vermelho Falha */
-
-        /* Deltas (da Visão Geral) */
-        .kpi-card .delta { font-size: 1rem; font-weight: 600; color: #388E3C; margin-top: 5px; }
-        .kpi-card .delta-negativo { color: #D32F2F; }
-
-        /* Card de Indicador (da Análise de Indicadores) */
-        .indicator-card {
-            background-color: #F8F9FA; border-radius: 8px; padding: 15px;
-            border: 1px solid #E0E0E0; margin-bottom: 10px;
-        }
-        .indicator-card h5 { font-size: 1.1rem; font-weight: 700; color: #0E6E52; margin-bottom: 10px; }
-        .indicator-card p { font-size: 0.95rem; margin-bottom: 5px; }
-        .indicator-card strong { color: #333; }
-        </style>
-    """, unsafe_allow_html=True)
-
-
-def kpi_card(title, value, class_name=""):
-    return f"""<div class="kpi-card {class_name}"><h3>{title}</h3><h1>{value}</h1></div>"""
-
-
-def kpi_card_with_delta(title, value, delta_value, delta_text, class_name=""):
-    delta_class = "delta-negativo" if delta_value > 0 else "delta"
-    delta_icon = "▲" if delta_value > 0 else "▼"
-    return f"""
-    <div class="kpi-card {class_name}">
-        <h3>{title}</h3><h1>{value}</h1>
-        <div class="{delta_class}">{delta_icon} {delta_value} {delta_text}</div>
-    </div>
-    """
-
-
-def load_riscos_data(uploaded_file):
-    """ Carrega os dados de Riscos (Mapa e Plano) do arquivo de upload. """
-    try:
-        df_mapa = pd.read_excel(uploaded_file, sheet_name=SHEET_MAPA, header=9)
-        if len(df_mapa.columns) == len(mapa_cols):
-            df_mapa.columns = mapa_cols
-        else:
-            st.error(f"Erro na aba '{SHEET_MAPA}': Estrutura de colunas inesperada.")
-            return None, None
-    except Exception as e:
-        st.error(f"Erro ao ler a aba '{SHEET_MAPA}'. Verifique o nome da aba. Erro: {e}")
-        return None, None
-    try:
-        df_plano = pd.read_excel(uploaded_file, sheet_name=SHEET_PLANO, header=8)
-        if len(df_plano.columns) == len(plano_cols):
-            df_plano.columns = plano_cols
-        else:
-            st.error(f"Erro na aba '{SHEET_PLANO}': Estrutura de colunas inesperada.")
-            return None, None
-    except Exception as e:
-        st.error(f"Erro ao ler a aba '{SHEET_PLANO}'. Verifique o nome da aba. Erro: {e}")
-        return None, None
-
-    # Limpeza (Riscos)
-    df_mapa.drop(columns=['col_vazia'], inplace=True, errors='ignore')
-    df_plano.drop(columns=['col_vazia'], inplace=True, errors='ignore')
-    df_mapa.dropna(subset=['acao_estrategica'], inplace=True)
-    df_plano.dropna(subset=['acao_estrategica'], inplace=True)
-    cols_num_mapa = ['gp', 'gi', 'nivel_ri', 'avaliacao_controle_ac', 'nivel_rr']
-    for col in cols_num_mapa:
-        if col in df_mapa.columns:
-            df_mapa[col] = pd.to_numeric(df_mapa[col], errors='coerce')
-    df_plano.replace('#REF!', pd.NA, inplace=True)
-    df_mapa['acao_estrategica'] = df_mapa['acao_estrategica'].str.strip()
-    df_mapa['evento_risco'] = df_mapa['evento_risco'].str.strip()
-    df_plano['evento_risco'] = df_plano['evento_risco'].str.strip()
-    return df_mapa, df_plano
-
-
-# (ATUALIZADO) Função de Carga para Indicadores
-def load_indicadores_data(uploaded_file):
-    """ Carrega e limpa os dados de Indicadores da aba '1.1. Plano de Ação'. """
-    try:
-        df = pd.read_excel(uploaded_file, sheet_name=SHEET_INDICADORES, header=9)
-
-        # Verifica se o número de colunas bate
-        if len(df.columns) != len(indicadores_cols):
-            st.error(
-                f"Erro na aba '{SHEET_INDICADORES}': Estrutura de colunas inesperada. Esperava {len(indicadores_cols)} colunas, encontrou {len(df.columns)}.")
-            return None
-
-        # Força a renomeação de TODAS as colunas
-        df.columns = indicadores_cols
-
-        # Seleciona apenas as colunas que nos interessam (agora incluindo meses e status)
-        df_indicadores = df[INDICADORES_COLS_REQUERIDAS].copy()
-
-        # Limpeza de Dados
-        df_indicadores[INDICADORES_COLS_FFILL] = df_indicadores[INDICADORES_COLS_FFILL].ffill()
-        df_indicadores.dropna(subset=[COL_IND_TITULO], inplace=True)
-        df_indicadores[COL_ACAO] = df_indicadores[COL_ACAO].str.strip()
-
-        return df_indicadores
-
-    except Exception as e:
-        st.error(f"Erro ao ler a aba '{SHEET_INDICADORES}'. Verifique o nome da aba e a estrutura. Erro: {e}")
-        return None
-
-
-def get_avaliacao_from_nivel(nivel):
-    if nivel <= 2:
-        return "Aceitável"
-    elif nivel <= 6:
-        return "Gerenciável"
-    elif nivel <= 9:
-        return "Indesejável"
-    else:
-        return "Inaceitável"
-
-
-def reset_app_state():
-    """ Limpa o estado da sessão para voltar à tela inicial. """
-    keys_to_delete = ['app_mode', 'df_mapa', 'df_plano', 'df_indicadores']
-    for key in keys_to_delete:
-        if key in st.session_state:
-            del st.session_state[key]
-    st.rerun()
-
-
-# ==================================================================
-# FUNÇÕES DE RENDERIZAÇÃO DE PÁGINA
-# ==================================================================
-
-def render_page_visao_geral(df_mapa):
-    st.header("Visão Geral do Portfólio de Riscos")
-    kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
-    total_riscos = len(df_mapa)
-    riscos_ri_inaceitavel = len(df_mapa[df_mapa['avaliacao_ri'] == 'Inaceitável'])
-    riscos_rr_inaceitavel = len(df_mapa[df_mapa['avaliacao_rr'] == 'Inaceitável'])
-    delta_inaceitaveis = riscos_rr_inaceitavel - riscos_ri_inaceitavel
-    with kpi_col1: st.markdown(kpi_card("Total de Riscos Mapeados", total_riscos), unsafe_allow_html=True)
-    with kpi_col2: st.markdown(kpi_card("Riscos Inerentes 'Inaceitáveis'", riscos_ri_inaceitavel, "inaceitavel"),
-                               unsafe_allow_html=True)
-    with kpi_col3: st.markdown(
-        kpi_card_with_delta("Riscos Residuais 'Inaceitáveis'", riscos_rr_inaceitavel, delta_inaceitaveis,
-                            "vs. Risco Inerente", "inaceitavel"), unsafe_allow_html=True)
-    st.divider()
-    st.subheader("Análise: Risco Inerente (Antes) vs. Risco Residual (Depois)")
-    plot_col1, plot_col2, plot_col3 = st.columns(3)
-    with plot_col1:
-        st.write("**Matriz de Risco (Prob x Impacto)**")
-        df_ri_matrix = df_mapa.groupby(['gp', 'gi']).size().reset_index(name='contagem')
-        fig_ri = px.density_heatmap(
-            df_ri_matrix, x='gi', y='gp', z='contagem', text_auto=True,
-            title="Heatmap Risco Inerente (GP x GI)", labels=FRIENDLY_NAMES,
-            category_orders={'gi': CAT_IMPACTO_PROB, 'gp': CAT_IMPACTO_PROB},
-            color_continuous_scale='YlOrRd'
-        )
-        fig_ri.update_layout(xaxis_title=FRIENDLY_NAMES['gi'], yaxis_title=FRIENDLY_NAMES['gp'],
-                             xaxis=dict(tickmode='linear'), yaxis=dict(tickmode='linear'),
-                             margin=dict(l=0, r=0, t=40, b=0))
-        st.plotly_chart(fig_ri, use_container_width=True)
-    with plot_col2:
-        st.write("**Avaliação Inerente (Antes dos Controles)**")
-        df_ri = df_mapa['avaliacao_ri'].value_counts().reset_index()
-        fig_ri_bar = px.bar(
-            df_ri, x='avaliacao_ri', y='count', text_auto=True,
-            title="Contagem de Riscos por Avaliação Inerente",
-            labels={'avaliacao_ri': FRIENDLY_NAMES['avaliacao_ri'], 'count': FRIENDLY_NAMES['contagem']},
-            category_orders={'avaliacao_ri': CAT_AVALIACAO},
-            color='avaliacao_ri', color_discrete_map=RISK_COLORS
-        )
-        fig_ri_bar.update_layout(xaxis_title=FRIENDLY_NAMES['avaliacao_ri'], yaxis_title=FRIENDLY_NAMES['contagem'],
-                                 margin=dict(l=0, r=0, t=40, b=0), showlegend=False)
-        st.plotly_chart(fig_ri_bar, use_container_width=True)
-    with plot_col3:
-        st.write("**Avaliação Residual (Depois dos Controles)**")
-        df_rr = df_mapa['avaliacao_rr'].value_counts().reset_index()
-        fig_rr = px.bar(
-            df_rr, x='avaliacao_rr', y='count', text_auto=True,
-            title="Contagem de Riscos por Avaliação Residual",
-            labels={'avaliacao_rr': FRIENDLY_NAMES['avaliacao_rr'], 'count': FRIENDLY_NAMES['contagem']},
-            category_orders={'avaliacao_rr': CAT_AVALIACAO},
-            color='avaliacao_rr', color_discrete_map=RISK_COLORS
-        )
-        fig_rr.update_layout(xaxis_title=FRIENDLY_NAMES['avaliacao_rr'], yaxis_title=FRIENDLY_NAMES['contagem'],
-                             margin=dict(l=0, r=0, t=40, b=0), showlegend=False)
-        st.plotly_chart(fig_rr, use_container_width=True)
-    st.divider()
-    st.subheader("Detalhamento dos Riscos")
-    plot_col3, plot_col4 = st.columns(2)
-    with plot_col3:
-        df_class = df_mapa['classificacao'].value_counts().reset_index()
-        fig_class = px.bar(
-            df_class, x='classificacao', y='count', title="Contagem de Riscos por Classificação",
-            labels={'classificacao': FRIENDLY_NAMES['classificacao'], 'count': FRIENDLY_NAMES['contagem']},
-            text_auto=True, color_discrete_sequence=['#003366']  # Sua cor azul marinho
-        )
-        fig_class.update_layout(xaxis_title=FRIENDLY_NAMES['classificacao'], yaxis_title=FRIENDLY_NAMES['contagem'],
-                                margin=dict(l=0, r=0, t=40, b=0))
-        st.plotly_chart(fig_class, use_container_width=True)
-    with plot_col4:
-        df_gestor = df_mapa['gestor_risco'].value_counts().reset_index()
-        fig_gestor = px.bar(
-            df_gestor, x='gestor_risco', y='count', title="Contagem de Riscos por Gestor",
-            labels={'gestor_risco': FRIENDLY_NAMES['gestor_risco'], 'count': FRIENDLY_NAMES['contagem']},
-            text_auto=True, color_discrete_sequence=['#003366']  # Sua cor azul marinho
-        )
-        fig_gestor.update_layout(xaxis_title=FRIENDLY_NAMES['gestor_risco'], yaxis_title=FRIENDLY_NAMES['contagem'],
-                                 margin=dict(l=0, r=0, t=40, b=0))
-        st.plotly_chart(fig_gestor, use_container_width=True)
-
-
-def render_page_indicadores(df_indicadores, df_mapa):
-    st.header("Análise de Indicadores e Riscos por Ação Estratégica")
-    st.info(
-        "Selecione uma Ação Estratégica para ver os Indicadores de Planejamento e os Riscos de Gestão associados a ela.")
-    acoes_riscos = df_mapa['acao_estrategica'].unique()
-    acoes_indicadores = df_indicadores[COL_ACAO].unique()
-    lista_completa_acoes = sorted(list(set(list(acoes_riscos) + list(acoes_indicadores))))
-    acao_selecionada = st.selectbox("Selecione a Ação Estratégica:", lista_completa_acoes)
-    st.divider()
-    col_ind, col_risc = st.columns(2)
-    with col_ind:
-        st.subheader("Indicadores de Planejamento")
-        indicadores_filtrados = df_indicadores[df_indicadores[COL_ACAO] == acao_selecionada]
-        if indicadores_filtrados.empty:
-            st.warning("Nenhum indicador de planejamento associado a esta Ação.")
-        else:
-            st.markdown(f"**{FRIENDLY_NAMES[COL_OBJETIVO]}:** _{indicadores_filtrados.iloc[0][COL_OBJETIVO]}_")
-            st.markdown(f"**{FRIENDLY_NAMES[COL_INICIATIVA]}:** _{indicadores_filtrados.iloc[0][COL_INICIATIVA]}_")
-            st.write("")
-            for _, row in indicadores_filtrados.iterrows():
-                st.markdown(
-                    f"""
-                    <div class="indicator-card">
-                        <h5>{row[COL_IND_TITULO]}</h5>
-                        <p><strong>{FRIENDLY_NAMES[COL_IND_FORMULA]}:</strong> {row[COL_IND_FORMULA]}</p>
-                        <p><strong>{FRIENDLY_NAMES[COL_IND_SIT_INICIAL]}:</strong> {row[COL_IND_SIT_INICIAL]}</p>
-                        <p><strong>{FRIENDLY_NAMES[COL_IND_VALOR]}:</strong> {row[COL_IND_VALOR]} ({row[COL_IND_UNIDADE]})</p>
-                        <p><strong>{FRIENDLY_NAMES[COL_IND_PARAMETRO]}:</strong> {row[COL_IND_PARAMETRO]}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-    with col_risc:
-        st.subheader("Riscos de Gestão")
-        riscos_filtrados = df_mapa[df_mapa['acao_estrategica'] == acao_selecionada]
-        if riscos_filtrados.empty:
-            st.warning("Nenhum risco de gestão associado a esta Ação.")
-        else:
-            for _, row in riscos_filtrados.iterrows():
-                aval_rr = row['avaliacao_rr']
-                if aval_rr == 'Inaceitável':
-                    st.error(f"**Risco:** {row['evento_risco']}")
-                elif aval_rr == 'Indesejável':
-                    st.warning(f"**Risco:** {row['evento_risco']}")
-                elif aval_rr == 'Gerenciável':
-                    st.info(f"**Risco:** {row['evento_risco']}")
-                else:
-                    st.success(f"**Risco:** {row['evento_risco']}")
-                with st.expander("Ver detalhes do risco"):
-                    st.markdown(f"**Causas:** {row['causas']}")
-                    st.markdown(f"**Consequências:** {row['consequencias']}")
-                    st.markdown(f"**Risco Inerente:** {row['nivel_ri']} ({row['avaliacao_ri']})")
-                    st.markdown(f"**Risco Residual:** {row['nivel_rr']:.1f} ({row['avaliacao_rr']})")
-                    st.markdown(f"**Controle Existente:** {row['desc_controle']} (`{row['nivel_controle']}`)")
-                st.write("")
-
-
-# --- (ATUALIZADA) FUNÇÃO DE PÁGINA: MONITORAMENTO DE INDICADORES ---
-def render_page_monitoramento(df_indicadores):
-    st.header("Monitoramento de Indicadores")
-    st.info("Selecione um indicador específico para acompanhar sua evolução mensal em relação à meta.")
-
-    # --- Filtros Dependentes ---
-    lista_acoes = df_indicadores[COL_ACAO].unique()
-    acao_selecionada = st.selectbox(
-        "1. Selecione a Ação Estratégica:",
-        lista_acoes
-    )
-    
-    df_acoes_filtrado = df_indicadores[df_indicadores[COL_ACAO] == acao_selecionada]
-    lista_indicadores = df_acoes_filtrado[COL_IND_TITULO].unique()
-    
-    indicador_selecionado = st.selectbox(
-        "2. Selecione o Indicador para Monitorar:",
-        lista_indicadores
-    )
-    
-    # --- Extração de Dados ---
-    try:
-        df_indicador_selecionado = df_acoes_filtrado[df_acoes_filtrado[COL_IND_TITULO] == indicador_selecionado]
-        data_indicador = df_indicador_selecionado.iloc[0]
-    except IndexError:
-        st.error("Erro ao selecionar o indicador. Tente novamente.")
-        st.stop()
-        
-    st.divider()
-
-    # --- (NOVO) Card de Características do Indicador ---
-    st.subheader(f"Detalhes: {indicador_selecionado}")
-    st.markdown(
-        f"""
-        <div class="indicator-card">
-            <p><strong>{FRIENDLY_NAMES[COL_ACAO]}:</strong> {data_indicador[COL_ACAO]}</p>
-            <p><strong>{FRIENDLY_NAMES[COL_IND_FORMULA]}:</strong> {data_indicador[COL_IND_FORMULA]}</p>
-            <p><strong>{FRIENDLY_NAMES[COL_IND_PARAMETRO]}:</strong> {data_indicador[COL_IND_PARAMETRO]}</p>
-            <p><strong>{FRIENDLY_NAMES[COL_IND_SIT_INICIAL]}:</strong> {data_indicador[COL_IND_SIT_INICIAL]}</p>
-            <p><strong>{FRIENDLY_NAMES[COL_IND_UNIDADE]}:</strong> {data_indicador[COL_IND_UNIDADE]}</p>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
-    st.write("") # Espaço
-
-    # --- KPIs de Status com CÁLCULO CORRIGIDO ---
-    st.subheader(f"Status de Acompanhamento")
-    
-    # Prepara os valores
-    meta_val = pd.to_numeric(data_indicador[COL_IND_VALOR], errors='coerce')
-    realizado_val = pd.to_numeric(data_indicador[COL_IND_REALIZADO], errors='coerce')
-    
-    alcance_decimal = pd.to_numeric(data_indicador[COL_IND_ALCANCE], errors='coerce')
-    alcance_val = alcance_decimal * 100 if pd.notna(alcance_decimal) else pd.NA
-    
-    # Formata os valores para exibição
-    meta_str = f"{meta_val:,.2f}" if pd.notna(meta_val) else str(data_indicador[COL_IND_VALOR])
-    realizado_str = f"{realizado_val:,.2f}" if pd.notna(realizado_val) else "N/A"
-    alcance_str = f"{alcance_val:.1f}%" if pd.notna(alcance_val) else "N/A"
-
-    # Lógica de Cor
-    alcance_class = "neutral" # Padrão
-    if pd.notna(alcance_val):
-        alcance_class = "alcance-bom" if alcance_val >= 100.0 else "alcance-ruim"
-            
-    kpi1, kpi2, kpi3 = st.columns(3)
-    with kpi1:
-        st.markdown(kpi_card(FRIENDLY_NAMES[COL_IND_VALOR], meta_str, "neutral"), unsafe_allow_html=True)
-    with kpi2:
-        st.markdown(kpi_card(FRIENDLY_NAMES[COL_IND_REALIZADO], realizado_str, "neutral"), unsafe_allow_html=True)
-    with kpi3:
-        st.markdown(kpi_card(FRIENDLY_NAMES[COL_IND_ALCANCE], alcance_str, alcance_class), unsafe_allow_html=True)
-
-    
-    st.write("") # Espaço
-
-    # --- Gráfico de Evolução (Sem alterações) ---
-    st.subheader("Evolução Mensal vs. Meta")
-    
-    df_meses = df_indicador_selecionado[COL_MESES] 
-    df_meses_numeric = df_meses.apply(pd.to_numeric, errors='coerce') 
-    
-    if df_meses_numeric.isnull().all().all():
-        st.warning("Não há dados de acompanhamento mensal (Mês 01 a Mês 12) preenchidos para este indicador.")
-    else:
-        df_melted = df_meses_numeric.melt(var_name="Mês", value_name="Realizado (mês)")
-        df_melted['Mês Num'] = df_melted['Mês'].str.replace('mes_', '').astype(int)
-        df_melted = df_melted.sort_values(by='Mês Num')
-        
-        fig = px.line(
-            df_melted, 
-            x='Mês', 
-            y='Realizado (mês)', 
-            title=f"Evolução: {indicador_selecionado}",
-            markers=True
-        )
-        
-        if pd.notna(meta_val):
-            fig.add_hline(
-                y=meta_val, 
-                line_dash="dash", 
-                line_color="red", 
-                annotation_text="Meta"
-            )
-            
-        fig.update_layout(xaxis_title="Meses de Acompanhamento", yaxis_title=data_indicador[COL_IND_UNIDADE])
-        st.plotly_chart(fig, use_container_width=True)
-
-
-def render_page_ficha_individual(df_mapa, df_plano):
-    st.header("Ficha Individual do Risco")
-    st.info("Selecione um evento de risco para ver seu perfil completo, desde a identificação até o plano de resposta.")
-    lista_riscos_completa = df_mapa['evento_risco'].unique().tolist()
-    risco_selecionado = st.selectbox("Selecione um Evento de Risco para ver seu perfil:", lista_riscos_completa,
-                                     index=0)
-    risco_data = df_mapa[df_mapa['evento_risco'] == risco_selecionado].iloc[0]
-    plano_data = df_plano[df_plano['evento_risco'] == risco_selecionado]
-    st.divider()
-    with st.container(border=True):
-        st.subheader(f"1. Identificação do Risco")
-        st.markdown(f"#### {risco_data['evento_risco']}")
-        st.markdown(f"**{FRIENDLY_NAMES['acao_estrategica']}:** _{risco_data['acao_estrategica']}_")
-        id_col1, id_col2 = st.columns(2)
-        with id_col1:
-            st.markdown(f"**{FRIENDLY_NAMES['classificacao']}:** `{risco_data['classificacao']}`")
-            st.markdown(f"**{FRIENDLY_NAMES['gestor_risco']}:** `{risco_data['gestor_risco']}`")
-        with id_col2:
-            st.markdown(f"**{FRIENDLY_NAMES['causas']}:** _{risco_data['causas']}_")
-            st.markdown(f"**{FRIENDLY_NAMES['consequencias']}:** _{risco_data['consequencias']}_")
-    st.write("")
-    with st.container(border=True):
-        st.subheader("2. Análise e Avaliação")
-        eval_col1, eval_col2, eval_col3 = st.columns(3)
-        with eval_col1:
-            st.markdown("##### Risco Inerente (RI)")
-            aval_ri = risco_data['avaliacao_ri']
-            nivel_ri = risco_data['nivel_ri']
-            if aval_ri == 'Inaceitável':
-                st.error(f"### {nivel_ri} ({aval_ri})")
-            elif aval_ri == 'Indesejável':
-                st.warning(f"### {nivel_ri} ({aval_ri})")
-            elif aval_ri == 'Gerenciável':
-                st.info(f"### {nivel_ri} ({aval_ri})")
-            else:
-                st.success(f"### {nivel_ri} ({aval_ri})")
-            st.markdown(f"**{FRIENDLY_NAMES['gp']}:** `{risco_data['gp']}`")
-            st.markdown(f"**{FRIENDLY_NAMES['gi']}:** `{risco_data['gi']}`")
-        with eval_col2:
-            st.markdown("##### Controles Existentes")
-            st.markdown(f"**Descrição:**")
-            st.markdown(f"_{risco_data['desc_controle']}_")
-            st.markdown(f"**Nível:** `{risco_data['nivel_controle']}` (Peso: `{risco_data['avaliacao_controle_ac']}`)")
-        with eval_col3:
-            st.markdown("##### Risco Residual (RR)")
-            aval_rr = risco_data['avaliacao_rr']
-            nivel_rr = risco_data['nivel_rr']
-            if aval_rr == 'Inaceitável':
-                st.error(f"### {nivel_rr:.1f} ({aval_rr})")
-            elif aval_rr == 'Indesejável':
-                st.warning(f"### {nivel_rr:.1f} ({aval_rr})")
-            elif aval_rr == 'Gerenciável':
-                st.info(f"### {nivel_rr:.1f} ({aval_rr})")
-            else:
-                st.success(f"### {nivel_rr:.1f} ({aval_rr})")
-            st.markdown(f"**Resposta ao Risco:** `{risco_data['resposta_risco']}`")
-    st.write("")
-    with st.container(border=True):
-        st.subheader("3. Plano de Resposta (Tratamento)")
-        if plano_data.empty or risco_data['plano_resposta'] == 'Não':
-            st.warning("Este risco não possui um plano de resposta detalhado cadastrado.")
-        else:
-            plano = plano_data.iloc[0]
-            st.info(f"**Detalhes do plano para '{plano['resposta']}' o risco:**")
-            plan_col1, plan_col2 = st.columns(2)
-            with plan_col1:
-                st.markdown(f"**{FRIENDLY_NAMES['o_que']}:**\n_{plano['o_que']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['por_quem']}:**\n_{plano['por_quem']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['quando']}:**\n_{plano['quando']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['onde']}:**\n_{plano['onde']}_")
-            with plan_col2:
-                st.markdown(f"**{FRIENDLY_NAMES['por_que']}:**\n_{plano['por_que']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['como']}:**\n_{plano['como']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['custo']}:**\n_{plano['custo']}_")
-
-
-def render_page_simulador(df_mapa):
-    st.header("Simulador de Eficácia dos Controles")
-    st.info("Esta ferramenta permite simular o impacto da melhoria de um controle sobre o Risco Residual. (...)")
-    lista_riscos_completa = df_mapa['evento_risco'].unique().tolist()
-    risco_selecionado = st.selectbox("Selecione um Evento de Risco para simular:", lista_riscos_completa)
-    risco_data = df_mapa[df_mapa['evento_risco'] == risco_selecionado].iloc[0]
-    nivel_ri_fixo = risco_data['nivel_ri']
-    aval_ri_fixa = risco_data['avaliacao_ri']
-    nivel_controle_original = risco_data['nivel_controle']
-    ac_original = risco_data['avaliacao_controle_ac']
-    nivel_rr_original = risco_data['nivel_rr']
-    aval_rr_original = risco_data['avaliacao_rr']
-    st.divider()
-    sim_col1, sim_col2 = st.columns([1, 2])
-    with sim_col1:
-        st.subheader("Dados Iniciais")
-        st.metric(label=f"Risco Inerente (RI) - Fixo", value=f"{nivel_ri_fixo} ({aval_ri_fixa})")
-        st.markdown(f"### Risco Residual Original (RR)")
-        if aval_rr_original == 'Inaceitável':
-            st.error(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
-        elif aval_rr_original == 'Indesejável':
-            st.warning(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
-        elif aval_rr_original == 'Gerenciável':
-            st.info(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
-        else:
-            st.success(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
-        st.caption(f"Baseado no controle original: '{nivel_controle_original}' (Peso: {ac_original})")
-    with sim_col2:
-        st.subheader("Simulação")
-        nivel_controle_simulado = st.select_slider("Arraste para simular um novo Nível de Controle:",
-                                                   options=CONTROLES_NIVEIS, value=nivel_controle_original)
-        ac_simulado = CONTROLES_PESOS[nivel_controle_simulado]
-        nivel_rr_simulado = nivel_ri_fixo * ac_simulado
-        aval_rr_simulada = get_avaliacao_from_nivel(nivel_rr_simulado)
-        st.markdown(f"### Novo Risco Residual (Simulado)")
-        if aval_rr_simulada == 'Inaceitável':
-            st.error(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
-        elif aval_rr_simulada == 'Indesejável':
-            st.warning(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
-        elif aval_rr_simulada == 'Gerenciável':
-            st.info(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
-        else:
-            st.success(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
-        st.caption(f"Cálculo: {nivel_ri_fixo} (RI) × {ac_simulado} (Peso de '{nivel_controle_simulado}')")
-    st.divider()
-    st.write(f"**Descrição do Risco:** {risco_data['evento_risco']}")
-    st.write(f"**Causas:** {risco_data['causas']}")
-    st.write(f"**Controle Original Descrito:** {risco_data['desc_controle']}")
-
-
-def render_page_analise_detalhada(df_mapa, df_plano):
-    st.header("Análise Detalhada (Tabelas)")
-    st.subheader("Filtros de Riscos")
-    lista_acoes = ['Todas'] + df_mapa['acao_estrategica'].unique().tolist()
-    lista_gestores = ['Todos'] + df_mapa['gestor_risco'].unique().tolist()
-    lista_avaliacoes = ['Todas'] + CAT_AVALIACAO
-    filt_col1, filt_col2, filt_col3 = st.columns(3)
-    with filt_col1:
-        filtro_acao = st.selectbox("Filtrar por Ação Estratégica:", lista_acoes)
-    with filt_col2:
-        filtro_gestor = st.selectbox("Filtrar por Gestor:", lista_gestores)
-    with filt_col3:
-        filtro_aval_rr = st.selectbox("Filtrar por Avaliação Residual:", lista_avaliacoes)
-    st.divider()
-    st.subheader("Mapa de Riscos Filtrado")
-    df_mapa_filtrado = df_mapa.copy()
-    if filtro_acao != 'Todas': df_mapa_filtrado = df_mapa_filtrado[df_mapa_filtrado['acao_estrategica'] == filtro_acao]
-    if filtro_gestor != 'Todos': df_mapa_filtrado = df_mapa_filtrado[df_mapa_filtrado['gestor_risco'] == filtro_gestor]
-    if filtro_aval_rr != 'Todas': df_mapa_filtrado = df_mapa_filtrado[
-        df_mapa_filtrado['avaliacao_rr'] == filtro_aval_rr]
-    st.dataframe(df_mapa_filtrado.rename(columns=FRIENDLY_NAMES))
-    st.divider()
-    st.subheader("Detalhamento do Plano de Resposta (Drill-Down)")
-    lista_riscos_filtrados = df_mapa_filtrado['evento_risco'].unique().tolist()
-    if not lista_riscos_filtrados:
-        st.warning("Nenhum risco encontrado para os filtros selecionados.")
-    else:
-        risco_selecionado = st.selectbox("Selecione o Evento de Risco para ver o Plano de Resposta:",
-                                         lista_riscos_filtrados)
-        plano_selecionado = df_plano[df_plano['evento_risco'] == risco_selecionado]
-        if plano_selecionado.empty:
-            st.error(f"Plano de resposta não encontrado para o risco: '{risco_selecionado}'")
-        else:
-            plano = plano_selecionado.iloc[0]
-            st.info(f"**Plano de Resposta para:** {plano['evento_risco']}")
-            plan_col1, plan_col2 = st.columns(2)
-            with plan_col1:
-                st.markdown(f"**{FRIENDLY_NAMES['o_que']}:**\n_{plano['o_que']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['por_quem']}:**\n_{plano['por_quem']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['quando']}:**\n_{plano['quando']}_")
-            with plan_col2:
-                st.markdown(f"**{FRIENDLY_NAMES['como']}:**\n_{plano['como']}_")
-                st.markdown(f"**{FRIENDLY_NAMES['custo']}:**\n_{plano['custo']}_")
-
-
-# ==================================================================
-# LÓGICA PRINCIPAL DO APP (ROTEADOR)
-# ==================================================================
-
-# --- Configuração Inicial da Página ---
-st.set_page_config(
-    page_title="Painel de Gestão de Riscos",
-    page_icon="📊",
-    layout="wide"
-)
-load_css()
-st.title("Painel de Análise de Riscos e Indicadores")
-
-# --- ETAPA 1: Seleção de Modo ---
-if 'app_mode' not in st.session_state:
-    st.header("Selecione o Modo de Análise")
-    st.info("Escolha como você deseja analisar os dados.")
-
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("📊 Análise de Riscos (Padrão)", use_container_width=True):
-            st.session_state.app_mode = 'risk_only'
-            st.rerun()
-    with col2:
-        if st.button("📈 Análise Integrada (Riscos + Indicadores)", use_container_width=True):
-            st.session_state.app_mode = 'integrated'
-            st.rerun()
-
-    st.stop()  # Para a execução até que um modo seja escolhido
-
-# --- ETAPA 2: Carregamento de Dados (Baseado no Modo) ---
-app_mode = st.session_state.app_mode
-data_loaded = 'df_mapa' in st.session_state
-
-if not data_loaded:
-    st.header("Carregamento de Arquivos")
-
-    if app_mode == 'risk_only':
-        st.info("Por favor, carregue o arquivo de Gestão de Riscos.")
-        uploader_riscos = st.file_uploader(
-            "Arquivo de Gestão de Riscos",
-            type=["xlsx"],
-            help=f"Deve conter as abas '{SHEET_MAPA}' e '{SHEET_PLANO}'"
-        )
-
-        if uploader_riscos is None: st.stop()
-
-        df_mapa, df_plano = load_riscos_data(uploader_riscos)
-
-        if df_mapa is not None and df_plano is not None:
-            st.session_state.df_mapa = df_mapa
-            st.session_state.df_plano = df_plano
-            st.rerun()
-        else:
-            st.stop()
-
-    elif app_mode == 'integrated':
-        st.info("Por favor, carregue os dois arquivos .xlsx para iniciar o painel.")
-        col1, col2 = st.columns(2)
-        with col1:
-            uploader_riscos = st.file_uploader(
-                "1. Arquivo de Gestão de Riscos",
-                type=["xlsx"],
-                help=f"Deve conter as abas '{SHEET_MAPA}' e '{SHEET_PLANO}'"
-            )
-        with col2:
-            uploader_planejamento = st.file_uploader(
-                "2. Arquivo de Planejamento Estratégico",
-                type=["xlsx"],
-                help=f"Deve conter a aba '{SHEET_INDICADORES}'"
-            )
-
-        if uploader_riscos is None or uploader_planejamento is None: st.stop()
-
-        df_mapa, df_plano = load_riscos_data(uploader_riscos)
-        df_indicadores = load_indicadores_data(uploader_planejamento)
-
-        if df_mapa is not None and df_plano is not None and df_indicadores is not None:
-            st.session_state.df_mapa = df_mapa
-            st.session_state.df_plano = df_plano
-            st.session_state.df_indicadores = df_indicadores
-            st.rerun()
-        else:
-            st.error("Falha no carregamento de um ou mais arquivos. Verifique os erros acima.")
-            st.stop()
-
-# --- ETAPA 3: Exibição do Aplicativo (Dados Carregados) ---
-
-# Recupera os dados do estado
-df_mapa = st.session_state.df_mapa
-df_plano = st.session_state.df_plano
-if app_mode == 'integrated':
-    df_indicadores = st.session_state.df_indicadores
-
-# Monta a Sidebar
-st.sidebar.image("risk.jpg", use_container_width=True)
-st.sidebar.title("Navegação")
-
-# Define a lista de páginas com base no modo
-if app_mode == 'risk_only':
-    page_list = [
-        "Visão Geral (Dashboard)",
-        "Ficha Individual do Risco",
-        "Simulador de Controles",
-        "Análise Detalhada (Tabelas)"
-    ]
-else:  # modo 'integrated'
-    page_list = [
-        "Visão Geral (Dashboard)",
-        "Ficha Individual do Risco",
-        "Simulador de Controles",
-        "Análise de Indicadores",
-        "Monitoramento de Indicadores",  # <-- (NOVO)
-        "Análise Detalhada (Tabelas)"
-    ]
-
-page = st.sidebar.radio("Selecione a página:", page_list)
-st.sidebar.divider()
-st.sidebar.button("Mudar Modo / Novos Arquivos", on_click=reset_app_state, use_container_width=True)
-st.sidebar.divider()
-st.sidebar.info(
-    """
-    **Bem-vindo ao Painel de Riscos!**
-    Esta ferramenta transforma suas planilhas em um dashboard interativo.
-    **Instruções para Iniciar:**
-    1.  Tenha seu(s) arquivo(s) `.xlsx` prontos.
-    2.  Verifique se os nomes das abas e colunas 
-        seguem o template original.
-    """
-)
-
-# Roteador de Páginas
-if page == "Visão Geral (Dashboard)":
-    render_page_visao_geral(df_mapa)
-
-elif page == "Análise de Indicadores":
-    render_page_indicadores(df_indicadores, df_mapa)
-
-elif page == "Monitoramento de Indicadores":
-    render_page_monitoramento(df_indicadores)  # <-- (NOVO)
-
-elif page == "Ficha Individual do Risco":
-    render_page_ficha_individual(df_mapa, df_plano)
-
-elif page == "Simulador de Controles":
-    render_page_simulador(df_mapa)
-
-elif page == "Análise Detalhada (Tabelas)":
-    render_page_analise_detalhada(df_mapa, df_plano)
-    
-
-
-
-
-
-
+import html
+import os
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Os DataFrames são compartilhados entre sessões: com Copy-on-Write, filtros e
+# seleções feitos pelas páginas não copiam os dados nem alteram o original
+pd.set_option("mode.copy_on_write", True)
+
+from dataset_store import table_from_frame
+from figure_cache import FIGURE_CACHE
+from folder_watch import FOLDER_WATCHER
+from ingestion import INGESTION_POOL, WorkbookLoadError
+from lookup_index import SEM_LINHAS
+from perf_trace import PERF
+from risk_data import (
+    CAT_AVALIACAO, COL_ACAO, COL_IND_ALCANCE, COL_IND_FORMULA, COL_IND_PARAMETRO, COL_IND_REALIZADO,
+    COL_IND_SIT_INICIAL, COL_IND_TITULO, COL_IND_UNIDADE, COL_IND_VALOR, COL_INICIATIVA, COL_MESES,
+    COL_OBJETIVO, COL_UNIDADE, CONTROLES_NIVEIS, CONTROLES_PESOS, FRIENDLY_NAMES, OVERVIEW_FIGURES,
+    RISK_COLORS, SHEET_INDICADORES, SHEET_MAPA, SHEET_PLANO, build_contagem_figure, combine_units,
+    cube_total, format_memory_report, get_acoes_integradas, get_avaliacao_from_nivel, get_indicadores_index,
+    get_indicator_series, get_overview_cube, get_riscos_index, get_scorecard, get_unidades,
+    ingest_indicadores, ingest_integrated, ingest_riscos, load_riscos_data, prepare_indicadores, prepare_riscos,
+    select_units, slice_cube,
+)
+from session_memory import MEMORIA_PAINEL, SESSION_MEMORY
+from session_snapshot import SNAPSHOT_EXTENSAO, read_snapshot, write_snapshot
+from simulation import MC_PROCESSOS, monte_carlo_residual, simulate_control_mapping
+from workbook_cache import WORKBOOK_CACHE
+
+# Constantes da interface (esquema das planilhas, nomes e cores ficam em risk_data.py)
+
+# --- Tabela paginada da Análise Detalhada ---
+TABELA_COLS_TEXTO_LONGO = ['causas', 'consequencias', 'desc_controle']
+TABELA_LIMITE_TEXTO = 100  # caracteres exibidos antes de cortar o texto
+TABELA_TAMANHOS_PAGINA = [25, 50, 100, 200]
+# --- Página de Indicadores ---
+# Máximo de cards de indicadores / riscos exibidos por coluna
+INDICADORES_MAX_ITENS = 60
+# Classe CSS da lista de riscos por avaliação residual (o resto usa 'aceitavel')
+RISCO_CLASSES_CSS = {'Inaceitável': 'inaceitavel', 'Indesejável': 'indesejavel', 'Gerenciável': 'gerenciavel'}
+# Número de sorteios por risco oferecidos no Monte Carlo do simulador
+MC_OPCOES_SORTEIOS = [1_000, 10_000, 50_000, 100_000, 200_000]
+
+# --- Carga dos arquivos em segundo plano ---
+# Rótulo da barra de progresso de cada carga
+CARGA_ROTULOS = {'dataset_riscos': "Riscos", 'dataset_indicadores': "Planejamento Estratégico"}
+# Intervalo de atualização do progresso das páginas que esperam os Indicadores
+CARGA_INTERVALO_SEGUNDOS = 1.0
+# Páginas que dependem da planilha de Planejamento (Indicadores)
+PAGINAS_INDICADORES = ["Análise de Indicadores", "Monitoramento de Indicadores"]
+# Intervalo com que os painéis abertos procuram uma nova versão da planilha da pasta compartilhada
+PASTA_INTERVALO_SEGUNDOS = 5.0
+
+
+# ==================================================================
+# FUNÇÕES AUXILIARES (CSS, KPIs, CARREGAMENTO DE DADOS)
+# ==================================================================
+
+def load_css():
+    """ Carrega CSS customizado para os KPIs e Cards de Indicadores. """
+    st.markdown("""
+        <style>
+        /* Estilo para os Cards de KPI */
+        .kpi-card {
+            background-color: #FFFFFF; border-radius: 8px; padding: 20px;
+            box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1); border: 1px solid #E0E0E0;
+            margin-bottom: 10px; height: 130px; /* (NOVO) Altura fixa */
+        }
+        .kpi-card h3 { 
+            font-size: 1.1rem; font-weight: 600; color: #4F4F4F; 
+            margin-bottom: 5px; height: 35px; /* (NOVO) Altura fixa */
+        }
+        .kpi-card h1 { 
+            font-size: 2.5rem; font-weight: 700; color: #0E6E52; 
+            margin: 0;
+        }
+
+        /* Cores de Alerta */
+        .kpi-card.inaceitavel h1 { color: #D32F2F; }
+
+        /* (NOVO) Cores de Monitoramento */
+        .kpi-card.neutral h1 { color: #003366; } /* Azul Marinho */
+        .kpi-card.alcance-bom h1 { color: #388E3C; } /* Verde Sucesso */
+        .kpi-card.alcance-ruim h1 { color: #D32F2F; } /* Vermelho Falha */
+
+        /* Deltas (da Visão Geral) */
+        .kpi-card .delta { font-size: 1rem; font-weight: 600; color: #388E3C; margin-top: 5px; }
+        .kpi-card .delta-negativo { color: #D32F2F; }
+
+        /* Card de Indicador (da Análise de Indicadores) */
+        .indicator-card {
+            background-color: #F8F9FA; border-radius: 8px; padding: 15px;
+            border: 1px solid #E0E0E0; margin-bottom: 10px;
+        }
+        .indicator-card h5 { font-size: 1.1rem; font-weight: 700; color: #0E6E52; margin-bottom: 10px; }
+        .indicator-card p { font-size: 0.95rem; margin-bottom: 5px; }
+        .indicator-card strong { color: #333; }
+
+        /* Lista de Riscos em lote (cores dos alertas do Streamlit) */
+        .risk-item { border-radius: 8px; padding: 12px 16px; margin-bottom: 8px; font-size: 0.95rem; }
+        .risk-item.inaceitavel { background-color: rgba(255, 43, 43, 0.09); color: rgb(125, 53, 59); }
+        .risk-item.indesejavel { background-color: rgba(255, 227, 18, 0.1); color: rgb(146, 108, 5); }
+        .risk-item.gerenciavel { background-color: rgba(28, 131, 225, 0.1); color: rgb(0, 66, 128); }
+        .risk-item.aceitavel { background-color: rgba(33, 195, 84, 0.1); color: rgb(23, 114, 51); }
+        </style>
+    """, unsafe_allow_html=True)
+
+
+def kpi_card(title, value, class_name=""):
+    return f"""<div class="kpi-card {class_name}"><h3>{title}</h3><h1>{value}</h1></div>"""
+
+
+def kpi_card_with_delta(title, value, delta_value, delta_text, class_name=""):
+    delta_class = "delta-negativo" if delta_value > 0 else "delta"
+    delta_icon = "▲" if delta_value > 0 else "▼"
+    return f"""
+    <div class="kpi-card {class_name}">
+        <h3>{title}</h3><h1>{value}</h1>
+        <div class="{delta_class}">{delta_icon} {delta_value} {delta_text}</div>
+    </div>
+    """
+
+
+def get_mapa_exibicao(dataset):
+    """
+    Mapa de Riscos com os nomes amigáveis, já em Arrow (o formato que o
+    st.dataframe envia ao navegador): montado uma vez por dataset.
+    """
+    return dataset.derived(
+        "arrow:mapa_exibicao",
+        lambda ds: table_from_frame(ds.frames['df_mapa'].rename(columns=FRIENDLY_NAMES), preserve_index=True))
+
+
+def truncate_text(series, limite):
+    """ Textos maiores que `limite` cortados com reticências (os demais valores ficam como estão). """
+    return series.map(lambda v: v[:limite].rstrip() + "…" if isinstance(v, str) and len(v) > limite else v)
+
+
+def get_mapa_exibicao_resumida(dataset):
+    """ Como get_mapa_exibicao, mas com os textos longos (causas, consequências, controles) cortados. """
+    def build(ds):
+        df_resumido = ds.frames['df_mapa'].copy()
+        for col in TABELA_COLS_TEXTO_LONGO:
+            df_resumido[col] = truncate_text(df_resumido[col], TABELA_LIMITE_TEXTO)
+        return table_from_frame(df_resumido.rename(columns=FRIENDLY_NAMES), preserve_index=True)
+    return dataset.derived("arrow:mapa_exibicao_resumida", build)
+
+
+def cached_figure(dataset_key, page, params, builder):
+    """ Figura do cache de figuras, por (dataset, página, parâmetros); montada por `builder` só na primeira vez. """
+    return FIGURE_CACHE.get_or_build((dataset_key, page) + tuple(params), PERF.timed(f"grafico:{page}")(builder))
+
+
+def reset_app_state():
+    """ Limpa o estado da sessão para voltar à tela inicial. """
+    # Devolve os datasets compartilhados (liberados quando nenhuma sessão os usa)
+    for key in ['dataset_riscos', 'dataset_indicadores']:
+        if key in st.session_state:
+            st.session_state[key].release()
+    keys_to_delete = ['app_mode', 'dataset_riscos', 'dataset_indicadores', 'cargas', 'monte_carlo',
+                      'portfolio_falhas', 'fonte_monitorada']
+    for key in keys_to_delete:
+        if key in st.session_state:
+            del st.session_state[key]
+    st.rerun()
+
+
+def submit_loads(uploader_riscos, uploader_planejamento=None):
+    """
+    Submete as cargas dos arquivos ao pool, uma única vez por conjunto de
+    arquivos (as reexecuções do script reaproveitam as mesmas tarefas).
+    Devolve {chave na sessão: LoadTask}.
+    """
+    arquivos = tuple(up.file_id for up in (uploader_riscos, uploader_planejamento) if up is not None)
+    cargas = st.session_state.get('cargas')
+    if cargas is not None and cargas['arquivos'] == arquivos:
+        return cargas['tarefas']
+
+    if uploader_planejamento is None:
+        tarefas = {'dataset_riscos': INGESTION_POOL.submit("riscos", ingest_riscos, uploader_riscos)}
+    elif uploader_riscos.getvalue() == uploader_planejamento.getvalue():
+        # Mesmo arquivo nos dois campos: as três abas saem de uma única leitura
+        tarefa = INGESTION_POOL.submit("integrado", ingest_integrated, uploader_riscos)
+        tarefas = {'dataset_riscos': tarefa, 'dataset_indicadores': tarefa}
+    else:
+        # Riscos primeiro: os Indicadores entram no pool quando os Riscos terminam
+        tarefa_riscos = INGESTION_POOL.submit("riscos", ingest_riscos, uploader_riscos)
+        tarefas = {
+            'dataset_riscos': tarefa_riscos,
+            'dataset_indicadores': INGESTION_POOL.submit("indicadores", ingest_indicadores, uploader_planejamento,
+                                                         after=tarefa_riscos),
+        }
+    st.session_state.cargas = {'arquivos': arquivos, 'tarefas': tarefas}
+    return tarefas
+
+
+def wait_for_riscos(tarefas):
+    """ Barras de progresso de todas as cargas, atualizadas até a de Riscos terminar. """
+    barras = {}
+    for key, tarefa in tarefas.items():
+        if all(tarefa is not outra for outra in barras):
+            barras[tarefa] = (st.progress(0.0, text=CARGA_ROTULOS[key]), CARGA_ROTULOS[key])
+    while True:
+        pronto = tarefas['dataset_riscos'].wait(timeout=0.2)
+        for tarefa, (barra, rotulo) in barras.items():
+            fracao, etapa = tarefa.progress
+            barra.progress(fracao, text=f"{rotulo}: {etapa}")
+        if pronto:
+            break
+
+
+def unit_names(uploaders):
+    """ Nome de cada unidade do Portfólio: o nome do arquivo sem extensão (nomes repetidos ganham um número). """
+    nomes = []
+    for up in uploaders:
+        base = os.path.splitext(up.name)[0]
+        nome, n = base, 2
+        while nome in nomes:
+            nome, n = f"{base} ({n})", n + 1
+        nomes.append(nome)
+    return nomes
+
+
+def submit_portfolio_loads(uploaders):
+    """
+    Submete ao pool a carga de cada planilha do Portfólio (todas em paralelo),
+    uma única vez por conjunto de arquivos. Devolve [(unidade, LoadTask)].
+    """
+    arquivos = tuple(up.file_id for up in uploaders)
+    cargas = st.session_state.get('cargas')
+    if cargas is not None and cargas['arquivos'] == arquivos:
+        return cargas['tarefas']
+
+    tarefas = [(unidade, INGESTION_POOL.submit(unidade, load_riscos_data, up))
+               for unidade, up in zip(unit_names(uploaders), uploaders)]
+    st.session_state.cargas = {'arquivos': arquivos, 'tarefas': tarefas}
+    return tarefas
+
+
+def wait_for_portfolio(tarefas):
+    """ Uma barra de progresso para o Portfólio inteiro, atualizada até todas as planilhas terminarem. """
+    barra = st.progress(0.0, text="Portfólio")
+    while True:
+        pendentes = [tarefa for _, tarefa in tarefas if not tarefa.done()]
+        fracao = sum(tarefa.progress[0] if tarefa in pendentes else 1.0 for _, tarefa in tarefas) / len(tarefas)
+        barra.progress(fracao, text=f"Portfólio: {len(tarefas) - len(pendentes)} de {len(tarefas)} planilhas carregadas")
+        if not pendentes:
+            break
+        pendentes[0].wait(timeout=0.2)
+
+
+def build_portfolio(tarefas):
+    """
+    Junta as planilhas carregadas no dataset do Portfólio e o guarda na sessão.
+    Planilhas com erro ficam de fora ({unidade: mensagens} em 'portfolio_falhas').
+    Devolve False se nenhuma planilha pôde ser carregada.
+    """
+    carregadas, falhas = {}, {}
+    for unidade, tarefa in tarefas:
+        try:
+            carregadas[unidade] = tarefa.result()
+        except WorkbookLoadError as e:
+            falhas[unidade] = e.mensagens
+    st.session_state.portfolio_falhas = falhas
+    if not carregadas:
+        return False
+
+    with st.spinner(f"Combinando {len(carregadas)} unidades no Portfólio..."):
+        dataset_portfolio = combine_units(carregadas)
+        prepare_riscos(dataset_portfolio)
+    # Os dados de cada unidade passam a existir só dentro do Portfólio: libera os
+    # datasets e as cópias em memória do cache (a cópia em disco continua)
+    for handle in carregadas.values():
+        handle.release()
+        WORKBOOK_CACHE.discard(handle.key)
+    del st.session_state['cargas']
+    st.session_state.dataset_riscos = dataset_portfolio
+    return True
+
+
+def open_watched_workbook(nome):
+    """ Abre na sessão a versão corrente de uma planilha da pasta compartilhada; False se ela não está disponível. """
+    versao, handle = FOLDER_WATCHER.acquire(nome)
+    if handle is None:
+        return False
+    st.session_state.dataset_riscos = handle
+    st.session_state.fonte_monitorada = {'nome': nome, 'versao': versao}
+    return True
+
+
+def sync_watched_workbook():
+    """
+    Se a planilha da pasta compartilhada aberta na sessão tem uma versão mais
+    nova, troca o dataset da sessão por ela. Devolve True se trocou.
+    """
+    fonte = st.session_state.get('fonte_monitorada')
+    if fonte is None:
+        return False
+    versao = FOLDER_WATCHER.version(fonte['nome'])
+    if versao is None or versao == fonte['versao']:
+        return False
+    anterior = st.session_state.dataset_riscos
+    if not open_watched_workbook(fonte['nome']):
+        return False
+    anterior.release()
+    return True
+
+
+def session_memory():
+    """ Memória (bytes) de cada DataFrame da sessão, calculada uma vez por dataset. """
+    def build(dataset):
+        return {nome: int(df.memory_usage(deep=True).sum()) for nome, df in dataset.frames.items()}
+    memoria = {}
+    for key in ['dataset_riscos', 'dataset_indicadores']:
+        dataset = st.session_state.get(key)
+        if dataset is not None:
+            memoria.update(dataset.derived("perf:memoria", build))
+    return memoria
+
+
+def render_painel_desempenho():
+    """
+    Painel oculto de desempenho (PAINEL_PERF=1 e ?perf na URL): etapas da
+    última execução, p50/p95 por página e uso do cache de figuras. Desenhado depois de fechada a
+    execução e com st.table (não medido), para não medir a si mesmo.
+    """
+    with st.sidebar.expander("⏱️ Desempenho", expanded=True):
+        execucoes = PERF.runs()
+        if execucoes:
+            ultima = execucoes[0]
+            st.caption(f"Última execução ({ultima['tipo']}): {ultima['ms']:.0f} ms")
+            etapas = sorted(ultima['etapas'], key=lambda etapa: etapa['inicio_ms'])
+            st.table(pd.DataFrame({
+                'Etapa': ["· " * etapa['nivel'] + etapa['etapa'] for etapa in etapas],
+                'ms': [round(etapa['ms'], 1) for etapa in etapas],
+            }).set_index('Etapa'))
+            st.caption("Execuções recentes (ms): " + ", ".join(f"{execucao['ms']:.0f}" for execucao in execucoes))
+        estatisticas = PERF.stage_stats()
+        # Páginas primeiro, depois as demais etapas
+        ordem = sorted(estatisticas, key=lambda etapa: (not etapa.startswith("render_page"), etapa))
+        st.table(pd.DataFrame({
+            'Etapa': ordem,
+            'Chamadas': [estatisticas[etapa][0] for etapa in ordem],
+            'p50 (ms)': [round(estatisticas[etapa][1], 1) for etapa in ordem],
+            'p95 (ms)': [round(estatisticas[etapa][2], 1) for etapa in ordem],
+        }).set_index('Etapa'))
+        figuras = FIGURE_CACHE.usage()
+        pedidos = figuras['hits'] + figuras['misses']
+        acertos = f" ({figuras['hits'] / pedidos:.0%} de acertos)" if pedidos else ""
+        st.caption(f"Cache de figuras: {figuras['hits']} reaproveitadas, {figuras['misses']} montadas{acertos} · "
+                   f"{figuras['figuras']} guardadas, {figuras['bytes'] / 1024 ** 2:.2f} de "
+                   f"{figuras['max_bytes'] / 1024 ** 2:.0f} MB")
+        memoria = session_memory()
+        if memoria:
+            st.caption("Memória da sessão: " + ", ".join(f"{nome} {tamanho / 1024 ** 2:.1f} MB"
+                                                         for nome, tamanho in memoria.items()))
+        st.caption(f"Log: {PERF.log_path}")
+
+
+def open_saved_analysis(arquivo):
+    """
+    Restaura a sessão a partir de uma análise salva (.painel): modo e
+    datasets, sem ler o Excel. Devolve False, com os erros na tela, se o
+    arquivo não serve.
+    """
+    try:
+        with st.spinner("Abrindo a análise salva..."):
+            modo, datasets, extras = read_snapshot(arquivo)
+            prepare_riscos(datasets['dataset_riscos'])
+            if 'dataset_indicadores' in datasets:
+                prepare_indicadores(datasets['dataset_indicadores'])
+    except WorkbookLoadError as e:
+        for mensagem in e.mensagens:
+            st.error(mensagem)
+        return False
+    st.session_state.app_mode = modo
+    st.session_state.update(datasets)
+    if modo == 'portfolio':
+        st.session_state.portfolio_falhas = extras.get('portfolio_falhas', {})
+    return True
+
+
+def render_painel_memoria():
+    """
+    Painel oculto dos operadores (PAINEL_MEMORIA_PAINEL=1 e ?memoria na URL):
+    datasets em memória e no disco, sessões e despejos.
+    """
+    resumo = SESSION_MEMORY.stats()
+    with st.sidebar.expander("🧠 Memória do Servidor", expanded=True):
+        orcamento = f" de {SESSION_MEMORY.orcamento_mb} MB" if SESSION_MEMORY.orcamento_mb else ""
+        st.caption(f"Em memória: {resumo['memoria_mb']:.1f} MB{orcamento} · no disco: {resumo['disco_mb']:.1f} MB · "
+                   f"despejo após {SESSION_MEMORY.ttl / 60:.0f} min sem uso")
+        if resumo['datasets']:
+            st.table(pd.DataFrame({
+                'Dataset': [d['chave'][:24] for d in resumo['datasets']],
+                'Sessões': [d['sessoes'] for d in resumo['datasets']],
+                'MB': [round(d['mb'], 1) for d in resumo['datasets']],
+                'Onde': ["memória" if d['em_memoria'] else "disco" for d in resumo['datasets']],
+                'Sem uso (min)': [round(d['ocioso_s'] / 60, 1) for d in resumo['datasets']],
+            }).set_index('Dataset'))
+        if resumo['sessoes']:
+            st.table(pd.DataFrame({
+                'Sessão': [s['sessao'][:8] for s in resumo['sessoes']],
+                'Vista há (min)': [round(s['visto_ha_s'] / 60, 1) for s in resumo['sessoes']],
+                'MB em memória': [round(s['mb_memoria'], 1) for s in resumo['sessoes']],
+                'MB no disco': [round(s['mb_disco'], 1) for s in resumo['sessoes']],
+            }).set_index('Sessão'))
+        contadores = resumo['contadores']
+        st.caption(f"Despejos: {contadores['despejos_ttl']} por tempo, {contadores['despejos_orcamento']} por orçamento "
+                   f"({contadores['mb_despejados']:.1f} MB) · falhas: {contadores['falhas_despejo']} · "
+                   f"reidratações: {contadores['reidratacoes']} ({contadores['segundos_reidratacao']:.2f} s)")
+
+
+def collect_dataset(key):
+    """
+    Dataset da sessão; se a carga em segundo plano acabou de terminar, guarda
+    o resultado na sessão. None enquanto a carga não termina. Levanta
+    WorkbookLoadError se a carga falhou.
+    """
+    if key in st.session_state:
+        return st.session_state[key]
+    tarefa = st.session_state.cargas['tarefas'][key]
+    if not tarefa.done():
+        return None
+    st.session_state[key] = tarefa.result()[key]
+    return st.session_state[key]
+
+
+# ==================================================================
+# FUNÇÕES DE RENDERIZAÇÃO DE PÁGINA
+# ==================================================================
+# Cada página é um fragmento (st.fragment): mexer em um widget da página
+# reexecuta só a função da página, e não o script inteiro (configuração, CSS,
+# sidebar e roteador). Blocos com widgets próprios, como o slider do
+# simulador, são fragmentos dentro da página.
+
+@st.fragment
+@PERF.timed()
+def render_page_visao_geral(dataset_riscos, unidades):
+    dataset = select_units(dataset_riscos, unidades)
+    cubo = get_overview_cube(dataset)
+    st.header("Visão Geral do Portfólio de Riscos")
+    with st.expander("Filtros da Visão Geral"):
+        filt_col1, filt_col2 = st.columns(2)
+        with filt_col1:
+            filtro_acoes = st.multiselect("Ações Estratégicas:", cubo['acao_estrategica'].dropna().unique().tolist(),
+                                          placeholder="Todas")
+        with filt_col2:
+            filtro_gestores = st.multiselect("Gestores de Risco:", cubo['gestor_risco'].dropna().unique().tolist(),
+                                             placeholder="Todos")
+    cubo = slice_cube(cubo, filtro_acoes, filtro_gestores)
+    kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
+    total_riscos = cube_total(cubo)
+    riscos_ri_inaceitavel = cube_total(cubo, 'avaliacao_ri', 'Inaceitável')
+    riscos_rr_inaceitavel = cube_total(cubo, 'avaliacao_rr', 'Inaceitável')
+    delta_inaceitaveis = riscos_rr_inaceitavel - riscos_ri_inaceitavel
+    with kpi_col1: st.markdown(kpi_card("Total de Riscos Mapeados", total_riscos), unsafe_allow_html=True)
+    with kpi_col2: st.markdown(kpi_card("Riscos Inerentes 'Inaceitáveis'", riscos_ri_inaceitavel, "inaceitavel"),
+                               unsafe_allow_html=True)
+    with kpi_col3: st.markdown(
+        kpi_card_with_delta("Riscos Residuais 'Inaceitáveis'", riscos_rr_inaceitavel, delta_inaceitaveis,
+                            "vs. Risco Inerente", "inaceitavel"), unsafe_allow_html=True)
+    if total_riscos == 0:
+        st.warning("Nenhum risco encontrado para os filtros selecionados.")
+        return
+    st.divider()
+    st.subheader("Análise: Risco Inerente (Antes) vs. Risco Residual (Depois)")
+    # As figuras dependem só do dataset e dos filtros: ficam no cache de figuras
+    params_filtro = (tuple(sorted(filtro_acoes, key=str)), tuple(sorted(filtro_gestores, key=str)))
+
+    def figura(chave):
+        return cached_figure(dataset.key, "visao_geral", (chave,) + params_filtro,
+                             lambda: OVERVIEW_FIGURES[chave](cubo))
+
+    plot_col1, plot_col2, plot_col3 = st.columns(3)
+    with plot_col1:
+        st.write("**Matriz de Risco (Prob x Impacto)**")
+        fig_ri = figura('heatmap_ri')
+        st.plotly_chart(fig_ri, use_container_width=True)
+    with plot_col2:
+        st.write("**Avaliação Inerente (Antes dos Controles)**")
+        fig_ri_bar = figura('avaliacao_ri')
+        st.plotly_chart(fig_ri_bar, use_container_width=True)
+    with plot_col3:
+        st.write("**Avaliação Residual (Depois dos Controles)**")
+        fig_rr = figura('avaliacao_rr')
+        st.plotly_chart(fig_rr, use_container_width=True)
+    st.divider()
+    st.subheader("Detalhamento dos Riscos")
+    plot_col3, plot_col4 = st.columns(2)
+    with plot_col3:
+        fig_class = figura('classificacao')
+        st.plotly_chart(fig_class, use_container_width=True)
+    with plot_col4:
+        fig_gestor = figura('gestor_risco')
+        st.plotly_chart(fig_gestor, use_container_width=True)
+    if COL_UNIDADE in cubo.columns:
+        # Portfólio: distribuição dos riscos entre as unidades
+        fig_unidade = cached_figure(
+            dataset.key, "visao_geral", ('unidade',) + params_filtro,
+            lambda: build_contagem_figure(cubo, COL_UNIDADE, "Contagem de Riscos por Unidade"))
+        st.plotly_chart(fig_unidade, use_container_width=True)
+
+
+def html_text(series):
+    """ Textos das células prontos para o HTML: escapados, com células vazias (NaN) em branco. """
+    return series.astype(object).map(lambda valor: "" if pd.isna(valor) else html.escape(str(valor)))
+
+
+def build_indicator_cards_html(indicadores):
+    """ HTML de todos os cards de indicadores em uma única passada de concatenação de colunas. """
+    def texto(col):
+        return html_text(indicadores[col])
+
+    cards = (
+        '<div class="indicator-card"><h5>' + texto(COL_IND_TITULO) + '</h5>'
+        + f'<p><strong>{FRIENDLY_NAMES[COL_IND_FORMULA]}:</strong> ' + texto(COL_IND_FORMULA) + '</p>'
+        + f'<p><strong>{FRIENDLY_NAMES[COL_IND_SIT_INICIAL]}:</strong> ' + texto(COL_IND_SIT_INICIAL) + '</p>'
+        + f'<p><strong>{FRIENDLY_NAMES[COL_IND_VALOR]}:</strong> ' + texto(COL_IND_VALOR)
+        + ' (' + texto(COL_IND_UNIDADE) + ')</p>'
+        + f'<p><strong>{FRIENDLY_NAMES[COL_IND_PARAMETRO]}:</strong> ' + texto(COL_IND_PARAMETRO) + '</p></div>'
+    )
+    return "".join(cards)
+
+
+def build_risk_list_html(riscos):
+    """ HTML da lista de riscos (cor pela avaliação residual) em um único bloco. """
+    classes = riscos['avaliacao_rr'].map(RISCO_CLASSES_CSS).astype(object).fillna('aceitavel')
+    itens = ('<div class="risk-item ' + classes + '"><strong>Risco:</strong> '
+             + html_text(riscos['evento_risco']) + '</div>')
+    return "".join(itens)
+
+
+def render_risk_details(row):
+    st.markdown(f"**Causas:** {row['causas']}")
+    st.markdown(f"**Consequências:** {row['consequencias']}")
+    st.markdown(f"**Risco Inerente:** {row['nivel_ri']} ({row['avaliacao_ri']})")
+    st.markdown(f"**Risco Residual:** {row['nivel_rr']:.1f} ({row['avaliacao_rr']})")
+    st.markdown(f"**Controle Existente:** {row['desc_controle']} (`{row['nivel_controle']}`)")
+
+
+def render_page_indicadores_pendentes(erros):
+    """ Páginas de Indicadores enquanto a planilha de Planejamento não está disponível. """
+    st.header("Indicadores")
+    if erros:
+        for mensagem in erros:
+            st.error(mensagem)
+        st.info("Use o botão 'Mudar Modo / Novos Arquivos' na barra lateral para carregar outro arquivo.")
+        return
+    st.info("A planilha de Planejamento Estratégico ainda está sendo carregada. "
+            "As páginas de Riscos já podem ser usadas enquanto isso.")
+    render_progresso_indicadores(st.session_state.cargas['tarefas']['dataset_indicadores'])
+
+
+@st.fragment(run_every=CARGA_INTERVALO_SEGUNDOS)
+def render_progresso_indicadores(tarefa):
+    """ Progresso da carga, consultado periodicamente; ao terminar, o app é reexecutado e abre a página. """
+    if tarefa.done():
+        st.rerun()
+    fracao, etapa = tarefa.progress
+    st.progress(fracao, text=etapa)
+
+
+@st.fragment
+def render_salvar_analise(app_mode):
+    """
+    Salvar Análise: o arquivo só é montado quando o botão é clicado (custa
+    uma passada pelos dados) e o download não reexecuta o app.
+    """
+    if not st.button("💾 Salvar Análise", use_container_width=True,
+                     help="Guarda os dados já tratados para reabrir o painel sem a planilha Excel"):
+        return
+    datasets = {key: st.session_state[key] for key in ['dataset_riscos', 'dataset_indicadores']
+                if key in st.session_state}
+    extras = {'portfolio_falhas': st.session_state.portfolio_falhas} if app_mode == 'portfolio' else {}
+    with st.spinner("Gerando o arquivo da análise..."):
+        dados = write_snapshot(app_mode, datasets, extras)
+    st.download_button(f"⬇️ Baixar Análise ({len(dados) / 1024 ** 2:.1f} MB)", dados,
+                       file_name=f"analise_{app_mode}_{time.strftime('%Y%m%d_%H%M')}.{SNAPSHOT_EXTENSAO}",
+                       mime="application/zip", on_click="ignore", use_container_width=True)
+
+
+@st.fragment(run_every=PASTA_INTERVALO_SEGUNDOS)
+def render_escolha_pasta_monitorada():
+    """ Planilhas da pasta compartilhada (a lista se atualiza enquanto a pasta é carregada). """
+    with st.container(border=True):
+        st.markdown(f"**Pasta compartilhada** (`{FOLDER_WATCHER.directory}`): "
+                    "quando um arquivo é alterado na pasta, o painel passa a mostrar a nova versão sozinho.")
+        disponiveis = FOLDER_WATCHER.available()
+        if not disponiveis:
+            st.caption("Nenhuma planilha da pasta foi carregada ainda.")
+            return
+        nome = st.selectbox("Planilha da pasta:", disponiveis)
+        if st.button("Abrir planilha da pasta", type="primary") and open_watched_workbook(nome):
+            st.rerun()
+
+
+@st.fragment(run_every=PASTA_INTERVALO_SEGUNDOS)
+def render_fonte_monitorada(nome, versao):
+    """ Versão exibida da planilha da pasta; quando sai uma nova, o app é reexecutado e troca de dataset. """
+    planilha = FOLDER_WATCHER.status(nome)
+    if planilha is None:
+        st.caption(f"📁 {nome}: removida da pasta compartilhada (exibindo a última versão carregada).")
+        return
+    if planilha.versao != versao:
+        st.rerun()
+    st.caption(f"📁 {nome} · versão de {time.strftime('%d/%m/%Y %H:%M', time.localtime(planilha.atualizado_em))}")
+    if planilha.erros:
+        st.warning("A versão mais recente do arquivo não pôde ser carregada; exibindo a anterior. "
+                   + " ".join(planilha.erros))
+
+
+@st.fragment
+@PERF.timed()
+def render_page_indicadores(dataset_riscos, dataset_indicadores):
+    indice_riscos = get_riscos_index(dataset_riscos)
+    indice_indicadores = get_indicadores_index(dataset_indicadores)
+    lista_completa_acoes = get_acoes_integradas(dataset_riscos, dataset_indicadores)
+    st.header("Análise de Indicadores e Riscos por Ação Estratégica")
+    st.info(
+        "Selecione uma Ação Estratégica para ver os Indicadores de Planejamento e os Riscos de Gestão associados a ela.")
+    acao_selecionada = st.selectbox("Selecione a Ação Estratégica:", lista_completa_acoes)
+    # Em lote: cada coluna vira um único elemento HTML e os detalhes de risco são
+    # montados só para o risco escolhido (bem menos elementos enviados ao navegador)
+    em_lote = st.toggle("Renderização compacta (em lote)", value=True)
+    st.divider()
+    col_ind, col_risc = st.columns(2)
+    with col_ind:
+        st.subheader("Indicadores de Planejamento")
+        indicadores_filtrados = indice_indicadores.indicadores_da_acao(acao_selecionada)
+        if indicadores_filtrados.empty:
+            st.warning("Nenhum indicador de planejamento associado a esta Ação.")
+        else:
+            st.markdown(f"**{FRIENDLY_NAMES[COL_OBJETIVO]}:** _{indicadores_filtrados.iloc[0][COL_OBJETIVO]}_")
+            st.markdown(f"**{FRIENDLY_NAMES[COL_INICIATIVA]}:** _{indicadores_filtrados.iloc[0][COL_INICIATIVA]}_")
+            st.write("")
+            indicadores_exibidos = indicadores_filtrados.head(INDICADORES_MAX_ITENS)
+            if em_lote:
+                st.markdown(build_indicator_cards_html(indicadores_exibidos), unsafe_allow_html=True)
+            else:
+                for _, row in indicadores_exibidos.iterrows():
+                    st.markdown(
+                        f"""
+                        <div class="indicator-card">
+                            <h5>{row[COL_IND_TITULO]}</h5>
+                            <p><strong>{FRIENDLY_NAMES[COL_IND_FORMULA]}:</strong> {row[COL_IND_FORMULA]}</p>
+                            <p><strong>{FRIENDLY_NAMES[COL_IND_SIT_INICIAL]}:</strong> {row[COL_IND_SIT_INICIAL]}</p>
+                            <p><strong>{FRIENDLY_NAMES[COL_IND_VALOR]}:</strong> {row[COL_IND_VALOR]} ({row[COL_IND_UNIDADE]})</p>
+                            <p><strong>{FRIENDLY_NAMES[COL_IND_PARAMETRO]}:</strong> {row[COL_IND_PARAMETRO]}</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+            if len(indicadores_filtrados) > INDICADORES_MAX_ITENS:
+                st.caption(f"Exibindo {INDICADORES_MAX_ITENS} de {len(indicadores_filtrados)} indicadores. "
+                           "Veja todos no Scorecard do Monitoramento de Indicadores.")
+    with col_risc:
+        st.subheader("Riscos de Gestão")
+        riscos_filtrados = indice_riscos.riscos_da_acao(acao_selecionada)
+        if riscos_filtrados.empty:
+            st.warning("Nenhum risco de gestão associado a esta Ação.")
+        elif em_lote:
+            st.markdown(build_risk_list_html(riscos_filtrados.head(INDICADORES_MAX_ITENS)), unsafe_allow_html=True)
+            if len(riscos_filtrados) > INDICADORES_MAX_ITENS:
+                st.caption(f"Exibindo {INDICADORES_MAX_ITENS} de {len(riscos_filtrados)} riscos.")
+            # Detalhes montados só para o risco escolhido
+            posicao_risco = st.selectbox(
+                "Ver detalhes do risco:", range(len(riscos_filtrados)), index=None,
+                format_func=lambda posicao: riscos_filtrados['evento_risco'].iat[posicao],
+                placeholder="Selecione um risco")
+            if posicao_risco is not None:
+                with st.container(border=True):
+                    render_risk_details(riscos_filtrados.iloc[posicao_risco])
+        else:
+            for _, row in riscos_filtrados.head(INDICADORES_MAX_ITENS).iterrows():
+                aval_rr = row['avaliacao_rr']
+                if aval_rr == 'Inaceitável':
+                    st.error(f"**Risco:** {row['evento_risco']}")
+                elif aval_rr == 'Indesejável':
+                    st.warning(f"**Risco:** {row['evento_risco']}")
+                elif aval_rr == 'Gerenciável':
+                    st.info(f"**Risco:** {row['evento_risco']}")
+                else:
+                    st.success(f"**Risco:** {row['evento_risco']}")
+                with st.expander("Ver detalhes do risco"):
+                    render_risk_details(row)
+                st.write("")
+            if len(riscos_filtrados) > INDICADORES_MAX_ITENS:
+                st.caption(f"Exibindo {INDICADORES_MAX_ITENS} de {len(riscos_filtrados)} riscos.")
+
+
+# --- (ATUALIZADA) FUNÇÃO DE PÁGINA: MONITORAMENTO DE INDICADORES ---
+@st.fragment
+@PERF.timed()
+def render_page_monitoramento(dataset_indicadores):
+    indice_indicadores = get_indicadores_index(dataset_indicadores)
+    series = get_indicator_series(dataset_indicadores)
+    scorecard = get_scorecard(dataset_indicadores)
+    st.header("Monitoramento de Indicadores")
+    st.info("Selecione um indicador específico para acompanhar sua evolução mensal em relação à meta.")
+
+    # --- Filtros Dependentes ---
+    acao_selecionada = st.selectbox(
+        "1. Selecione a Ação Estratégica:",
+        indice_indicadores.acoes
+    )
+    
+    lista_indicadores = indice_indicadores.indicadores_por_acao.get(acao_selecionada, [])
+    
+    indicador_selecionado = st.selectbox(
+        "2. Selecione o Indicador para Monitorar:",
+        lista_indicadores
+    )
+    
+    # --- Extração de Dados ---
+    try:
+        ids_indicador = indice_indicadores.linhas_indicador.get((acao_selecionada, indicador_selecionado), SEM_LINHAS)
+        data_indicador = indice_indicadores.df_indicadores.iloc[ids_indicador[0]]
+    except IndexError:
+        st.error("Erro ao selecionar o indicador. Tente novamente.")
+        st.stop()
+        
+    st.divider()
+
+    # --- (NOVO) Card de Características do Indicador ---
+    st.subheader(f"Detalhes: {indicador_selecionado}")
+    st.markdown(
+        f"""
+        <div class="indicator-card">
+            <p><strong>{FRIENDLY_NAMES[COL_ACAO]}:</strong> {data_indicador[COL_ACAO]}</p>
+            <p><strong>{FRIENDLY_NAMES[COL_IND_FORMULA]}:</strong> {data_indicador[COL_IND_FORMULA]}</p>
+            <p><strong>{FRIENDLY_NAMES[COL_IND_PARAMETRO]}:</strong> {data_indicador[COL_IND_PARAMETRO]}</p>
+            <p><strong>{FRIENDLY_NAMES[COL_IND_SIT_INICIAL]}:</strong> {data_indicador[COL_IND_SIT_INICIAL]}</p>
+            <p><strong>{FRIENDLY_NAMES[COL_IND_UNIDADE]}:</strong> {data_indicador[COL_IND_UNIDADE]}</p>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+    st.write("") # Espaço
+
+    # --- KPIs de Status com CÁLCULO CORRIGIDO ---
+    st.subheader(f"Status de Acompanhamento")
+    
+    # Prepara os valores (já convertidos no scorecard de todos os indicadores)
+    score_indicador = scorecard.iloc[ids_indicador[0]]
+    meta_val = score_indicador['meta']
+    realizado_val = score_indicador['realizado']
+    
+    alcance_decimal = score_indicador['alcance']
+    alcance_val = alcance_decimal * 100 if pd.notna(alcance_decimal) else pd.NA
+    
+    # Formata os valores para exibição
+    meta_str = f"{meta_val:,.2f}" if pd.notna(meta_val) else str(data_indicador[COL_IND_VALOR])
+    realizado_str = f"{realizado_val:,.2f}" if pd.notna(realizado_val) else "N/A"
+    alcance_str = f"{alcance_val:.1f}%" if pd.notna(alcance_val) else "N/A"
+
+    # Lógica de Cor
+    alcance_class = "neutral" # Padrão
+    if pd.notna(alcance_val):
+        alcance_class = "alcance-bom" if alcance_val >= 100.0 else "alcance-ruim"
+            
+    kpi1, kpi2, kpi3 = st.columns(3)
+    with kpi1:
+        st.markdown(kpi_card(FRIENDLY_NAMES[COL_IND_VALOR], meta_str, "neutral"), unsafe_allow_html=True)
+    with kpi2:
+        st.markdown(kpi_card(FRIENDLY_NAMES[COL_IND_REALIZADO], realizado_str, "neutral"), unsafe_allow_html=True)
+    with kpi3:
+        st.markdown(kpi_card(FRIENDLY_NAMES[COL_IND_ALCANCE], alcance_str, alcance_class), unsafe_allow_html=True)
+
+    
+    st.write("") # Espaço
+
+    # --- Gráfico de Evolução (Sem alterações) ---
+    st.subheader("Evolução Mensal vs. Meta")
+    
+    if not series.has_data(ids_indicador):
+        st.warning("Não há dados de acompanhamento mensal (Mês 01 a Mês 12) preenchidos para este indicador.")
+    else:
+        def build_evolucao():
+            fig = px.line(
+                series.frame(ids_indicador), 
+                x='Mês', 
+                y='Realizado (mês)', 
+                title=f"Evolução: {indicador_selecionado}",
+                markers=True
+            )
+
+            if pd.notna(meta_val):
+                fig.add_hline(
+                    y=meta_val, 
+                    line_dash="dash", 
+                    line_color="red", 
+                    annotation_text="Meta"
+                )
+
+            fig.update_layout(xaxis_title="Meses de Acompanhamento", yaxis_title=data_indicador[COL_IND_UNIDADE])
+            return fig
+
+        fig = cached_figure(dataset_indicadores.key, "monitoramento", (acao_selecionada, indicador_selecionado),
+                            build_evolucao)
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.divider()
+    render_scorecard_indicadores(scorecard)
+    st.divider()
+    render_comparacao_indicadores(dataset_indicadores, ids_indicador[:1].tolist())
+
+
+def render_scorecard_indicadores(scorecard):
+    """ Scorecard de todos os indicadores (calculado uma vez na carga). """
+    st.subheader("Scorecard de Todos os Indicadores")
+    st.dataframe(
+        scorecard,
+        column_config={
+            COL_ACAO: FRIENDLY_NAMES[COL_ACAO],
+            COL_IND_TITULO: FRIENDLY_NAMES[COL_IND_TITULO],
+            COL_IND_UNIDADE: FRIENDLY_NAMES[COL_IND_UNIDADE],
+            'meta': st.column_config.NumberColumn(FRIENDLY_NAMES[COL_IND_VALOR], format="%.2f"),
+            'realizado': st.column_config.NumberColumn(FRIENDLY_NAMES[COL_IND_REALIZADO], format="%.2f"),
+            'alcance': st.column_config.NumberColumn(FRIENDLY_NAMES[COL_IND_ALCANCE], format="percent"),
+            'meses_reportados': "Meses Reportados",
+            'ultimo_mes': st.column_config.NumberColumn("Último Mês", format="%d"),
+            'ultimo_valor': st.column_config.NumberColumn("Valor do Último Mês", format="%.2f"),
+            'meses_em_falta': st.column_config.NumberColumn(
+                "Meses em Falta", help="Meses sem valor antes do último mês reportado."),
+            'alcance_ultimo_mes': st.column_config.NumberColumn("Último Mês / Meta", format="percent"),
+            'tendencia_mensal': st.column_config.NumberColumn(
+                "Tendência (por mês)", format="%.2f", help="Inclinação da reta ajustada aos meses reportados."),
+            'previsao_dez': st.column_config.NumberColumn("Previsão para Dezembro", format="%.2f"),
+            'previsao_vs_meta': st.column_config.NumberColumn("Previsão / Meta", format="percent"),
+        },
+        hide_index=True
+    )
+
+
+@st.fragment
+@PERF.timed()
+def render_comparacao_indicadores(dataset_indicadores, ids_padrao):
+    """ Evolução de vários indicadores no mesmo gráfico (opcionalmente em % da meta, para unidades diferentes). """
+    series = get_indicator_series(dataset_indicadores)
+    scorecard = get_scorecard(dataset_indicadores)
+    st.subheader("Comparar Indicadores")
+    rotulos = (scorecard[COL_ACAO].astype(str) + " — " + scorecard[COL_IND_TITULO].astype(str)).tolist()
+    ids_comparados = st.multiselect("Indicadores:", list(range(len(rotulos))), default=ids_padrao,
+                                    format_func=lambda indicador_id: rotulos[indicador_id])
+    normalizar = st.toggle("Mostrar em % da meta", value=True)
+    if not ids_comparados:
+        st.info("Selecione um ou mais indicadores para comparar.")
+        return
+
+    def build_comparacao():
+        df_series = series.longo[series.longo['indicador_id'].isin(ids_comparados)].copy()
+        df_series['Indicador'] = [rotulos[indicador_id] for indicador_id in df_series['indicador_id']]
+        df_series['Mês'] = [COL_MESES[mes - 1] for mes in df_series['mes']]
+        if normalizar:
+            df_series['valor'] = df_series['valor'] / scorecard['meta'].to_numpy()[df_series['indicador_id']] * 100
+        fig = px.line(
+            df_series, x='Mês', y='valor', color='Indicador', markers=True,
+            category_orders={'Mês': COL_MESES},
+            labels={'valor': "% da Meta" if normalizar else "Realizado (mês)"}
+        )
+        if normalizar:
+            fig.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Meta")
+        fig.update_layout(xaxis_title="Meses de Acompanhamento", legend=dict(orientation='h', y=-0.2))
+        return fig
+
+    fig = cached_figure(dataset_indicadores.key, "comparacao_indicadores", (tuple(sorted(ids_comparados)), normalizar),
+                        build_comparacao)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+@PERF.timed()
+def render_page_ficha_individual(dataset_riscos, unidades):
+    indice_riscos = get_riscos_index(select_units(dataset_riscos, unidades))
+    st.header("Ficha Individual do Risco")
+    st.info("Selecione um evento de risco para ver seu perfil completo, desde a identificação até o plano de resposta.")
+    risco_selecionado = st.selectbox("Selecione um Evento de Risco para ver seu perfil:", indice_riscos.riscos,
+                                     index=0)
+    risco_data = indice_riscos.risco(risco_selecionado)
+    plano_data = indice_riscos.planos_do_risco(risco_selecionado)
+    st.divider()
+    with st.container(border=True):
+        st.subheader(f"1. Identificação do Risco")
+        st.markdown(f"#### {risco_data['evento_risco']}")
+        st.markdown(f"**{FRIENDLY_NAMES['acao_estrategica']}:** _{risco_data['acao_estrategica']}_")
+        if COL_UNIDADE in risco_data.index:
+            st.markdown(f"**{FRIENDLY_NAMES[COL_UNIDADE]}:** _{risco_data[COL_UNIDADE]}_")
+        id_col1, id_col2 = st.columns(2)
+        with id_col1:
+            st.markdown(f"**{FRIENDLY_NAMES['classificacao']}:** `{risco_data['classificacao']}`")
+            st.markdown(f"**{FRIENDLY_NAMES['gestor_risco']}:** `{risco_data['gestor_risco']}`")
+        with id_col2:
+            st.markdown(f"**{FRIENDLY_NAMES['causas']}:** _{risco_data['causas']}_")
+            st.markdown(f"**{FRIENDLY_NAMES['consequencias']}:** _{risco_data['consequencias']}_")
+    st.write("")
+    with st.container(border=True):
+        st.subheader("2. Análise e Avaliação")
+        eval_col1, eval_col2, eval_col3 = st.columns(3)
+        with eval_col1:
+            st.markdown("##### Risco Inerente (RI)")
+            aval_ri = risco_data['avaliacao_ri']
+            nivel_ri = risco_data['nivel_ri']
+            if aval_ri == 'Inaceitável':
+                st.error(f"### {nivel_ri} ({aval_ri})")
+            elif aval_ri == 'Indesejável':
+                st.warning(f"### {nivel_ri} ({aval_ri})")
+            elif aval_ri == 'Gerenciável':
+                st.info(f"### {nivel_ri} ({aval_ri})")
+            else:
+                st.success(f"### {nivel_ri} ({aval_ri})")
+            st.markdown(f"**{FRIENDLY_NAMES['gp']}:** `{risco_data['gp']}`")
+            st.markdown(f"**{FRIENDLY_NAMES['gi']}:** `{risco_data['gi']}`")
+        with eval_col2:
+            st.markdown("##### Controles Existentes")
+            st.markdown(f"**Descrição:**")
+            st.markdown(f"_{risco_data['desc_controle']}_")
+            st.markdown(f"**Nível:** `{risco_data['nivel_controle']}` (Peso: `{risco_data['avaliacao_controle_ac']}`)")
+        with eval_col3:
+            st.markdown("##### Risco Residual (RR)")
+            aval_rr = risco_data['avaliacao_rr']
+            nivel_rr = risco_data['nivel_rr']
+            if aval_rr == 'Inaceitável':
+                st.error(f"### {nivel_rr:.1f} ({aval_rr})")
+            elif aval_rr == 'Indesejável':
+                st.warning(f"### {nivel_rr:.1f} ({aval_rr})")
+            elif aval_rr == 'Gerenciável':
+                st.info(f"### {nivel_rr:.1f} ({aval_rr})")
+            else:
+                st.success(f"### {nivel_rr:.1f} ({aval_rr})")
+            st.markdown(f"**Resposta ao Risco:** `{risco_data['resposta_risco']}`")
+    st.write("")
+    with st.container(border=True):
+        st.subheader("3. Plano de Resposta (Tratamento)")
+        if plano_data.empty or risco_data['plano_resposta'] == 'Não':
+            st.warning("Este risco não possui um plano de resposta detalhado cadastrado.")
+        else:
+            plano = plano_data.iloc[0]
+            st.info(f"**Detalhes do plano para '{plano['resposta']}' o risco:**")
+            plan_col1, plan_col2 = st.columns(2)
+            with plan_col1:
+                st.markdown(f"**{FRIENDLY_NAMES['o_que']}:**\n_{plano['o_que']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['por_quem']}:**\n_{plano['por_quem']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['quando']}:**\n_{plano['quando']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['onde']}:**\n_{plano['onde']}_")
+            with plan_col2:
+                st.markdown(f"**{FRIENDLY_NAMES['por_que']}:**\n_{plano['por_que']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['como']}:**\n_{plano['como']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['custo']}:**\n_{plano['custo']}_")
+
+
+@st.fragment
+@PERF.timed()
+def render_page_simulador(dataset_riscos, unidades):
+    dataset = select_units(dataset_riscos, unidades)
+    st.header("Simulador de Eficácia dos Controles")
+    modo_simulacao = st.radio("Modo de simulação:",
+                              ["Risco Individual", "Portfólio (Todos os Riscos)", "Monte Carlo (Incerteza)"],
+                              horizontal=True)
+    if modo_simulacao == "Portfólio (Todos os Riscos)":
+        render_simulador_portfolio(dataset['df_mapa'], dataset.key)
+        return
+    if modo_simulacao == "Monte Carlo (Incerteza)":
+        render_simulador_monte_carlo(dataset['df_mapa'], dataset.key)
+        return
+    st.info("Esta ferramenta permite simular o impacto da melhoria de um controle sobre o Risco Residual. (...)")
+    indice_riscos = get_riscos_index(dataset)
+    risco_selecionado = st.selectbox("Selecione um Evento de Risco para simular:", indice_riscos.riscos)
+    risco_data = indice_riscos.risco(risco_selecionado)
+    nivel_ri_fixo = risco_data['nivel_ri']
+    aval_ri_fixa = risco_data['avaliacao_ri']
+    nivel_controle_original = risco_data['nivel_controle']
+    ac_original = risco_data['avaliacao_controle_ac']
+    nivel_rr_original = risco_data['nivel_rr']
+    aval_rr_original = risco_data['avaliacao_rr']
+    st.divider()
+    sim_col1, sim_col2 = st.columns([1, 2])
+    with sim_col1:
+        st.subheader("Dados Iniciais")
+        st.metric(label=f"Risco Inerente (RI) - Fixo", value=f"{nivel_ri_fixo} ({aval_ri_fixa})")
+        st.markdown(f"### Risco Residual Original (RR)")
+        if aval_rr_original == 'Inaceitável':
+            st.error(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
+        elif aval_rr_original == 'Indesejável':
+            st.warning(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
+        elif aval_rr_original == 'Gerenciável':
+            st.info(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
+        else:
+            st.success(f"## {nivel_rr_original:.1f} ({aval_rr_original})")
+        st.caption(f"Baseado no controle original: '{nivel_controle_original}' (Peso: {ac_original})")
+    with sim_col2:
+        render_simulacao_controle(dataset_riscos, unidades, risco_selecionado)
+    st.divider()
+    st.write(f"**Descrição do Risco:** {risco_data['evento_risco']}")
+    st.write(f"**Causas:** {risco_data['causas']}")
+    st.write(f"**Controle Original Descrito:** {risco_data['desc_controle']}")
+
+
+@st.fragment
+@PERF.timed()
+def render_simulacao_controle(dataset_riscos, unidades, risco_selecionado):
+    """ Coluna do slider: arrastá-lo reexecuta só este bloco (que também conta como uso do dataset). """
+    risco_data = get_riscos_index(select_units(dataset_riscos, unidades)).risco(risco_selecionado)
+    nivel_ri_fixo = risco_data['nivel_ri']
+    nivel_controle_original = risco_data['nivel_controle']
+    st.subheader("Simulação")
+    nivel_controle_simulado = st.select_slider("Arraste para simular um novo Nível de Controle:",
+                                               options=CONTROLES_NIVEIS, value=nivel_controle_original)
+    ac_simulado = CONTROLES_PESOS[nivel_controle_simulado]
+    nivel_rr_simulado = nivel_ri_fixo * ac_simulado
+    aval_rr_simulada = get_avaliacao_from_nivel(nivel_rr_simulado)
+    st.markdown(f"### Novo Risco Residual (Simulado)")
+    if aval_rr_simulada == 'Inaceitável':
+        st.error(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
+    elif aval_rr_simulada == 'Indesejável':
+        st.warning(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
+    elif aval_rr_simulada == 'Gerenciável':
+        st.info(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
+    else:
+        st.success(f"## {nivel_rr_simulado:.1f} ({aval_rr_simulada})")
+    st.caption(f"Cálculo: {nivel_ri_fixo} (RI) × {ac_simulado} (Peso de '{nivel_controle_simulado}')")
+
+
+def render_simulador_portfolio(df_mapa, dataset_key):
+    """ Modo portfólio do simulador: muda um nível de controle em todos os riscos de uma vez. """
+    st.info("Escolha, para cada nível de controle, o nível simulado (ex.: todo controle FRACO passa a MEDIANO). "
+            "O Risco Residual de todos os riscos afetados é recalculado de uma só vez.")
+    mapeamento = {}
+    map_cols = st.columns(len(CONTROLES_NIVEIS))
+    for col, nivel in zip(map_cols, CONTROLES_NIVEIS):
+        with col:
+            mapeamento[nivel] = st.selectbox(f"{nivel} passa a:", CONTROLES_NIVEIS,
+                                             index=CONTROLES_NIVEIS.index(nivel), key=f"sim_portfolio_{nivel}")
+    mapeamento = {atual: novo for atual, novo in mapeamento.items() if atual != novo}
+    resultado = simulate_control_mapping(df_mapa, mapeamento, CONTROLES_PESOS)
+    distribuicao = resultado.distribuicao
+    alterados = resultado.alterados
+
+    st.divider()
+    kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
+    inaceitaveis_antes = int(distribuicao.loc['Inaceitável', 'antes'])
+    inaceitaveis_depois = int(distribuicao.loc['Inaceitável', 'depois'])
+    with kpi_col1: st.markdown(kpi_card("Riscos com Controle Alterado", len(alterados)), unsafe_allow_html=True)
+    with kpi_col2: st.markdown(
+        kpi_card("Mudaram de Avaliação Residual",
+                 int((alterados['avaliacao_rr'] != alterados['avaliacao_rr_simulada']).sum())),
+        unsafe_allow_html=True)
+    with kpi_col3: st.markdown(
+        kpi_card_with_delta("Riscos Residuais 'Inaceitáveis' (Simulado)", inaceitaveis_depois,
+                            inaceitaveis_depois - inaceitaveis_antes, "vs. Atual", "inaceitavel"),
+        unsafe_allow_html=True)
+
+    st.subheader("Avaliação Residual: Atual vs. Simulada")
+
+    def build_comparacao():
+        df_comparacao = (distribuicao[['antes', 'depois']]
+                         .rename(columns={'antes': 'Atual', 'depois': 'Simulado'})
+                         .rename_axis('avaliacao_rr').reset_index()
+                         .melt(id_vars='avaliacao_rr', var_name='Cenário', value_name='contagem'))
+        fig = px.bar(
+            df_comparacao, x='avaliacao_rr', y='contagem', color='Cenário', barmode='group', text_auto=True,
+            labels=FRIENDLY_NAMES, category_orders={'avaliacao_rr': CAT_AVALIACAO},
+            color_discrete_sequence=['#9E9E9E', '#003366']
+        )
+        fig.update_layout(xaxis_title=FRIENDLY_NAMES['avaliacao_rr'], yaxis_title=FRIENDLY_NAMES['contagem'],
+                          margin=dict(l=0, r=0, t=40, b=0))
+        return fig
+
+    fig = cached_figure(dataset_key, "simulador_portfolio", tuple(sorted(mapeamento.items())), build_comparacao)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Riscos Afetados")
+    if alterados.empty:
+        st.info("Nenhum risco é afetado pelo mapeamento escolhido.")
+    else:
+        st.dataframe(
+            alterados.drop(columns=['controle_alterado']).rename(columns={
+                **FRIENDLY_NAMES,
+                'nivel_controle_simulado': 'Nível do Controle (Simulado)',
+                'nivel_rr_simulado': 'Nível RR (Simulado)',
+                'variacao_nivel_rr': 'Variação do Nível RR',
+                'avaliacao_rr_simulada': 'Avaliação Residual (Simulada)'
+            }),
+            hide_index=True
+        )
+
+
+def render_simulador_monte_carlo(df_mapa, dataset_key):
+    """ Modo Monte Carlo do simulador: probabilidade de cada faixa de avaliação residual. """
+    st.info("GP e GI podem variar um grau para cima ou para baixo, e a eficácia de cada controle varia em torno "
+            "do peso do seu nível. Cada risco é sorteado milhares de vezes para estimar a chance de cada avaliação.")
+    param_col1, param_col2, param_col3 = st.columns(3)
+    with param_col1:
+        sorteios = st.select_slider("Sorteios por risco:", options=MC_OPCOES_SORTEIOS, value=MC_OPCOES_SORTEIOS[1])
+    with param_col2:
+        incerteza_escala = st.slider("Chance de GP/GI variar um grau (cada lado):", 0.0, 0.5, 0.2, step=0.05)
+    with param_col3:
+        incerteza_controle = st.slider("Variação do peso do controle (±):", 0.0, 0.3, 0.1, step=0.05)
+    paralelo = st.checkbox("Distribuir a simulação entre os processadores do servidor", value=False,
+                           disabled=MC_PROCESSOS < 2)
+    parametros = (dataset_key, sorteios, incerteza_escala, incerteza_controle)
+
+    if st.button("Executar Simulação", type="primary"):
+        with st.spinner(f"Simulando {sorteios:,} cenários para {len(df_mapa):,} riscos..."):
+            resultado = monte_carlo_residual(
+                df_mapa, CONTROLES_PESOS, sorteios=sorteios, incerteza_escala=incerteza_escala,
+                incerteza_controle=incerteza_controle, paralelo=paralelo)
+        st.session_state.monte_carlo = (parametros, resultado)
+
+    if st.session_state.get('monte_carlo', (None,))[0] != parametros:
+        st.caption("Ajuste os parâmetros e clique em 'Executar Simulação'.")
+        return
+    resultado = st.session_state.monte_carlo[1]
+
+    st.divider()
+    percentis = resultado.percentis_inaceitaveis()
+    kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
+    with kpi_col1: st.markdown(kpi_card("Riscos 'Inaceitáveis' (Mediana)", f"{percentis[50]:.0f}", "inaceitavel"),
+                               unsafe_allow_html=True)
+    with kpi_col2: st.markdown(kpi_card("Cenário Otimista (P5)", f"{percentis[5]:.0f}"), unsafe_allow_html=True)
+    with kpi_col3: st.markdown(kpi_card("Cenário Pessimista (P95)", f"{percentis[95]:.0f}", "inaceitavel"),
+                               unsafe_allow_html=True)
+
+    st.subheader("Portfólio: Número Esperado de Riscos por Avaliação Residual")
+    df_portfolio = resultado.portfolio.reset_index()
+    fig = px.bar(
+        df_portfolio, x='avaliacao_rr', y='riscos_esperados', text_auto='.1f',
+        labels={'avaliacao_rr': FRIENDLY_NAMES['avaliacao_rr'], 'riscos_esperados': 'Riscos Esperados'},
+        category_orders={'avaliacao_rr': CAT_AVALIACAO}, color='avaliacao_rr', color_discrete_map=RISK_COLORS
+    )
+    fig.update_layout(margin=dict(l=0, r=0, t=40, b=0), showlegend=False)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Probabilidade de Cada Avaliação por Risco")
+    st.dataframe(
+        resultado.probabilidades.sort_values('Inaceitável', ascending=False),
+        column_config={
+            'evento_risco': FRIENDLY_NAMES['evento_risco'],
+            'avaliacao_rr': 'Avaliação Residual (Planilha)',
+            'nivel_rr_medio': st.column_config.NumberColumn('Nível RR Médio', format="%.2f"),
+            **{cat: st.column_config.ProgressColumn(cat, min_value=0.0, max_value=1.0, format="percent")
+               for cat in CAT_AVALIACAO}
+        },
+        hide_index=True
+    )
+
+
+def render_tabela_paginada(indice_riscos, posicoes, mapa_exibicao, mapa_resumido, filtros):
+    """
+    Mapa de Riscos paginado no servidor: a ordenação usa os índices de
+    ordenação do dataset e só as linhas da página visível vão para o navegador.
+    """
+    opt_col1, opt_col2, opt_col3, opt_col4 = st.columns([2, 1, 1, 1])
+    with opt_col1:
+        coluna_ordem = st.selectbox(
+            "Ordenar por:", [None] + indice_riscos.df_mapa.columns.tolist(),
+            format_func=lambda col: "Ordem da planilha" if col is None else FRIENDLY_NAMES.get(col, col))
+    with opt_col2:
+        decrescente = st.toggle("Decrescente", disabled=coluna_ordem is None)
+    with opt_col3:
+        tamanho_pagina = st.selectbox("Linhas por página:", TABELA_TAMANHOS_PAGINA)
+    n_paginas = max(1, -(-len(posicoes) // tamanho_pagina))
+
+    # Filtros, ordenação ou tamanho novos: volta para a primeira página
+    combinacao = (tuple(sorted(filtros.items())), coluna_ordem, decrescente, tamanho_pagina)
+    if st.session_state.get('tabela_combinacao') != combinacao:
+        st.session_state.tabela_combinacao = combinacao
+        st.session_state.tabela_pagina = 1
+    with opt_col4:
+        pagina = st.number_input(f"Página (de {n_paginas}):", min_value=1, max_value=n_paginas, step=1,
+                                 key='tabela_pagina')
+
+    if coluna_ordem is not None:
+        posicoes = indice_riscos.ordenacao.sort_positions(posicoes, coluna_ordem, decrescente)
+    inicio = (pagina - 1) * tamanho_pagina
+    posicoes_pagina = posicoes[inicio:inicio + tamanho_pagina]
+    textos_completos = st.toggle("Mostrar textos completos (causas, consequências e controles)")
+    tabela = mapa_exibicao if textos_completos else mapa_resumido
+    st.dataframe(tabela.take(posicoes_pagina))
+    if len(posicoes_pagina):
+        st.caption(f"Linhas {inicio + 1}–{inicio + len(posicoes_pagina)} de {len(posicoes)} riscos filtrados.")
+
+
+@st.fragment
+@PERF.timed()
+def render_page_analise_detalhada(dataset_riscos, unidades):
+    dataset = select_units(dataset_riscos, unidades)
+    indice_riscos = get_riscos_index(dataset)
+    mapa_exibicao = get_mapa_exibicao(dataset)
+    mapa_resumido = get_mapa_exibicao_resumida(dataset)
+    st.header("Análise Detalhada (Tabelas)")
+    st.subheader("Filtros de Riscos")
+    lista_acoes = ['Todas'] + indice_riscos.acoes
+    lista_gestores = ['Todos'] + indice_riscos.gestores
+    lista_avaliacoes = ['Todas'] + CAT_AVALIACAO
+    filt_col1, filt_col2, filt_col3 = st.columns(3)
+    with filt_col1:
+        filtro_acao = st.selectbox("Filtrar por Ação Estratégica:", lista_acoes)
+    with filt_col2:
+        filtro_gestor = st.selectbox("Filtrar por Gestor:", lista_gestores)
+    with filt_col3:
+        filtro_aval_rr = st.selectbox("Filtrar por Avaliação Residual:", lista_avaliacoes)
+    st.divider()
+    st.subheader("Mapa de Riscos Filtrado")
+    # Os filtros viram posições de linha (bitmaps pré-calculados, em cache por combinação);
+    # a tabela exibida é só a seleção dessas linhas na tabela Arrow montada na carga
+    filtros = {}
+    if filtro_acao != 'Todas': filtros['acao_estrategica'] = filtro_acao
+    if filtro_gestor != 'Todos': filtros['gestor_risco'] = filtro_gestor
+    if filtro_aval_rr != 'Todas': filtros['avaliacao_rr'] = filtro_aval_rr
+    posicoes = indice_riscos.filtros.select(filtros)
+    modo_tabela = st.radio("Exibição da tabela:", ["Paginada", "Completa"], horizontal=True,
+                           help="A tabela paginada envia ao navegador apenas a página visível.")
+    if modo_tabela == "Paginada":
+        render_tabela_paginada(indice_riscos, posicoes, mapa_exibicao, mapa_resumido, filtros)
+    else:
+        st.dataframe(mapa_exibicao.take(posicoes))
+    st.divider()
+    st.subheader("Detalhamento do Plano de Resposta (Drill-Down)")
+    lista_riscos_filtrados = indice_riscos.df_mapa['evento_risco'].iloc[posicoes].unique().tolist()
+    if not lista_riscos_filtrados:
+        st.warning("Nenhum risco encontrado para os filtros selecionados.")
+    else:
+        risco_selecionado = st.selectbox("Selecione o Evento de Risco para ver o Plano de Resposta:",
+                                         lista_riscos_filtrados)
+        plano_selecionado = indice_riscos.planos_do_risco(risco_selecionado)
+        if plano_selecionado.empty:
+            st.error(f"Plano de resposta não encontrado para o risco: '{risco_selecionado}'")
+        else:
+            plano = plano_selecionado.iloc[0]
+            st.info(f"**Plano de Resposta para:** {plano['evento_risco']}")
+            plan_col1, plan_col2 = st.columns(2)
+            with plan_col1:
+                st.markdown(f"**{FRIENDLY_NAMES['o_que']}:**\n_{plano['o_que']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['por_quem']}:**\n_{plano['por_quem']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['quando']}:**\n_{plano['quando']}_")
+            with plan_col2:
+                st.markdown(f"**{FRIENDLY_NAMES['como']}:**\n_{plano['como']}_")
+                st.markdown(f"**{FRIENDLY_NAMES['custo']}:**\n_{plano['custo']}_")
+
+
+# ==================================================================
+# LÓGICA PRINCIPAL DO APP (ROTEADOR)
+# ==================================================================
+
+# --- Configuração Inicial da Página ---
+st.set_page_config(
+    page_title="Painel de Gestão de Riscos",
+    page_icon="📊",
+    layout="wide"
+)
+# Medição de desempenho (só com PAINEL_PERF=1): a execução vai até o fim do roteador
+PERF.begin_run()
+PERF.instrument(st, "plotly_chart", "st.plotly_chart")
+PERF.instrument(st, "dataframe", "st.dataframe")
+load_css()
+st.title("Painel de Análise de Riscos e Indicadores")
+
+# --- ETAPA 1: Seleção de Modo ---
+if 'app_mode' not in st.session_state:
+    st.header("Selecione o Modo de Análise")
+    st.info("Escolha como você deseja analisar os dados.")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("📊 Análise de Riscos (Padrão)", use_container_width=True):
+            st.session_state.app_mode = 'risk_only'
+            st.rerun()
+    with col2:
+        if st.button("📈 Análise Integrada (Riscos + Indicadores)", use_container_width=True):
+            st.session_state.app_mode = 'integrated'
+            st.rerun()
+    with col3:
+        if st.button("🗂️ Portfólio (Várias Unidades)", use_container_width=True):
+            st.session_state.app_mode = 'portfolio'
+            st.rerun()
+
+    st.divider()
+    arquivo_salvo = st.file_uploader(
+        "Ou reabra uma análise salva (botão \"💾 Salvar Análise\" do painel)",
+        type=[SNAPSHOT_EXTENSAO],
+        help="Abre os dados já tratados, sem ler a planilha Excel de novo"
+    )
+    if arquivo_salvo is not None and open_saved_analysis(arquivo_salvo):
+        st.rerun()
+
+    st.stop()  # Para a execução até que um modo seja escolhido
+
+# --- ETAPA 2: Carregamento de Dados (Baseado no Modo) ---
+app_mode = st.session_state.app_mode
+data_loaded = 'dataset_riscos' in st.session_state
+
+if not data_loaded:
+    st.header("Carregamento de Arquivos")
+
+    if app_mode == 'risk_only':
+        if FOLDER_WATCHER is not None:
+            FOLDER_WATCHER.start()
+            render_escolha_pasta_monitorada()
+        st.info("Por favor, carregue o arquivo de Gestão de Riscos.")
+        uploader_riscos = st.file_uploader(
+            "Arquivo de Gestão de Riscos",
+            type=["xlsx"],
+            help=f"Deve conter as abas '{SHEET_MAPA}' e '{SHEET_PLANO}'"
+        )
+
+        if uploader_riscos is None: st.stop()
+
+        tarefas = submit_loads(uploader_riscos)
+
+    elif app_mode == 'integrated':
+        st.info("Por favor, carregue os dois arquivos .xlsx para iniciar o painel.")
+        col1, col2 = st.columns(2)
+        with col1:
+            uploader_riscos = st.file_uploader(
+                "1. Arquivo de Gestão de Riscos",
+                type=["xlsx"],
+                help=f"Deve conter as abas '{SHEET_MAPA}' e '{SHEET_PLANO}'"
+            )
+        with col2:
+            uploader_planejamento = st.file_uploader(
+                "2. Arquivo de Planejamento Estratégico",
+                type=["xlsx"],
+                help=f"Deve conter a aba '{SHEET_INDICADORES}'"
+            )
+
+        if uploader_riscos is None or uploader_planejamento is None: st.stop()
+
+        # Os dois arquivos são lidos em segundo plano, Riscos primeiro; o painel abre
+        # assim que os Riscos ficam prontos e os Indicadores continuam carregando
+        tarefas = submit_loads(uploader_riscos, uploader_planejamento)
+
+    elif app_mode == 'portfolio':
+        st.info("Carregue as planilhas de Gestão de Riscos das unidades (uma por unidade). "
+                "O nome de cada arquivo identifica a unidade no painel.")
+        uploaders_unidades = st.file_uploader(
+            "Arquivos de Gestão de Riscos das Unidades",
+            type=["xlsx"],
+            accept_multiple_files=True,
+            help=f"Cada arquivo deve conter as abas '{SHEET_MAPA}' e '{SHEET_PLANO}'"
+        )
+
+        if not uploaders_unidades: st.stop()
+        # Os arquivos chegam um a um: a carga só começa quando o usuário confirma a seleção
+        if 'cargas' not in st.session_state and not st.button(
+                f"Carregar Portfólio ({len(uploaders_unidades)} planilhas)", type="primary"):
+            st.stop()
+
+        tarefas = submit_portfolio_loads(uploaders_unidades)
+        wait_for_portfolio(tarefas)
+        if not build_portfolio(tarefas):
+            for unidade, mensagens in st.session_state.portfolio_falhas.items():
+                st.error(f"{unidade}: {' '.join(mensagens)}")
+            st.stop()
+        st.rerun()
+
+    wait_for_riscos(tarefas)
+    try:
+        collect_dataset('dataset_riscos')
+    except WorkbookLoadError as e:
+        for mensagem in e.mensagens:
+            st.error(mensagem)
+        st.stop()
+    st.rerun()
+
+# --- ETAPA 3: Exibição do Aplicativo (Dados Carregados) ---
+
+# Recupera os dados do estado: a sessão guarda só o handle, os DataFrames são
+# compartilhados (somente leitura) entre todas as sessões que abriram o mesmo arquivo
+if sync_watched_workbook():
+    st.toast(f"Planilha '{st.session_state.fonte_monitorada['nome']}' atualizada na pasta compartilhada: "
+             "o painel já mostra a nova versão.")
+# O script guarda só os handles: as páginas (fragmentos) pegam os DataFrames e os
+# derivados a cada execução, e nada do script os mantém na memória depois de um despejo
+dataset_riscos = st.session_state.dataset_riscos
+dataset_indicadores = None
+erros_indicadores = []
+if app_mode == 'integrated':
+    # Os Indicadores podem ainda estar carregando em segundo plano
+    try:
+        dataset_indicadores = collect_dataset('dataset_indicadores')
+    except WorkbookLoadError as e:
+        erros_indicadores = e.mensagens
+handles_sessao = [handle for handle in (dataset_riscos, dataset_indicadores) if handle is not None]
+# Dados de sessões ociosas vão para o disco e voltam no próximo acesso (session_memory)
+SESSION_MEMORY.start()
+SESSION_MEMORY.touch(get_script_run_ctx().session_id, handles_sessao)
+
+# Monta a Sidebar
+st.sidebar.image("risk.jpg", use_container_width=True)
+st.sidebar.title("Navegação")
+
+# Define a lista de páginas com base no modo
+if app_mode in ('risk_only', 'portfolio'):
+    page_list = [
+        "Visão Geral (Dashboard)",
+        "Ficha Individual do Risco",
+        "Simulador de Controles",
+        "Análise Detalhada (Tabelas)"
+    ]
+else:  # modo 'integrated'
+    page_list = [
+        "Visão Geral (Dashboard)",
+        "Ficha Individual do Risco",
+        "Simulador de Controles",
+        "Análise de Indicadores",
+        "Monitoramento de Indicadores",  # <-- (NOVO)
+        "Análise Detalhada (Tabelas)"
+    ]
+
+page = st.sidebar.radio("Selecione a página:", page_list)
+st.sidebar.caption(format_memory_report([df for handle in handles_sessao for df in handle.dataset.frames.values()]))
+if 'fonte_monitorada' in st.session_state:
+    with st.sidebar:
+        render_fonte_monitorada(**st.session_state.fonte_monitorada)
+filtro_unidades = ()
+if app_mode == 'portfolio':
+    # Todas as páginas passam a usar o recorte das unidades escolhidas (select_units, dentro de cada página)
+    unidades = get_unidades(dataset_riscos)
+    filtro_unidades = tuple(st.sidebar.multiselect(f"Unidades ({len(unidades)} no Portfólio):", unidades,
+                                                   placeholder="Todas"))
+    if st.session_state.portfolio_falhas:
+        with st.sidebar.expander(f"{len(st.session_state.portfolio_falhas)} planilha(s) fora do Portfólio"):
+            for unidade, mensagens in st.session_state.portfolio_falhas.items():
+                st.error(f"{unidade}: {' '.join(mensagens)}")
+st.sidebar.divider()
+if app_mode != 'integrated' or dataset_indicadores is not None:
+    # Os Indicadores precisam ter terminado de carregar para entrar na análise salva
+    with st.sidebar:
+        render_salvar_analise(app_mode)
+st.sidebar.button("Mudar Modo / Novos Arquivos", on_click=reset_app_state, use_container_width=True)
+st.sidebar.divider()
+st.sidebar.info(
+    """
+    **Bem-vindo ao Painel de Riscos!**
+    Esta ferramenta transforma suas planilhas em um dashboard interativo.
+    **Instruções para Iniciar:**
+    1.  Tenha seu(s) arquivo(s) `.xlsx` prontos.
+    2.  Verifique se os nomes das abas e colunas 
+        seguem o template original.
+    """
+)
+
+# Roteador de Páginas: os fragmentos recebem os handles (e o recorte de unidades), não os
+# DataFrames, para que o armazenamento de fragmentos não segure dados despejados
+if page == "Visão Geral (Dashboard)":
+    render_page_visao_geral(dataset_riscos, filtro_unidades)
+
+elif page in PAGINAS_INDICADORES and dataset_indicadores is None:
+    render_page_indicadores_pendentes(erros_indicadores)
+
+elif page == "Análise de Indicadores":
+    render_page_indicadores(dataset_riscos, dataset_indicadores)
+
+elif page == "Monitoramento de Indicadores":
+    render_page_monitoramento(dataset_indicadores)  # <-- (NOVO)
+
+elif page == "Ficha Individual do Risco":
+    render_page_ficha_individual(dataset_riscos, filtro_unidades)
+
+elif page == "Simulador de Controles":
+    render_page_simulador(dataset_riscos, filtro_unidades)
+
+elif page == "Análise Detalhada (Tabelas)":
+    render_page_analise_detalhada(dataset_riscos, filtro_unidades)
+
+if MEMORIA_PAINEL and 'memoria' in st.query_params:
+    render_painel_memoria()
+
+if PERF.ativo:
+    PERF.end_run(pagina=page, modo=app_mode, memoria=session_memory())
+    if 'perf' in st.query_params:
+        render_painel_desempenho()
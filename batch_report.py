@@ -0,0 +1,148 @@
+"""
+Relatório em lote da Visão Geral para as planilhas de Riscos de várias unidades.
+
+Uso:
+    python batch_report.py PASTA [--saida DIR] [--workers N] [--padrao "*.xlsx"]
+
+Cada planilha da pasta é carregada com os mesmos carregadores do painel
+(risk_data), em um pool de processos. Para cada unidade é gravado um HTML
+com os KPIs e os gráficos da Visão Geral; ao final, o resumo.json reúne os
+números de todas as unidades e o consolidado, e o consolidado.html traz os
+gráficos do conjunto. Os HTML são autocontidos (plotly.js embutido) e abrem
+sem acesso à internet.
+"""
+import argparse
+import html
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from ingestion import WorkbookLoadError
+from risk_data import OVERVIEW_FIGURES, get_overview_cube, load_riscos_data, overview_summary
+
+SAIDA_PADRAO = "relatorio_lote"
+
+
+def read_source(path):
+    """ Conteúdo do arquivo no formato que os carregadores esperam (como um upload do Streamlit). """
+    fonte = io.BytesIO(Path(path).read_bytes())
+    fonte.name = Path(path).name
+    return fonte
+
+
+def overview_html(titulo, cubo):
+    """ Página HTML autocontida com os KPIs e os gráficos da Visão Geral do cubo. """
+    resumo = overview_summary(cubo)
+    partes = [
+        f"<h1>{html.escape(titulo)}</h1>",
+        "<ul>"
+        f"<li>Total de Riscos Mapeados: <strong>{resumo['total_riscos']}</strong></li>"
+        f"<li>Riscos Inerentes 'Inaceitáveis': <strong>{resumo['ri_inaceitavel']}</strong></li>"
+        f"<li>Riscos Residuais 'Inaceitáveis': <strong>{resumo['rr_inaceitavel']}</strong> "
+        f"({resumo['delta_inaceitavel']:+d} vs. Risco Inerente)</li>"
+        "</ul>",
+    ]
+    if resumo['total_riscos'] == 0:
+        partes.append("<p>Nenhum risco encontrado.</p>")
+    else:
+        # plotly.js vai embutido uma única vez, no primeiro gráfico
+        for i, build in enumerate(OVERVIEW_FIGURES.values()):
+            partes.append(build(cubo).to_html(full_html=False, include_plotlyjs=(i == 0)))
+    return ('<!DOCTYPE html>\n<html lang="pt-BR"><head><meta charset="utf-8">'
+            f'<title>{html.escape(titulo)}</title></head>\n<body>\n' + "\n".join(partes) + '\n</body></html>\n')
+
+
+def process_workbook(path, saida):
+    """
+    Carrega uma planilha e grava o HTML da unidade (executado em um processo
+    do pool). Devolve o resumo da unidade e o cubo da Visão Geral, que volta
+    ao processo principal para o consolidado; se a planilha não puder ser
+    carregada, o resumo traz os erros e o cubo é None.
+    """
+    path = Path(path)
+    unidade = path.stem
+    inicio = time.perf_counter()
+    try:
+        dataset = load_riscos_data(read_source(path))
+    except WorkbookLoadError as e:
+        return {'unidade': unidade, 'arquivo': path.name, 'erros': e.mensagens}, None
+    try:
+        cubo = get_overview_cube(dataset)
+        html_unidade = Path(saida) / f"{unidade}.html"
+        html_unidade.write_text(overview_html(f"Visão Geral - {unidade}", cubo), encoding="utf-8")
+    finally:
+        dataset.release()
+    resumo = {'unidade': unidade, 'arquivo': path.name, 'html': html_unidade.name, **overview_summary(cubo),
+              'segundos': round(time.perf_counter() - inicio, 2)}
+    return resumo, cubo
+
+
+def run_batch(arquivos, saida, workers=None):
+    """ Processa as planilhas (em paralelo com `workers` > 1) e devolve [(resumo, cubo)] na ordem dos arquivos. """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(arquivos) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(arquivos))) as pool:
+            return list(pool.map(process_workbook, arquivos, [saida] * len(arquivos)))
+    return [process_workbook(arquivo, saida) for arquivo in arquivos]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gera os números e gráficos da Visão Geral para todas as planilhas de Riscos de uma pasta.")
+    parser.add_argument("pasta", help="pasta com as planilhas .xlsx das unidades")
+    parser.add_argument("-o", "--saida", default=SAIDA_PADRAO,
+                        help=f"pasta onde gravar resumo.json e os HTML (padrão: {SAIDA_PADRAO})")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="processos do pool (padrão: número de CPUs; 1 = sem pool)")
+    parser.add_argument("--padrao", default="*.xlsx", help="padrão dos nomes de arquivo (padrão: *.xlsx)")
+    args = parser.parse_args(argv)
+
+    # Arquivos "~$..." são os arquivos de bloqueio do Excel
+    arquivos = sorted(p for p in Path(args.pasta).glob(args.padrao) if p.is_file() and not p.name.startswith("~$"))
+    if not arquivos:
+        print(f"Nenhuma planilha '{args.padrao}' encontrada em {args.pasta}.", file=sys.stderr)
+        return 1
+    saida = Path(args.saida)
+    saida.mkdir(parents=True, exist_ok=True)
+
+    inicio = time.perf_counter()
+    resultados = run_batch(arquivos, saida, args.workers)
+    unidades = [resumo for resumo, _ in resultados]
+    cubos = [cubo for _, cubo in resultados if cubo is not None]
+    falhas = [resumo for resumo in unidades if 'erros' in resumo]
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'pasta': str(Path(args.pasta).resolve()),
+        'unidades': unidades,
+    }
+    if cubos:
+        # Cubos são contagens: o consolidado é a soma das unidades
+        cubo_total = pd.concat(cubos, ignore_index=True)
+        relatorio['consolidado'] = {'unidades': len(cubos), 'html': "consolidado.html",
+                                    **overview_summary(cubo_total)}
+        (saida / "consolidado.html").write_text(
+            overview_html(f"Visão Geral - Consolidado ({len(cubos)} unidades)", cubo_total), encoding="utf-8")
+    (saida / "resumo.json").write_text(json.dumps(relatorio, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    for resumo in unidades:
+        if 'erros' in resumo:
+            print(f"[ERRO] {resumo['arquivo']}: {' '.join(resumo['erros'])}")
+        else:
+            print(f"[OK]   {resumo['arquivo']}: {resumo['total_riscos']} riscos, "
+                  f"{resumo['rr_inaceitavel']} residuais 'Inaceitáveis' ({resumo['segundos']:.1f}s)")
+    print(f"{len(unidades) - len(falhas)} de {len(unidades)} planilhas processadas em "
+          f"{time.perf_counter() - inicio:.1f}s. Resultados em {saida.resolve()}")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Gerador de planilhas sintéticas no formato do template, para os benchmarks.
+
+Cada arquivo tem as três abas que o painel lê (SHEET_MAPA, SHEET_PLANO e
+SHEET_INDICADORES), com os cabeçalhos nas mesmas linhas e o mesmo número de
+colunas do template; os nomes e posições vêm de risk_data, então o gerador
+acompanha qualquer mudança no esquema. Os dados são pseudoaleatórios com
+semente fixa: o mesmo tamanho gera sempre o mesmo conteúdo.
+
+Uso:
+    python benchmarks/generate_workbooks.py [--saida DIR] [--tamanhos 100 1000 10000 100000]
+"""
+import argparse
+import datetime
+import random
+import sys
+from pathlib import Path
+
+from openpyxl import Workbook
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from risk_data import (  # noqa: E402
+    CONTROLES_PESOS, HEADER_INDICADORES, HEADER_MAPA, HEADER_PLANO, SHEET_INDICADORES, SHEET_MAPA, SHEET_PLANO,
+    get_avaliacao_from_nivel, indicadores_cols, mapa_cols, plano_cols,
+)
+
+TAMANHOS_PADRAO = [100, 1_000, 10_000, 100_000]
+DADOS_PADRAO = Path(__file__).resolve().parent / "dados"
+# Incrementar quando o conteúdo gerado mudar (o nome do arquivo muda junto)
+GERADOR_VERSAO = 1
+
+CLASSIFICACOES = ["Operacional", "Estratégico", "Legal", "Financeiro", "Imagem", "Tecnológico"]
+RESPOSTAS = ["Mitigar", "Aceitar", "Transferir", "Evitar"]
+SITUACOES = ["Não iniciada", "Em andamento", "Concluída", "Atrasada"]
+UNIDADES_MEDIDA = ["%", "Unidade", "R$", "Dias"]
+PALAVRAS = ("processo sistema contrato prazo equipe orçamento fornecedor dados auditoria norma "
+            "atraso falha revisão controle acesso servidor demanda licitação capacitação sigilo").split()
+
+
+def workbook_path(saida, tamanho, variante=0):
+    sufixo = f"_{variante}" if variante else ""
+    return Path(saida) / f"painel_{tamanho}_v{GERADOR_VERSAO}{sufixo}.xlsx"
+
+
+def _texto(r, minimo, maximo):
+    return " ".join(r.choices(PALAVRAS, k=r.randint(minimo, maximo))).capitalize() + "."
+
+
+def _cabecalho(ws, linha_cabecalho, titulo, rotulos):
+    """ Título, linhas em branco e a linha de cabeçalho na posição do template (header = índice 0). """
+    ws.append([None, titulo])
+    for _ in range(linha_cabecalho - 1):
+        ws.append([])
+    ws.append(rotulos)
+
+
+def _acoes(n):
+    return [f"Ação Estratégica {k + 1:03d}" for k in range(max(5, n // 20))]
+
+
+def write_mapa_e_plano(wb, r, n_riscos, acoes):
+    mapa = wb.create_sheet(SHEET_MAPA)
+    plano = wb.create_sheet(SHEET_PLANO)
+    _cabecalho(mapa, HEADER_MAPA, "MAPA DE RISCOS", [None] + [c.replace("_", " ").title() for c in mapa_cols[1:]])
+    _cabecalho(plano, HEADER_PLANO, "PLANO DE RESPOSTAS", [None] + [c.replace("_", " ").title() for c in plano_cols[1:]])
+    gestores = [f"Gestor {k + 1:02d}" for k in range(max(4, min(40, n_riscos // 50)))]
+    niveis_controle = list(CONTROLES_PESOS)
+    for i in range(n_riscos):
+        acao = r.choice(acoes)
+        evento = f"Risco {i + 1:06d}: {_texto(r, 3, 8)}"
+        causas = _texto(r, 5, 40)
+        gp, gi = r.randint(1, 4), r.randint(1, 4)
+        nivel_controle = r.choice(niveis_controle)
+        nivel_ri = gp * gi
+        nivel_rr = nivel_ri * CONTROLES_PESOS[nivel_controle]
+        resposta = r.choice(RESPOSTAS)
+        mapa.append([
+            None, acao, evento, causas, _texto(r, 5, 30), r.choice(CLASSIFICACOES), r.choice(gestores),
+            gp, gi, nivel_ri, get_avaliacao_from_nivel(nivel_ri), _texto(r, 5, 25), nivel_controle,
+            CONTROLES_PESOS[nivel_controle], nivel_rr, get_avaliacao_from_nivel(nivel_rr), resposta,
+            r.choice(["Sim", "Não"]),
+        ])
+        plano.append([
+            None, acao, evento, causas, resposta, _texto(r, 3, 10),
+            datetime.datetime(2025, r.randint(1, 12), r.randint(1, 28)), r.choice(["Sede", "Regional", "Campo"]),
+            _texto(r, 3, 12), r.choice(gestores), _texto(r, 5, 20), round(r.uniform(0, 50_000), 2),
+        ])
+
+
+def write_indicadores(wb, r, n_indicadores, acoes):
+    ind = wb.create_sheet(SHEET_INDICADORES)
+    _cabecalho(ind, HEADER_INDICADORES, "1.1. PLANO DE AÇÃO", [c.replace("_", " ").title() for c in indicadores_cols])
+    acao_anterior = None
+    for i in range(n_indicadores):
+        # Indicadores agrupados por ação; Objetivo, Iniciativa e Ação só na primeira linha do grupo
+        k = i * len(acoes) // n_indicadores
+        acao = acoes[k]
+        primeira = acao != acao_anterior
+        acao_anterior = acao
+        meta = r.choice([50, 80, 100, 1_000])
+        ultimo_mes = r.randint(0, 12)
+        meses = [round(r.uniform(0, 1.2) * meta, 2) if m < ultimo_mes and r.random() > 0.1 else None
+                 for m in range(12)]
+        realizado = next((v for v in reversed(meses) if v is not None), None)
+        ind.append([
+            f"Objetivo {k // 5 + 1:02d}" if primeira else None, f"Iniciativa {k + 1:03d}" if primeira else None,
+            acao if primeira else None, r.choice(SITUACOES), f"Responsável {r.randint(1, 30):02d}",
+            f"Indicador {i + 1:06d}", "Realizado / Previsto", r.choice(UNIDADES_MEDIDA), 0, meta,
+            r.choice(["Maior melhor", "Menor melhor"]), *meses,
+            realizado, None if realizado is None else round(realizado / meta, 4),
+            "ok", None, None,
+        ])
+
+
+def generate_workbook(path, n_riscos, n_indicadores=None, seed=0):
+    """ Grava uma planilha com `n_riscos` riscos (Mapa e Plano) e `n_indicadores` indicadores (padrão: o mesmo número). """
+    n_indicadores = n_riscos if n_indicadores is None else n_indicadores
+    r = random.Random(seed)
+    # write_only grava linha a linha, sem manter a planilha inteira em memória
+    wb = Workbook(write_only=True)
+    acoes = _acoes(max(n_riscos, n_indicadores))
+    write_mapa_e_plano(wb, r, n_riscos, acoes)
+    write_indicadores(wb, r, n_indicadores, acoes)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return path
+
+
+def ensure_workbook(saida, tamanho, variante=0):
+    """
+    Caminho da planilha do tamanho pedido, gerada só se ainda não existir.
+    Cada `variante` > 0 é outra planilha do mesmo tamanho, com outro conteúdo.
+    """
+    path = workbook_path(saida, tamanho, variante)
+    if not path.exists():
+        generate_workbook(path, tamanho, seed=f"{tamanho}-{variante}" if variante else tamanho)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera planilhas sintéticas no formato do template do painel.")
+    parser.add_argument("-o", "--saida", default=str(DADOS_PADRAO), help=f"pasta de saída (padrão: {DADOS_PADRAO})")
+    parser.add_argument("-t", "--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO,
+                        help="números de riscos e de indicadores de cada planilha")
+    args = parser.parse_args(argv)
+    for tamanho in args.tamanhos:
+        print(ensure_workbook(args.saida, tamanho))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,441 @@
+"""
+Teste de carga: várias sessões simultâneas do painel em um servidor local.
+
+Sobe o app (streamlit run app_v2.py, headless) e abre N sessões pelo mesmo
+protocolo do navegador (websocket /_stcore/stream). Cada sessão percorre o
+roteiro de um analista no modo integrado:
+  - abre o app e escolhe o modo;
+  - envia a planilha sintética (generate_workbooks.py) aos dois campos de
+    upload, pelo mesmo endpoint HTTP do navegador, e espera a carga;
+  - percorre as páginas do menu, move o controle do Simulador de Controles
+    e troca os filtros da Análise Detalhada (--ciclos vezes).
+Entre uma ação e outra a sessão espera um tempo de leitura (--pausa, com
+variação aleatória); widgets dentro de fragmentos reexecutam só o fragmento,
+como no navegador.
+
+Para cada número de sessões (--sessoes), um servidor novo, com o cache de
+planilhas vazio, atende todas as sessões ao mesmo tempo. O relatório traz a
+vazão (ações concluídas por segundo), os percentis de latência das ações
+(do envio até o fim da execução no servidor) e a memória do processo do
+servidor: inicial, pico e final, lida em /proc (só Linux). Com
+--planilhas individual, cada sessão envia uma planilha diferente, sem
+dados compartilhados entre as sessões.
+
+Uso:
+    python benchmarks/load_test.py [--sessoes 1 5 10 20] [--tamanho 1000] [--ciclos 2] [--pausa 0.5]
+                                   [--planilhas compartilhada|individual] [--saida resultados.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import streamlit
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import AsyncHTTPClient
+from tornado.websocket import websocket_connect
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generate_workbooks import DADOS_PADRAO, ensure_workbook  # noqa: E402
+
+SESSOES_PADRAO = [1, 5, 10, 20]
+TAMANHO_PADRAO = 1_000
+SERVIDOR_ESPERA_SEGUNDOS = 60
+ACAO_TIMEOUT_SEGUNDOS = 300
+MEMORIA_INTERVALO_SEGUNDOS = 0.25
+
+# Rótulos dos widgets usados no roteiro (os mesmos do app_v2.py)
+ROTULO_MODO_INTEGRADO = "📈 Análise Integrada (Riscos + Indicadores)"
+ROTULO_UPLOAD_RISCOS = "1. Arquivo de Gestão de Riscos"
+ROTULO_UPLOAD_PLANEJAMENTO = "2. Arquivo de Planejamento Estratégico"
+ROTULO_PAGINA = "Selecione a página:"
+PAGINA_SIMULADOR = "Simulador de Controles"
+ROTULO_CONTROLE_SIMULADO = "Arraste para simular um novo Nível de Controle:"
+PAGINA_ANALISE = "Análise Detalhada (Tabelas)"
+ROTULOS_FILTROS = ["Filtrar por Ação Estratégica:", "Filtrar por Gestor:", "Filtrar por Avaliação Residual:"]
+# Ações medidas no roteiro; as interativas (depois da carga) formam a latência principal do relatório
+ACOES = ['abertura', 'modo', 'upload', 'carga', 'pagina', 'simulador', 'filtro']
+ACOES_INTERATIVAS = ['pagina', 'simulador', 'filtro']
+
+# Fim de uma execução do script (FINISHED_EARLY_FOR_RERUN é seguido por outra execução)
+_FIM_EXECUCAO = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+                 ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY}
+_WIDGETS = ('button', 'radio', 'selectbox', 'multiselect', 'slider', 'file_uploader', 'checkbox', 'number_input')
+_TIPO_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# ==================================================================
+# SERVIDOR
+# ==================================================================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def app_server(log_path):
+    """ Servidor Streamlit do app em uma porta livre, com cache de planilhas próprio; devolve (porta, processo). """
+    porta = free_port()
+    comando = [
+        sys.executable, "-m", "streamlit", "run", str(RAIZ / "app_v2.py"),
+        "--server.headless", "true", "--server.address", "127.0.0.1", "--server.port", str(porta),
+        "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+        # O upload é feito por HTTP sem o cookie XSRF do navegador
+        "--server.enableXsrfProtection", "false",
+    ]
+    env = {**os.environ, "PAINEL_CACHE_DIR": tempfile.mkdtemp(prefix="painel_carga_cache_")}
+    with open(log_path, "a", encoding="utf-8") as log:
+        processo = subprocess.Popen(comando, cwd=RAIZ, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        limite = time.monotonic() + SERVIDOR_ESPERA_SEGUNDOS
+        while True:
+            if processo.poll() is not None:
+                raise RuntimeError(f"O servidor do app terminou ao iniciar; veja {log_path}.")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=1):
+                    break
+            except OSError:
+                if time.monotonic() > limite:
+                    raise RuntimeError(f"O servidor do app não respondeu em {SERVIDOR_ESPERA_SEGUNDOS} s.")
+                time.sleep(0.2)
+        yield porta, processo
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+
+
+def process_memory_mb(pid):
+    """ Memória residente (RSS) do processo em MB; None fora do Linux. """
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_memory(pid, amostras, parar):
+    while not parar.is_set():
+        memoria = process_memory_mb(pid)
+        if memoria is not None:
+            amostras.append(memoria)
+        try:
+            await asyncio.wait_for(parar.wait(), MEMORIA_INTERVALO_SEGUNDOS)
+        except asyncio.TimeoutError:
+            pass
+
+
+# ==================================================================
+# SESSÃO (CLIENTE DO PROTOCOLO DO NAVEGADOR)
+# ==================================================================
+
+class AppSession:
+    """
+    Uma aba do navegador: mantém os widgets da última execução (por rótulo)
+    e os valores escolhidos, e envia cada ação como uma nova execução.
+    """
+
+    def __init__(self, porta):
+        self.porta = porta
+        self.ws = None
+        self.session_id = None
+        self.widgets = {}
+        self.estados = {}
+        self.latencias = []
+        self.erros = []
+        self._urls = {}
+
+    async def connect(self):
+        self.ws = await websocket_connect(f"ws://127.0.0.1:{self.porta}/_stcore/stream", subprotocols=["streamlit"],
+                                          max_message_size=1024 ** 3)
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    # --- Leitura das mensagens do servidor ---
+
+    async def _receive(self):
+        dados = await asyncio.wait_for(self.ws.read_message(), ACAO_TIMEOUT_SEGUNDOS)
+        if dados is None:
+            raise ConnectionError("O servidor fechou a conexão.")
+        msg = ForwardMsg()
+        msg.ParseFromString(dados)
+        tipo = msg.WhichOneof('type')
+        if tipo == 'new_session':
+            self.session_id = msg.new_session.initialize.session_id
+            if not msg.new_session.fragment_ids_this_run:
+                # Execução completa: a tela é redesenhada do zero
+                self.widgets = {}
+        elif tipo == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            elemento = msg.delta.new_element
+            tipo_elemento = elemento.WhichOneof('type')
+            if tipo_elemento in _WIDGETS:
+                widget = getattr(elemento, tipo_elemento)
+                self.widgets[widget.label] = (tipo_elemento, widget, msg.delta.fragment_id)
+            elif tipo_elemento == 'exception':
+                self.erros.append(f"{elemento.exception.type}: {elemento.exception.message}")
+        elif tipo == 'file_urls_response':
+            self._urls[msg.file_urls_response.response_id] = msg.file_urls_response
+        return msg
+
+    async def _run(self, acao, fragment_id=""):
+        """ Envia os valores dos widgets como uma nova execução e espera ela terminar. """
+        ids = {widget.id for _, widget, _ in self.widgets.values()}
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.page_script_hash = ""
+        back.rerun_script.fragment_id = fragment_id
+        back.rerun_script.widget_states.widgets.extend(estado for id_, estado in self.estados.items() if id_ in ids)
+        # Botões valem só para a execução em que foram clicados
+        self.estados = {id_: estado for id_, estado in self.estados.items() if not estado.trigger_value}
+        inicio = time.perf_counter()
+        await self.ws.write_message(back.SerializeToString(), binary=True)
+        while True:
+            msg = await self._receive()
+            if msg.WhichOneof('type') == 'script_finished' and msg.script_finished in _FIM_EXECUCAO:
+                break
+        self.latencias.append((acao, time.perf_counter() - inicio))
+
+    def _widget(self, rotulo):
+        if rotulo not in self.widgets:
+            raise LookupError(f"Widget '{rotulo}' não está na tela (o roteiro não acompanha mais o app_v2.py?).")
+        return self.widgets[rotulo]
+
+    # --- Ações do usuário ---
+
+    async def open(self):
+        await self._run('abertura')
+
+    def options(self, rotulo):
+        return list(self._widget(rotulo)[1].options)
+
+    def has_widget(self, rotulo):
+        return rotulo in self.widgets
+
+    async def click(self, rotulo, acao):
+        _, widget, fragmento = self._widget(rotulo)
+        self.estados[widget.id] = WidgetState(id=widget.id, trigger_value=True)
+        await self._run(acao, fragmento)
+
+    async def choose(self, rotulo, opcao, acao):
+        """ Escolhe `opcao` em um radio, selectbox ou select_slider. """
+        tipo, widget, fragmento = self._widget(rotulo)
+        estado = WidgetState(id=widget.id)
+        if tipo == 'radio':
+            estado.int_value = list(widget.options).index(opcao)
+        elif tipo == 'slider':
+            estado.double_array_value.data.append(list(widget.options).index(opcao))
+        else:
+            estado.string_value = opcao
+        self.estados[widget.id] = estado
+        await self._run(acao, fragmento)
+
+    async def upload(self, rotulo, nome, conteudo, acao):
+        """ Envia o arquivo como o navegador: pede a URL, faz o PUT e executa com o arquivo no campo. """
+        _, widget, fragmento = self._widget(rotulo)
+        pedido = str(uuid.uuid4())
+        back = BackMsg()
+        back.file_urls_request.request_id = pedido
+        back.file_urls_request.file_names.append(nome)
+        back.file_urls_request.session_id = self.session_id
+        inicio = time.perf_counter()
+        await self.ws.write_message(back.SerializeToString(), binary=True)
+        while pedido not in self._urls:
+            await self._receive()
+        resposta = self._urls.pop(pedido)
+        if resposta.error_msg:
+            raise RuntimeError(f"Upload recusado pelo servidor: {resposta.error_msg}")
+        urls = resposta.file_urls[0]
+        fronteira = uuid.uuid4().hex
+        corpo = (f'--{fronteira}\r\nContent-Disposition: form-data; name="file"; filename="{nome}"\r\n'
+                 f'Content-Type: {_TIPO_XLSX}\r\n\r\n').encode() + conteudo + f'\r\n--{fronteira}--\r\n'.encode()
+        await AsyncHTTPClient().fetch(f"http://127.0.0.1:{self.porta}{urls.upload_url}", method="PUT", body=corpo,
+                                      headers={"Content-Type": f"multipart/form-data; boundary={fronteira}"},
+                                      request_timeout=ACAO_TIMEOUT_SEGUNDOS)
+        estado = WidgetState(id=widget.id)
+        arquivo = estado.file_uploader_state_value.uploaded_file_info.add()
+        arquivo.file_id = urls.file_id
+        arquivo.name = nome
+        arquivo.size = len(conteudo)
+        arquivo.file_urls.CopyFrom(urls)
+        self.estados[widget.id] = estado
+        await self._run(acao, fragmento)
+        # O tempo do upload inclui o envio do arquivo, não só a execução
+        self.latencias[-1] = (acao, time.perf_counter() - inicio)
+
+
+# ==================================================================
+# ROTEIRO E RODADAS
+# ==================================================================
+
+async def analyst_flow(sessao, planilha, ciclos, pausa, rng):
+    """ Roteiro de um analista no modo integrado (a mesma planilha nos dois campos de upload). """
+    async def pensar():
+        if pausa:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * pausa)
+
+    conteudo = planilha.read_bytes()
+    await sessao.connect()
+    try:
+        await sessao.open()
+        await pensar()
+        await sessao.click(ROTULO_MODO_INTEGRADO, 'modo')
+        await pensar()
+        await sessao.upload(ROTULO_UPLOAD_RISCOS, planilha.name, conteudo, 'upload')
+        await sessao.upload(ROTULO_UPLOAD_PLANEJAMENTO, planilha.name, conteudo, 'carga')
+        for _ in range(ciclos):
+            for pagina in sessao.options(ROTULO_PAGINA):
+                await pensar()
+                await sessao.choose(ROTULO_PAGINA, pagina, 'pagina')
+                if pagina == PAGINA_SIMULADOR:
+                    for nivel in rng.sample(sessao.options(ROTULO_CONTROLE_SIMULADO), 2):
+                        await pensar()
+                        await sessao.choose(ROTULO_CONTROLE_SIMULADO, nivel, 'simulador')
+                elif pagina == PAGINA_ANALISE:
+                    for rotulo in ROTULOS_FILTROS:
+                        await pensar()
+                        await sessao.choose(rotulo, rng.choice(sessao.options(rotulo)), 'filtro')
+    finally:
+        sessao.close()
+
+
+def percentiles_ms(valores):
+    if not valores:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+    return {'p50_ms': round(p50 * 1000, 1), 'p95_ms': round(p95 * 1000, 1), 'p99_ms': round(p99 * 1000, 1),
+            'max_ms': round(max(valores) * 1000, 1)}
+
+
+async def run_level(porta, pid, planilhas, ciclos, pausa):
+    """ Todas as sessões ao mesmo tempo contra o servidor; devolve as métricas da rodada. """
+    sessoes = [AppSession(porta) for _ in planilhas]
+    amostras, parar = [], asyncio.Event()
+    memoria_inicial = process_memory_mb(pid)
+    amostrador = asyncio.create_task(sample_memory(pid, amostras, parar))
+    inicio = time.perf_counter()
+    falhas = await asyncio.gather(*(analyst_flow(sessao, planilha, ciclos, pausa, random.Random(i))
+                                    for i, (sessao, planilha) in enumerate(zip(sessoes, planilhas))),
+                                  return_exceptions=True)
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await amostrador
+
+    latencias = [latencia for sessao in sessoes for latencia in sessao.latencias]
+    erros = [erro for sessao in sessoes for erro in sessao.erros]
+    erros += [f"{type(falha).__name__}: {falha}" for falha in falhas if isinstance(falha, BaseException)]
+    return {
+        'sessoes': len(sessoes),
+        'segundos': round(duracao, 2),
+        'acoes': len(latencias),
+        'acoes_por_segundo': round(len(latencias) / duracao, 2),
+        **percentiles_ms([s for acao, s in latencias if acao in ACOES_INTERATIVAS]),
+        'por_acao': {acao: percentiles_ms([s for a, s in latencias if a == acao]) for acao in ACOES},
+        'memoria_mb': {'inicial': memoria_inicial, 'pico': max(amostras, default=None),
+                       'final': process_memory_mb(pid)},
+        'erros': erros,
+    }
+
+
+def workbooks_for(n_sessoes, tamanho, modo, dados):
+    if modo == 'compartilhada':
+        return [ensure_workbook(dados, tamanho)] * n_sessoes
+    return [ensure_workbook(dados, tamanho, variante=i + 1) for i in range(n_sessoes)]
+
+
+# ==================================================================
+# RELATÓRIO
+# ==================================================================
+
+def _fmt(valor, formato):
+    return "-" if valor is None else format(valor, formato)
+
+
+def print_report(rodadas):
+    print(f"{'sessões':>7} {'ações':>6} {'ações/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} "
+          f"{'RSS ini MB':>10} {'pico MB':>8} {'fim MB':>8} {'erros':>6}")
+    for r in rodadas:
+        memoria = r['memoria_mb']
+        print(f"{r['sessoes']:>7} {r['acoes']:>6} {r['acoes_por_segundo']:>8.2f} {_fmt(r['p50_ms'], '8.0f')} "
+              f"{_fmt(r['p95_ms'], '8.0f')} {_fmt(r['p99_ms'], '8.0f')} {_fmt(r['max_ms'], '8.0f')} "
+              f"{_fmt(memoria['inicial'], '10.0f')} {_fmt(memoria['pico'], '8.0f')} {_fmt(memoria['final'], '8.0f')} "
+              f"{len(r['erros']):>6}")
+    print("\np50 / p95 (ms) por ação:")
+    print(f"{'sessões':>7} " + " ".join(f"{acao:>15}" for acao in ACOES))
+    for r in rodadas:
+        print(f"{r['sessoes']:>7} " + " ".join(
+            f"{_fmt(r['por_acao'][acao]['p50_ms'], '.0f') + ' / ' + _fmt(r['por_acao'][acao]['p95_ms'], '.0f'):>15}"
+            for acao in ACOES))
+    base = rodadas[0]['p95_ms']
+    if base:
+        print("\np95 das ações interativas em relação à rodada de "
+              f"{rodadas[0]['sessoes']} sessão(ões): "
+              + ", ".join(f"{r['sessoes']}: {r['p95_ms'] / base:.1f}x" for r in rodadas if r['p95_ms']))
+    for r in rodadas:
+        for erro in r['erros'][:5]:
+            print(f"[{r['sessoes']} sessões] {erro}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do painel com sessões simultâneas.")
+    parser.add_argument("-s", "--sessoes", type=int, nargs="+", default=SESSOES_PADRAO,
+                        help="números de sessões simultâneas, uma rodada cada (padrão: 1 5 10 20)")
+    parser.add_argument("-t", "--tamanho", type=int, default=TAMANHO_PADRAO,
+                        help=f"riscos/indicadores da planilha enviada (padrão: {TAMANHO_PADRAO})")
+    parser.add_argument("-c", "--ciclos", type=int, default=2, help="voltas pelas páginas por sessão (padrão: 2)")
+    parser.add_argument("-p", "--pausa", type=float, default=0.5,
+                        help="tempo médio de leitura entre ações, em segundos (padrão: 0.5; 0 = sem pausa)")
+    parser.add_argument("--planilhas", choices=['compartilhada', 'individual'], default='compartilhada',
+                        help="todas as sessões com a mesma planilha ou uma planilha diferente por sessão")
+    parser.add_argument("--dados", default=str(DADOS_PADRAO), help="pasta das planilhas geradas")
+    parser.add_argument("-o", "--saida", help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    log_path = Path(tempfile.gettempdir()) / "painel_carga_servidor.log"
+    rodadas = []
+    for n_sessoes in args.sessoes:
+        planilhas = workbooks_for(n_sessoes, args.tamanho, args.planilhas, args.dados)
+        print(f"Rodada com {n_sessoes} sessão(ões) simultânea(s)...", file=sys.stderr)
+        with app_server(log_path) as (porta, processo):
+            rodadas.append(asyncio.run(run_level(porta, processo.pid, planilhas, args.ciclos, args.pausa)))
+    print_report(rodadas)
+    if args.saida:
+        execucao = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'ambiente': {'python': platform.python_version(), 'streamlit': streamlit.__version__,
+                         'plataforma': platform.platform(), 'cpus': os.cpu_count()},
+            'parametros': {'tamanho': args.tamanho, 'ciclos': args.ciclos, 'pausa': args.pausa,
+                           'planilhas': args.planilhas},
+            'rodadas': rodadas,
+        }
+        Path(args.saida).write_text(json.dumps(execucao, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 1 if any(r['erros'] for r in rodadas) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
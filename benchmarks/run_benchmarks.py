@@ -0,0 +1,283 @@
+"""
+Benchmarks da carga das planilhas e das páginas do painel.
+
+Para cada tamanho de planilha sintética (generate_workbooks.py), mede:
+  - parse_riscos / parse_indicadores: sondagem do esquema + leitura das abas;
+  - limpeza_riscos / limpeza_indicadores: clean_riscos_data / clean_indicadores_data;
+  - carga_integrada: load_integrated_data de ponta a ponta, sem cache;
+  - indices_agregados: cubo, índices e scorecard montados para um dataset novo;
+  - render:<página>: execução do app no AppTest (harness headless do
+    Streamlit) no modo integrado, com os caches de figuras e derivados vazios;
+    render:inicial é a primeira execução (script + Visão Geral).
+
+Os tempos são a mediana de --repeticoes execuções; o pico de memória
+(tracemalloc) é medido em uma execução separada, para não pesar nos tempos.
+O resultado é comparado com benchmarks/baseline.json: uma etapa regride se
+tempo ou pico de memória passam do baseline em mais de --limite (e da folga
+absoluta, que absorve o ruído das etapas muito curtas). Com regressão, o
+script termina com código 1. O baseline só vale para a máquina em que foi
+gravado: regrave-o com --atualizar-baseline na máquina de referência.
+
+Uso:
+    python benchmarks/run_benchmarks.py [--tamanhos 100 1000] [--repeticoes 3] [--limite 0.25]
+                                        [--atualizar-baseline] [--saida resultados.json]
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+# Cache de planilhas em uma pasta descartável: as medições de carga são sempre "a frio"
+os.environ["PAINEL_CACHE_DIR"] = tempfile.mkdtemp(prefix="painel_bench_cache_")
+
+import pandas as pd  # noqa: E402
+import streamlit  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from batch_report import read_source  # noqa: E402
+from dataset_store import Dataset  # noqa: E402
+from figure_cache import FIGURE_CACHE  # noqa: E402
+from generate_workbooks import DADOS_PADRAO, ensure_workbook  # noqa: E402
+from risk_data import (  # noqa: E402
+    HEADER_INDICADORES, HEADER_MAPA, HEADER_PLANO, SHEET_INDICADORES, SHEET_MAPA, SHEET_PLANO,
+    check_workbook_schema, clean_indicadores_data, clean_riscos_data, load_integrated_data, prepare_indicadores,
+    prepare_riscos, read_workbook_sheets,
+)
+from workbook_cache import WORKBOOK_CACHE  # noqa: E402
+from workbook_reader import select_backend  # noqa: E402
+
+BASELINE_PADRAO = Path(__file__).resolve().parent / "baseline.json"
+TAMANHOS_PADRAO = [100, 1_000]
+LIMITE_PADRAO = 0.25
+# Diferenças abaixo destas folgas nunca contam como regressão (ruído de medição)
+FOLGA_SEGUNDOS = 0.1
+FOLGA_MB = 2.0
+APP_TIMEOUT_SEGUNDOS = 600
+
+
+# ==================================================================
+# ETAPAS MEDIDAS
+# ==================================================================
+
+def _read(path, abas):
+    fonte = read_source(path)
+    check_workbook_schema(fonte, list(abas))
+    return read_workbook_sheets(fonte, abas)
+
+
+def loader_stages(path):
+    """ {etapa: (preparo, medida)}: só `medida(preparo())` entra na medição. """
+    abas_riscos = {SHEET_MAPA: HEADER_MAPA, SHEET_PLANO: HEADER_PLANO}
+    abas_indicadores = {SHEET_INDICADORES: HEADER_INDICADORES}
+    lidas_riscos = _read(path, abas_riscos)
+    lidas_indicadores = _read(path, abas_indicadores)
+
+    def sem_cache():
+        WORKBOOK_CACHE.clear()
+        return read_source(path)
+
+    def indices(handles):
+        riscos, indicadores = handles
+        # Datasets fora do registro: nenhum derivado vem pronto de uma medição anterior
+        prepare_riscos(Dataset("bench-riscos", riscos.dataset.frames))
+        prepare_indicadores(Dataset("bench-indicadores", indicadores.dataset.frames))
+
+    return {
+        'parse_riscos': (lambda: None, lambda _: _read(path, abas_riscos)),
+        'limpeza_riscos': (lambda: copy.deepcopy(lidas_riscos),
+                           lambda abas: clean_riscos_data(abas[SHEET_MAPA], abas[SHEET_PLANO])),
+        'parse_indicadores': (lambda: None, lambda _: _read(path, abas_indicadores)),
+        'limpeza_indicadores': (lambda: copy.deepcopy(lidas_indicadores),
+                                lambda abas: clean_indicadores_data(abas[SHEET_INDICADORES])),
+        'carga_integrada': (sem_cache, lambda fonte: [h.release() for h in load_integrated_data(fonte)]),
+        'indices_agregados': (lambda: load_integrated_data(read_source(path)), indices),
+    }
+
+
+def render_pages(path, medir):
+    """
+    Executa o app no AppTest com a planilha carregada na sessão; `medir`
+    roda a primeira execução e a de cada página do menu. Devolve {etapa: medida}.
+    """
+    FIGURE_CACHE.clear()
+    dataset_riscos, dataset_indicadores = load_integrated_data(read_source(path))
+    try:
+        # Dataset recém-registrado: tabelas Arrow e figuras são montadas durante a medição
+        prepare_riscos(dataset_riscos)
+        prepare_indicadores(dataset_indicadores)
+        app = AppTest.from_file(str(RAIZ / "app_v2.py"), default_timeout=APP_TIMEOUT_SEGUNDOS)
+        app.session_state['app_mode'] = 'integrated'
+        app.session_state['dataset_riscos'] = dataset_riscos
+        app.session_state['dataset_indicadores'] = dataset_indicadores
+        medidas = {'render:inicial': medir(app.run)}
+        _check(app, 'inicial')
+        for pagina in app.sidebar.radio[0].options:
+            medidas[f"render:{pagina}"] = medir(lambda: app.sidebar.radio[0].set_value(pagina).run())
+            _check(app, pagina)
+        return medidas
+    finally:
+        dataset_riscos.release()
+        dataset_indicadores.release()
+
+
+def _check(app, pagina):
+    if app.exception:
+        raise RuntimeError(f"A página '{pagina}' falhou no AppTest: {app.exception[0].message}")
+
+
+# ==================================================================
+# MEDIÇÃO
+# ==================================================================
+
+def elapsed_seconds(executar):
+    inicio = time.perf_counter()
+    executar()
+    return time.perf_counter() - inicio
+
+
+def peak_memory(executar):
+    """ Memória alocada além da já existente no pico da execução (requer tracemalloc ativo). """
+    antes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    executar()
+    return tracemalloc.get_traced_memory()[1] - antes
+
+
+def run_stages(path, medir):
+    medidas = {}
+    for etapa, (preparo, medida) in loader_stages(path).items():
+        entrada = preparo()
+        medidas[etapa] = medir(lambda: medida(entrada))
+        if isinstance(entrada, tuple):
+            for handle in entrada:
+                handle.release()
+    medidas.update(render_pages(path, medir))
+    return medidas
+
+
+def measure(path, repeticoes):
+    """ {etapa: {'segundos': mediana das repetições, 'pico_mb': pico de memória}} de uma planilha. """
+    amostras = [run_stages(path, elapsed_seconds) for _ in range(repeticoes)]
+    # O rastreamento deixa tudo mais lento: o pico é medido em uma execução à parte
+    tracemalloc.start()
+    try:
+        picos = run_stages(path, peak_memory)
+    finally:
+        tracemalloc.stop()
+    return {
+        etapa: {'segundos': round(statistics.median(amostra[etapa] for amostra in amostras), 4),
+                'pico_mb': round(pico / 1024 ** 2, 2)}
+        for etapa, pico in picos.items()
+    }
+
+
+def environment(paths):
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'streamlit': streamlit.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'backend_leitura': {tamanho: select_backend(read_source(path)).name for tamanho, path in paths.items()},
+    }
+
+
+# ==================================================================
+# COMPARAÇÃO COM O BASELINE
+# ==================================================================
+
+def compare(resultados, baseline, limite):
+    """ Linhas [(tamanho, etapa, métrica, atual, baseline, variação, regrediu)] das etapas presentes nos dois. """
+    linhas = []
+    for tamanho, etapas in resultados.items():
+        for etapa, atual in etapas.items():
+            base = baseline.get(tamanho, {}).get(etapa)
+            if base is None:
+                continue
+            for metrica, folga in (('segundos', FOLGA_SEGUNDOS), ('pico_mb', FOLGA_MB)):
+                variacao = atual[metrica] / base[metrica] - 1 if base[metrica] else 0.0
+                regrediu = variacao > limite and atual[metrica] - base[metrica] > folga
+                linhas.append((tamanho, etapa, metrica, atual[metrica], base[metrica], variacao, regrediu))
+    return linhas
+
+
+def print_report(resultados, comparacao):
+    por_chave = {(t, e, m): (b, v, r) for t, e, m, _, b, v, r in comparacao}
+    print(f"{'tamanho':>8}  {'etapa':<45} {'segundos':>9} {'pico MB':>9}  baseline (s / MB)")
+    for tamanho, etapas in resultados.items():
+        for etapa, atual in etapas.items():
+            texto_base = []
+            for metrica in ('segundos', 'pico_mb'):
+                if (tamanho, etapa, metrica) in por_chave:
+                    base, variacao, regrediu = por_chave[(tamanho, etapa, metrica)]
+                    texto_base.append(f"{base:g} ({variacao:+.0%}){' REGRESSÃO' if regrediu else ''}")
+            print(f"{tamanho:>8}  {etapa:<45} {atual['segundos']:>9.3f} {atual['pico_mb']:>9.1f}  "
+                  + (" / ".join(texto_base) or "-"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede carga e páginas do painel e compara com o baseline.")
+    parser.add_argument("-t", "--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO,
+                        help="números de riscos/indicadores das planilhas medidas (padrão: 100 1000)")
+    parser.add_argument("-r", "--repeticoes", type=int, default=3, help="execuções por etapa (mediana; padrão: 3)")
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO,
+                        help=f"aumento relativo tolerado antes de acusar regressão (padrão: {LIMITE_PADRAO})")
+    parser.add_argument("--dados", default=str(DADOS_PADRAO), help="pasta das planilhas geradas")
+    parser.add_argument("--baseline", default=str(BASELINE_PADRAO), help="arquivo do baseline")
+    parser.add_argument("--atualizar-baseline", action="store_true",
+                        help="grava os resultados como novo baseline (mantém os tamanhos não medidos)")
+    parser.add_argument("-o", "--saida", help="grava os resultados desta execução em JSON")
+    args = parser.parse_args(argv)
+
+    # O app usa caminhos relativos à raiz do projeto (imagem da sidebar)
+    os.chdir(RAIZ)
+    # Avisos de depreciação do Streamlit a cada execução do app só poluiriam o relatório
+    logging.disable(logging.WARNING)
+    paths = {str(tamanho): ensure_workbook(args.dados, tamanho) for tamanho in args.tamanhos}
+    resultados = {}
+    for tamanho, path in paths.items():
+        print(f"Medindo a planilha de {tamanho} riscos/indicadores ({path.name})...", file=sys.stderr)
+        resultados[tamanho] = measure(path, args.repeticoes)
+    execucao = {'gerado_em': datetime.now().isoformat(timespec='seconds'), 'ambiente': environment(paths),
+                'resultados': resultados}
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else None
+    comparacao = compare(resultados, baseline['resultados'], args.limite) if baseline else []
+    print_report(resultados, comparacao)
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(execucao, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if args.atualizar_baseline:
+        if baseline:
+            execucao['resultados'] = {**baseline['resultados'], **resultados}
+        baseline_path.write_text(json.dumps(execucao, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline gravado em {baseline_path}.")
+        return 0
+    if baseline is None:
+        print("Sem baseline para comparar: grave um com --atualizar-baseline.")
+        return 0
+    if baseline['ambiente'].get('plataforma') != execucao['ambiente']['plataforma']:
+        print("Aviso: o baseline foi gravado em outra máquina/plataforma; as comparações são só indicativas.")
+    regressoes = [linha for linha in comparacao if linha[-1]]
+    if regressoes:
+        print(f"{len(regressoes)} regressão(ões) acima de {args.limite:.0%} em relação ao baseline.")
+        return 1
+    print(f"Nenhuma regressão acima de {args.limite:.0%} em relação ao baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Registro de datasets compartilhado por todas as sessões do processo.
+
+Cada planilha carregada vira um dataset somente leitura, identificado pela
+mesma chave do cache de planilhas (hash do conteúdo + esquema). As sessões
+guardam apenas um "handle" para o dataset; quando o último handle é liberado
+(botão de trocar arquivos ou sessão encerrada), o dataset sai da memória.
+Assim 40 analistas abrindo a mesma planilha compartilham uma única cópia.
+"""
+import os
+import threading
+import time
+import weakref
+
+import pyarrow as pa
+from cachetools import LRUCache
+
+from workbook_cache import arrow_safe
+
+# Máximo de recortes (ex.: seleções de unidades do portfólio) guardados por dataset
+VISOES_MAX = int(os.environ.get("PAINEL_VISOES_MAX", "16"))
+
+
+def table_from_frame(df, preserve_index=False):
+    """ Tabela Arrow do DataFrame; colunas com tipos misturados viram texto. """
+    return pa.Table.from_pandas(arrow_safe(df), preserve_index=preserve_index)
+
+
+class Dataset:
+    """ DataFrames de uma planilha (somente leitura) e derivados calculados sob demanda. """
+
+    def __init__(self, key, frames):
+        self.key = key
+        self._frames = frames
+        self._rehydrate = None
+        self._nbytes = None
+        self.refcount = 0
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self._derived = {}
+        self._views = LRUCache(maxsize=VISOES_MAX)
+        # Reentrante: um derivado pode ser montado a partir de outros derivados
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name):
+        return self.frames[name]
+
+    def __contains__(self, name):
+        return name in self.frames
+
+    @property
+    def frames(self):
+        """ DataFrames do dataset; se foram despejados para o disco (evict), voltam para a memória aqui. """
+        with self._lock:
+            if self._frames is None:
+                self._frames = self._rehydrate()
+                self._rehydrate = None
+            self.last_used = time.time()
+            return self._frames
+
+    @property
+    def resident(self):
+        return self._frames is not None
+
+    @property
+    def nbytes(self):
+        """ Memória dos DataFrames, calculada uma vez (consultar não traz de volta um dataset despejado). """
+        if self._nbytes is None:
+            with self._lock:
+                frames = self._frames if self._frames is not None else self.frames
+                self._nbytes = sum(int(df.memory_usage(deep=True).sum()) for df in frames.values())
+        return self._nbytes
+
+    def evict(self, spill, used_before):
+        """
+        Tira da memória os DataFrames, derivados e recortes, se o dataset não
+        foi usado depois de `used_before`. `spill(frames)` grava os DataFrames
+        e devolve a função que os lê de volta no próximo acesso. Devolve os
+        bytes liberados (0 se o dataset está em uso ou já fora da memória).
+        """
+        with self._lock:
+            if self._frames is None or self.last_used > used_before:
+                return 0
+            nbytes = self.nbytes
+            self._rehydrate = spill(self._frames)
+            self._frames = None
+            self._derived.clear()
+            self._views.clear()
+            return nbytes
+
+    def derived(self, name, builder):
+        """
+        Valor derivado dos dados (agregados, índices, tabelas Arrow...),
+        calculado uma única vez e reaproveitado por todas as sessões.
+        """
+        with self._lock:
+            # Usar só os derivados (ex.: reexecução de um fragmento) também conta como uso do dataset
+            self.last_used = time.time()
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+    def view(self, name, builder):
+        """
+        Recorte do dataset (`builder(self)` devolve os DataFrames do recorte)
+        com derivados próprios, usado pelas páginas como se fosse o dataset
+        inteiro. Os últimos VISOES_MAX recortes pedidos ficam em memória.
+        """
+        with self._lock:
+            self.last_used = time.time()
+            visao = self._views.get(name)
+            if visao is None:
+                visao = self._views[name] = Dataset(f"{self.key}:{name}", builder(self))
+            return visao
+
+
+class DatasetHandle:
+    """ Referência de uma sessão a um dataset compartilhado. """
+
+    def __init__(self, store, dataset):
+        self.key = dataset.key
+        self._dataset = dataset
+        # Libera a referência quando a sessão for descartada, mesmo sem release()
+        self._finalizer = weakref.finalize(self, store._release, dataset.key)
+
+    def __getitem__(self, name):
+        return self._dataset[name]
+
+    def __contains__(self, name):
+        return name in self._dataset
+
+    @property
+    def dataset(self):
+        return self._dataset
+
+    def derived(self, name, builder):
+        return self._dataset.derived(name, builder)
+
+    def view(self, name, builder):
+        return self._dataset.view(name, builder)
+
+    def arrow(self, name):
+        """ Tabela Arrow do DataFrame, criada uma vez e compartilhada (sem cópia por sessão). """
+        return self.derived(f"arrow:{name}", lambda ds: table_from_frame(ds.frames[name]))
+
+    def release(self):
+        self._finalizer()
+
+
+class DatasetStore:
+    """ Registro de datasets por chave, com contagem de referências. """
+
+    def __init__(self):
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, frames):
+        """
+        Devolve um handle para o dataset da chave. Se outra sessão já carregou
+        o mesmo arquivo, os DataFrames já registrados são reaproveitados e
+        `frames` é descartado.
+        """
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                dataset = self._datasets[key] = Dataset(key, frames)
+            dataset.refcount += 1
+            return DatasetHandle(self, dataset)
+
+    def _release(self, key):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                return
+            dataset.refcount -= 1
+            if dataset.refcount <= 0:
+                del self._datasets[key]
+
+    def datasets(self):
+        with self._lock:
+            return list(self._datasets.values())
+
+    def stats(self):
+        """ Resumo dos datasets registrados (para acompanhamento pelos operadores). """
+        return [
+            {"key": dataset.key, "refcount": dataset.refcount, "nbytes": dataset.nbytes,
+             "loaded_at": dataset.loaded_at, "last_used": dataset.last_used, "resident": dataset.resident}
+            for dataset in self.datasets()
+        ]
+
+
+# Instância única por processo
+DATASET_STORE = DatasetStore()
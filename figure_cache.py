@@ -0,0 +1,69 @@
+"""
+Cache das figuras Plotly já montadas pelas páginas.
+
+Montar um gráfico com plotly.express (e serializá-lo para o navegador) é uma
+parte visível do tempo de cada página. Como os dados carregados são somente
+leitura, a figura depende apenas do dataset e dos parâmetros escolhidos na
+página: a especificação JSON é guardada por (chave do dataset, página,
+parâmetros) e reaproveitada nas próximas execuções, por qualquer sessão.
+"""
+import json
+import os
+import threading
+
+import plotly.graph_objects as go
+import plotly.io as pio
+from cachetools import LRUCache
+
+# Limite de memória das especificações guardadas (em bytes de JSON)
+FIGURAS_MAX_BYTES = int(os.environ.get("PAINEL_FIGURAS_MAX_BYTES", str(64 * 1024 ** 2)))
+
+
+def figure_to_spec(fig):
+    """ Especificação JSON da figura (o mesmo texto que o Streamlit envia ao navegador). """
+    return pio.to_json(fig, validate=False)
+
+
+def figure_from_spec(spec):
+    """
+    Recria a figura a partir do JSON guardado. A especificação foi gerada pelo
+    próprio Plotly, então a validação (a etapa mais cara) é dispensada.
+    """
+    return go.Figure(json.loads(spec), _validate=False)
+
+
+class FigureCache:
+    """ LRU de especificações de figuras, limitado pelo tamanho total do JSON. """
+
+    def __init__(self, max_bytes=FIGURAS_MAX_BYTES):
+        self._specs = LRUCache(maxsize=max_bytes, getsizeof=len)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_or_build(self, key, builder):
+        """ Figura da chave; na primeira vez é montada por `builder()` e guardada. """
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self.stats["hits"] += 1
+        if spec is None:
+            spec = figure_to_spec(builder())
+            with self._lock:
+                self.stats["misses"] += 1
+                if len(spec) <= self._specs.maxsize:
+                    self._specs[key] = spec
+        return figure_from_spec(spec)
+
+    def usage(self):
+        """ Acertos, montagens e tamanho atual das especificações guardadas (para o painel de desempenho). """
+        with self._lock:
+            return {**self.stats, "figuras": len(self._specs), "bytes": self._specs.currsize,
+                    "max_bytes": self._specs.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+
+
+# Instância única por processo, compartilhada por todas as sessões do Streamlit
+FIGURE_CACHE = FigureCache()
@@ -0,0 +1,243 @@
+"""
+Carga contínua das planilhas de Riscos de uma pasta compartilhada.
+
+Com PAINEL_PASTA_MONITORADA definida, o painel observa a pasta (watchdog) e
+mantém carregada a versão mais recente de cada planilha .xlsx. Uma alteração
+no arquivo é verificada em duas etapas: primeiro o stat (tamanho e data de
+modificação) e, só se ele mudou, o hash do conteúdo. A planilha é relida
+apenas quando o conteúdo mudou; arquivos intactos nunca são lidos de novo.
+Um arquivo que não pôde ser lido (bloqueado, cópia pela metade) fica com o
+erro registrado e é verificado de novo no próximo evento.
+
+Cada versão vira um dataset novo (a chave do dataset é o hash do conteúdo),
+já com índices e agregados prontos, e passa a ser a versão corrente da
+planilha. Os painéis abertos comparam o número da versão com o que estão
+exibindo e trocam de dataset sozinhos; a versão anterior sai da memória
+quando a última sessão deixa de usá-la.
+"""
+import io
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from dataset_store import DATASET_STORE
+from ingestion import INGESTION_POOL, WorkbookLoadError
+from risk_data import load_riscos_data, prepare_riscos
+from workbook_cache import WORKBOOK_CACHE, content_hash
+
+PASTA_MONITORADA = os.environ.get("PAINEL_PASTA_MONITORADA", "")
+# Espera após o último evento de um arquivo antes de verificá-lo (o Excel grava em várias etapas)
+PASTA_ESPERA_SEGUNDOS = float(os.environ.get("PAINEL_PASTA_ESPERA", "2.0"))
+
+
+def is_workbook(path):
+    """ Planilha .xlsx da pasta (os arquivos "~$..." são os bloqueios do Excel). """
+    path = Path(path)
+    return path.suffix.lower() == ".xlsx" and not path.name.startswith("~$")
+
+
+@dataclass
+class WatchedWorkbook:
+    """ Situação de uma planilha da pasta: versão carregada e assinatura do arquivo. """
+    nome: str
+    versao: int = 0
+    handle: object = field(default=None, repr=False)
+    assinatura: tuple = None  # (tamanho, mtime_ns) do arquivo da versão carregada
+    hash: str = None
+    atualizado_em: float = None
+    erros: list = field(default_factory=list)
+    verificacoes: int = 0
+    leituras: int = 0
+
+
+class _FolderEvents(FileSystemEventHandler):
+    """ Repassa ao FolderWatcher os caminhos das planilhas criadas, alteradas, movidas ou apagadas. """
+
+    def __init__(self, watcher):
+        self._watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type in ("opened", "closed_no_write"):
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path and is_workbook(path):
+                self._watcher.schedule(path)
+
+
+class FolderWatcher:
+    """
+    Observa a pasta e mantém a versão corrente de cada planilha. As
+    verificações rodam no pool de cargas; eventos repetidos do mesmo arquivo
+    dentro de `espera` segundos resultam em uma única verificação.
+    """
+
+    def __init__(self, directory, loader=load_riscos_data, prepare=prepare_riscos,
+                 espera=PASTA_ESPERA_SEGUNDOS):
+        self.directory = Path(directory)
+        self._loader = loader
+        self._prepare = prepare
+        self._espera = espera
+        self._planilhas = {}
+        self._timers = {}
+        self._locks = {}
+        # Números de versão únicos na pasta: um arquivo apagado e recriado não repete um número já exibido
+        self._versoes = itertools.count(1)
+        self._lock = threading.Lock()
+        self._observer = None
+
+    def start(self):
+        """ Carrega as planilhas já existentes e começa a observar a pasta (chamadas seguintes não fazem nada). """
+        with self._lock:
+            if self._observer is not None:
+                return
+            self._observer = Observer()
+        for path in sorted(self.directory.glob("*")):
+            if is_workbook(path):
+                self.schedule(path, espera=0)
+        self._observer.schedule(_FolderEvents(self), str(self.directory), recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def stop(self):
+        with self._lock:
+            observer, self._observer = self._observer, None
+            timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+    # --- Verificação dos arquivos ---
+
+    def schedule(self, path, espera=None):
+        """ Agenda a verificação do arquivo, adiando-a se outro evento do mesmo arquivo chegar antes. """
+        nome = Path(path).name
+        espera = self._espera if espera is None else espera
+        with self._lock:
+            anterior = self._timers.get(nome)
+            if anterior is not None:
+                anterior.cancel()
+            timer = self._timers[nome] = threading.Timer(
+                espera, lambda: INGESTION_POOL.submit(nome, self.refresh, nome))
+            timer.daemon = True
+        timer.start()
+
+    def refresh(self, nome, progress=None):
+        """
+        Verifica a planilha e carrega a nova versão se o conteúdo mudou.
+        Devolve True se a versão corrente mudou.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(nome, threading.Lock())
+        # Uma verificação por vez para cada arquivo; a seguinte já encontra o stat atualizado
+        with lock:
+            return self._refresh(nome)
+
+    def _refresh(self, nome):
+        path = self.directory / nome
+        with self._lock:
+            planilha = self._planilhas.setdefault(nome, WatchedWorkbook(nome))
+            planilha.verificacoes += 1
+        try:
+            stat = path.stat()
+            assinatura = (stat.st_size, stat.st_mtime_ns)
+            if assinatura == planilha.assinatura:
+                return False
+            conteudo = path.read_bytes()
+        except FileNotFoundError:
+            return self._remove(nome)
+        except OSError as e:
+            # Arquivo bloqueado ou ainda sendo copiado: a assinatura não muda, a próxima verificação tenta de novo
+            planilha.erros = [f"Erro ao ler o arquivo '{nome}' da pasta. Erro: {e}"]
+            return False
+        hash_conteudo = content_hash(conteudo)
+        if hash_conteudo == planilha.hash:
+            # Só a data mudou (arquivo salvo sem alterações): nada a reler
+            planilha.assinatura = assinatura
+            return False
+
+        fonte = io.BytesIO(conteudo)
+        fonte.name = nome
+        planilha.leituras += 1
+        try:
+            handle = self._loader(fonte)
+        except WorkbookLoadError as e:
+            # Mantém a última versão válida; a próxima alteração do arquivo tenta de novo
+            planilha.erros = e.mensagens
+            planilha.assinatura, planilha.hash = assinatura, hash_conteudo
+            return False
+        try:
+            self._prepare(handle)
+        except Exception as e:
+            handle.release()
+            planilha.erros = [f"Erro ao preparar a planilha '{nome}'. Erro: {e}"]
+            return False
+
+        with self._lock:
+            anterior = planilha.handle
+            planilha.handle = handle
+            planilha.assinatura, planilha.hash = assinatura, hash_conteudo
+            planilha.versao = next(self._versoes)
+            planilha.atualizado_em = time.time()
+            planilha.erros = []
+        if anterior is not None:
+            # A versão anterior não volta a ser lida daqui: só a cópia em disco do cache fica
+            anterior.release()
+            WORKBOOK_CACHE.discard(anterior.key)
+        return True
+
+    def _remove(self, nome):
+        with self._lock:
+            planilha = self._planilhas.pop(nome, None)
+        if planilha is None or planilha.handle is None:
+            return False
+        # As sessões que estão com a planilha aberta continuam com a última versão
+        planilha.handle.release()
+        return True
+
+    # --- Consulta pelas sessões ---
+
+    def available(self):
+        """ Nomes das planilhas com alguma versão carregada, em ordem alfabética. """
+        with self._lock:
+            return sorted(nome for nome, planilha in self._planilhas.items() if planilha.handle is not None)
+
+    def status(self, nome):
+        """ WatchedWorkbook da planilha, ou None se ela não está (mais) na pasta. """
+        with self._lock:
+            return self._planilhas.get(nome)
+
+    def version(self, nome):
+        """ Número da versão corrente (0 enquanto nenhuma foi carregada; None se o arquivo saiu da pasta). """
+        with self._lock:
+            planilha = self._planilhas.get(nome)
+            return None if planilha is None else planilha.versao
+
+    def acquire(self, nome):
+        """ (versão, handle próprio da sessão) da versão corrente da planilha, ou (None, None). """
+        with self._lock:
+            planilha = self._planilhas.get(nome)
+            if planilha is None or planilha.handle is None:
+                return None, None
+            dataset = planilha.handle.dataset
+            return planilha.versao, DATASET_STORE.acquire(dataset.key, dataset.frames)
+
+    def stats(self):
+        """ Situação de cada planilha (para acompanhamento pelos operadores). """
+        with self._lock:
+            return [
+                {"nome": p.nome, "versao": p.versao, "atualizado_em": p.atualizado_em,
+                 "verificacoes": p.verificacoes, "leituras": p.leituras, "erros": list(p.erros)}
+                for p in self._planilhas.values()
+            ]
+
+
+# Instância única por processo (None se nenhuma pasta foi configurada)
+FOLDER_WATCHER = FolderWatcher(PASTA_MONITORADA) if PASTA_MONITORADA else None
@@ -0,0 +1,102 @@
+"""
+Séries mensais dos indicadores em formato longo e scorecard de todos os indicadores.
+
+A aba de Indicadores traz os 12 meses lado a lado (mes_01..mes_12). Na carga,
+esse bloco vira uma matriz numérica (indicadores x meses) e uma tabela longa
+(indicador_id, mes, valor) com apenas os meses preenchidos. O indicador_id é
+a posição (iloc) da linha no DataFrame de indicadores. O scorecard calcula,
+para todos os indicadores de uma vez, alcance da meta, último mês reportado,
+meses em falta e a tendência (reta de mínimos quadrados) projetada para dezembro.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+MESES = np.arange(1, 13)
+
+
+@dataclass
+class IndicatorSeries:
+    """ Valores mensais de todos os indicadores: matriz (n x 12) e tabela longa. """
+    valores: np.ndarray = field(repr=False)
+    longo: pd.DataFrame = field(repr=False)
+    col_meses: list
+
+    def frame(self, ids):
+        """
+        Série dos indicadores `ids` no formato usado pelos gráficos: uma linha
+        por (indicador, mês), inclusive meses vazios, na ordem dos meses.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        valores = self.valores[ids]
+        return pd.DataFrame({
+            'indicador_id': np.repeat(ids, len(MESES)),
+            'Mês': np.tile(self.col_meses, len(ids)),
+            'Mês Num': np.tile(MESES, len(ids)),
+            'Realizado (mês)': valores.ravel(),
+        }).sort_values(['Mês Num', 'indicador_id'], kind='stable', ignore_index=True)
+
+    def has_data(self, ids):
+        return bool(np.isfinite(self.valores[np.asarray(ids, dtype=np.intp)]).any())
+
+
+def build_indicator_series(df_indicadores, col_meses):
+    valores = (df_indicadores[col_meses].apply(pd.to_numeric, errors='coerce')
+               .to_numpy(dtype=float, na_value=np.nan))
+    linhas, colunas = np.nonzero(np.isfinite(valores))
+    longo = pd.DataFrame({
+        'indicador_id': linhas,
+        'mes': MESES[colunas].astype(np.int8),
+        'valor': valores[linhas, colunas],
+    })
+    return IndicatorSeries(valores=valores, longo=longo, col_meses=list(col_meses))
+
+
+def build_scorecard(series, df_indicadores, col_meta, col_realizado, col_alcance):
+    """
+    Scorecard vetorizado de todos os indicadores (uma linha por indicador_id).
+    A tendência só é calculada com pelo menos dois meses reportados.
+    """
+    valores = series.valores
+    preenchido = np.isfinite(valores)
+    n_meses = preenchido.sum(axis=1)
+
+    # Último mês reportado e seu valor
+    ultimo_idx = np.where(n_meses > 0, len(MESES) - 1 - np.argmax(preenchido[:, ::-1], axis=1), -1)
+    linhas = np.arange(len(valores))
+    ultimo_mes = np.where(ultimo_idx >= 0, ultimo_idx + 1, np.nan)
+    ultimo_valor = np.where(ultimo_idx >= 0, valores[linhas, np.maximum(ultimo_idx, 0)], np.nan)
+    # Meses sem valor antes do último reportado (lacunas no acompanhamento)
+    meses_em_falta = np.where(ultimo_idx >= 0, ultimo_idx + 1 - n_meses, 0)
+
+    # Reta de mínimos quadrados (valor ~ mês) com somas mascaradas
+    x = np.where(preenchido, MESES, 0.0)
+    y = np.where(preenchido, valores, 0.0)
+    soma_x, soma_y = x.sum(axis=1), y.sum(axis=1)
+    soma_xx, soma_xy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+    denominador = n_meses * soma_xx - soma_x ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inclinacao = np.where((n_meses >= 2) & (denominador > 0),
+                              (n_meses * soma_xy - soma_x * soma_y) / denominador, np.nan)
+        intercepto = (soma_y - inclinacao * soma_x) / n_meses
+    previsao_dez = intercepto + inclinacao * MESES[-1]
+
+    meta = pd.to_numeric(df_indicadores[col_meta], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alcance_ultimo_mes = np.where(meta != 0, ultimo_valor / meta, np.nan)
+        previsao_vs_meta = np.where(meta != 0, previsao_dez / meta, np.nan)
+
+    return pd.DataFrame({
+        'meta': meta,
+        'realizado': pd.to_numeric(df_indicadores[col_realizado], errors='coerce').to_numpy(),
+        'alcance': pd.to_numeric(df_indicadores[col_alcance], errors='coerce').to_numpy(),
+        'meses_reportados': n_meses,
+        'ultimo_mes': ultimo_mes,
+        'ultimo_valor': ultimo_valor,
+        'meses_em_falta': meses_em_falta,
+        'alcance_ultimo_mes': alcance_ultimo_mes,
+        'tendencia_mensal': inclinacao,
+        'previsao_dez': previsao_dez,
+        'previsao_vs_meta': previsao_vs_meta,
+    }).rename_axis('indicador_id')
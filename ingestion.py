@@ -0,0 +1,103 @@
+"""
+Carga das planilhas em segundo plano.
+
+As cargas rodam em um pool de threads compartilhado pelo processo. Cada carga
+é uma LoadTask: o Future da leitura mais o andamento (fração e etapa)
+informado pelo próprio carregador, que a página consulta para mostrar o
+progresso. No modo integrado, a planilha de Planejamento só começa depois da
+de Riscos: a leitura é Python puro, presa ao GIL, e as duas ao mesmo tempo
+atrasavam a de Riscos sem terminar antes. Assim as páginas de Riscos ficam
+disponíveis assim que a planilha de Riscos termina, enquanto a de Indicadores
+continua em segundo plano.
+
+Os carregadores não usam o Streamlit (rodam fora da thread da sessão): erros
+de validação são levantados como WorkbookLoadError e exibidos pela página.
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+CARGA_WORKERS = int(os.environ.get("PAINEL_CARGA_WORKERS", "4"))
+
+
+class WorkbookLoadError(ValueError):
+    """ Planilha que não pôde ser carregada; `mensagens` traz um texto por problema encontrado. """
+
+    def __init__(self, mensagens):
+        if isinstance(mensagens, str):
+            mensagens = [mensagens]
+        self.mensagens = list(mensagens)
+        super().__init__(" ".join(self.mensagens))
+
+
+class LoadTask:
+    """ Uma carga submetida ao pool: resultado (Future) e andamento. """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.future = None
+        self._fracao = 0.0
+        self._etapa = "Na fila"
+        self._lock = threading.Lock()
+
+    def report(self, fracao, etapa):
+        """ Callback de progresso passado ao carregador (chamado na thread do pool). """
+        with self._lock:
+            self._fracao = min(max(float(fracao), 0.0), 1.0)
+            self._etapa = etapa
+
+    @property
+    def progress(self):
+        """ (fração entre 0 e 1, descrição da etapa atual). """
+        with self._lock:
+            return self._fracao, self._etapa
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """ Espera a carga terminar por até `timeout` segundos; devolve True se terminou. """
+        wait([self.future], timeout=timeout)
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """ Resultado do carregador; levanta a exceção dele, se houver. """
+        return self.future.result(timeout)
+
+
+class IngestionPool:
+    """ Pool de threads para as cargas de planilhas de todas as sessões. """
+
+    def __init__(self, max_workers=CARGA_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="carga-planilha")
+
+    def submit(self, nome, loader, *args, after=None, **kwargs):
+        """
+        Executa `loader(*args, progress=..., **kwargs)` no pool e devolve a
+        LoadTask. Com `after` (outra LoadTask), a carga só entra no pool quando
+        aquela terminar, com sucesso ou não.
+        """
+        task = LoadTask(nome)
+        if after is None:
+            task.future = self._executor.submit(loader, *args, progress=task.report, **kwargs)
+            return task
+
+        task.future = Future()
+        task.report(0.0, f"Na fila, depois da carga de {after.nome}")
+
+        def start(_):
+            carga = self._executor.submit(loader, *args, progress=task.report, **kwargs)
+            carga.add_done_callback(lambda feita: _copy_result(feita, task.future))
+        after.future.add_done_callback(start)
+        return task
+
+
+def _copy_result(origem, destino):
+    if origem.exception() is not None:
+        destino.set_exception(origem.exception())
+    else:
+        destino.set_result(origem.result())
+
+
+# Instância única por processo, compartilhada por todas as sessões do Streamlit
+INGESTION_POOL = IngestionPool()
@@ -0,0 +1,184 @@
+"""
+Índices de consulta dos dados carregados.
+
+As páginas localizam riscos, planos e indicadores pelo nome selecionado na
+tela. Em vez de varrer o DataFrame inteiro a cada execução da página
+(`df[df['evento_risco'] == nome]`), as posições das linhas de cada valor são
+indexadas uma única vez na carga, junto com as listas de opções dos filtros.
+"""
+import functools
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+SEM_LINHAS = np.empty(0, dtype=np.intp)
+
+
+def unique_list(series):
+    """ Valores distintos na ordem de aparição (como series.unique().tolist()). """
+    return series.unique().tolist()
+
+
+def positions_by_value(series):
+    """ {valor: posições (iloc) das linhas com esse valor}; valores vazios ficam de fora. """
+    return series.groupby(series, observed=True, sort=False).indices
+
+
+@dataclass
+class RiscosIndex:
+    """ Índices do Mapa de Riscos e do Plano de Respostas. """
+    df_mapa: object
+    df_plano: object
+    riscos: list
+    acoes: list
+    gestores: list
+    linhas_risco: dict = field(repr=False)
+    linhas_plano: dict = field(repr=False)
+    linhas_acao: dict = field(repr=False)
+    filtros: "BitmapFilterIndex" = field(repr=False)
+    ordenacao: "SortIndex" = field(repr=False)
+
+    def risco(self, evento_risco):
+        """ Linha do risco no Mapa (a primeira, se o nome se repetir). """
+        return self.df_mapa.iloc[self.linhas_risco[evento_risco][0]]
+
+    def planos_do_risco(self, evento_risco):
+        return self.df_plano.iloc[self.linhas_plano.get(evento_risco, SEM_LINHAS)]
+
+    def riscos_da_acao(self, acao):
+        return self.df_mapa.iloc[self.linhas_acao.get(acao, SEM_LINHAS)]
+
+
+@dataclass
+class IndicadoresIndex:
+    """ Índices da aba de Indicadores, por Ação Estratégica e por (Ação, Indicador). """
+    df_indicadores: object
+    acoes: list
+    indicadores_por_acao: dict
+    linhas_acao: dict = field(repr=False)
+    linhas_indicador: dict = field(repr=False)
+
+    def indicadores_da_acao(self, acao):
+        return self.df_indicadores.iloc[self.linhas_acao.get(acao, SEM_LINHAS)]
+
+    def indicador(self, acao, titulo):
+        """ Linhas do indicador `titulo` da ação (normalmente uma). """
+        return self.df_indicadores.iloc[self.linhas_indicador.get((acao, titulo), SEM_LINHAS)]
+
+
+def build_riscos_index(df_mapa, df_plano):
+    return RiscosIndex(
+        df_mapa=df_mapa,
+        df_plano=df_plano,
+        riscos=unique_list(df_mapa['evento_risco']),
+        acoes=unique_list(df_mapa['acao_estrategica']),
+        gestores=unique_list(df_mapa['gestor_risco']),
+        linhas_risco=positions_by_value(df_mapa['evento_risco']),
+        linhas_plano=positions_by_value(df_plano['evento_risco']),
+        linhas_acao=positions_by_value(df_mapa['acao_estrategica']),
+        filtros=BitmapFilterIndex(df_mapa, ['acao_estrategica', 'gestor_risco', 'avaliacao_rr']),
+        ordenacao=SortIndex(df_mapa),
+    )
+
+
+def build_indicadores_index(df_indicadores, col_acao='acao_estrategica', col_titulo='ind_titulo'):
+    linhas_indicador = (
+        df_indicadores.groupby([col_acao, col_titulo], observed=True, sort=False).indices
+    )
+    # Títulos de cada ação na ordem em que aparecem na planilha
+    indicadores_por_acao = {}
+    pares = df_indicadores[[col_acao, col_titulo]].dropna().drop_duplicates()
+    for acao, titulo in pares.itertuples(index=False):
+        indicadores_por_acao.setdefault(acao, []).append(titulo)
+    return IndicadoresIndex(
+        df_indicadores=df_indicadores,
+        acoes=unique_list(df_indicadores[col_acao]),
+        indicadores_por_acao=indicadores_por_acao,
+        linhas_acao=positions_by_value(df_indicadores[col_acao]),
+        linhas_indicador=linhas_indicador,
+    )
+
+
+class BitmapFilterIndex:
+    """
+    Filtros combinados por bitmaps: para cada valor de cada dimensão há uma
+    máscara de linhas compactada (np.packbits, 1 bit por linha). Uma
+    combinação de filtros é o AND dos bitmaps escolhidos, convertido em
+    posições de linha; o resultado de cada combinação fica em cache.
+    """
+
+    def __init__(self, df, dimensoes, max_combinacoes=256):
+        self.n_linhas = len(df)
+        self.bitmaps = {}
+        for dim in dimensoes:
+            codigos, valores = pd.factorize(df[dim], sort=False)
+            self.bitmaps[dim] = {valor: np.packbits(codigos == k) for k, valor in enumerate(valores)}
+        self._vazio = np.packbits(np.zeros(self.n_linhas, dtype=bool))
+        self._selecoes = LRUCache(maxsize=max_combinacoes)
+        self._lock = threading.Lock()
+
+    def select(self, filtros):
+        """
+        Posições (iloc, somente leitura) das linhas que atendem a todos os
+        filtros {dimensão: valor}. Dimensões fora de `filtros` não restringem.
+        """
+        chave = tuple(sorted(filtros.items()))
+        with self._lock:
+            posicoes = self._selecoes.get(chave)
+        if posicoes is not None:
+            return posicoes
+
+        if chave:
+            bitmaps = [self.bitmaps[dim].get(valor, self._vazio) for dim, valor in chave]
+            combinado = functools.reduce(np.bitwise_and, bitmaps)
+            posicoes = np.flatnonzero(np.unpackbits(combinado, count=self.n_linhas))
+        else:
+            posicoes = np.arange(self.n_linhas)
+        posicoes.flags.writeable = False
+        with self._lock:
+            self._selecoes[chave] = posicoes
+        return posicoes
+
+
+class SortIndex:
+    """
+    Ordenação das linhas por cada coluna (posições iloc), calculada na primeira
+    vez em que a coluna é pedida. Ordenar uma seleção de linhas é só filtrar a
+    ordenação completa pelas posições selecionadas, sem nova comparação de valores.
+    """
+
+    def __init__(self, df):
+        self._df = df
+        self._ordens = {}
+        self._lock = threading.Lock()
+
+    def order(self, coluna, descending=False):
+        """ Posições de todas as linhas ordenadas pela coluna (estável; vazios no final). """
+        chave = (coluna, descending)
+        with self._lock:
+            ordem = self._ordens.get(chave)
+        if ordem is None:
+            valores = self._df[coluna].reset_index(drop=True)
+            try:
+                ordenados = valores.sort_values(ascending=not descending, kind='stable', na_position='last')
+            except TypeError:
+                # Tipos misturados na coluna: ordena pelo texto dos valores
+                ordenados = valores.where(valores.isna(), valores.astype(str)).sort_values(
+                    ascending=not descending, kind='stable', na_position='last')
+            ordem = ordenados.index.to_numpy()
+            ordem.flags.writeable = False
+            with self._lock:
+                self._ordens[chave] = ordem
+        return ordem
+
+    def sort_positions(self, posicoes, coluna, descending=False):
+        """ As posições `posicoes` na ordem da coluna. """
+        ordem = self.order(coluna, descending)
+        if len(posicoes) == len(ordem):
+            return ordem
+        selecionadas = np.zeros(len(ordem), dtype=bool)
+        selecionadas[posicoes] = True
+        return ordem[selecionadas[ordem]]
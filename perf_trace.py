@@ -0,0 +1,188 @@
+"""
+Medição de desempenho das etapas do painel (opcional).
+
+Com PAINEL_PERF=1, cada etapa instrumentada (leitura do upload e das abas,
+limpeza, índices, páginas, gráficos, envio de gráficos e tabelas ao
+navegador) grava uma linha JSON em PAINEL_PERF_LOG com a duração em ms, a
+sessão e a execução do app a que pertence. As execuções recentes de cada
+sessão e o histórico de duração por etapa ficam em memória para o painel de
+desempenho da sidebar (p50/p95 por página).
+
+Desligado (padrão), `timed` devolve a própria função decorada e `span`
+devolve um contexto vazio: o custo é praticamente zero.
+
+Uma "execução" é uma execução do script do app ou a reexecução de um
+fragmento (st.fragment); as etapas feitas fora delas (cargas no pool de
+threads, relatório em lote) são gravadas sem execução.
+"""
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+PERF_ATIVO = os.environ.get("PAINEL_PERF", "").lower() not in ("", "0", "false", "nao", "não")
+PERF_LOG = os.environ.get("PAINEL_PERF_LOG", "perf_painel.jsonl")
+# Durações guardadas por etapa para os percentis, e execuções guardadas por sessão
+PERF_HISTORICO = int(os.environ.get("PAINEL_PERF_HISTORICO", "500"))
+PERF_EXECUCOES = 20
+
+_SEM_MEDICAO = nullcontext()
+
+
+def _contexto_streamlit():
+    """ Contexto de execução do Streamlit da thread atual (None fora do app, ex.: no pool de cargas). """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    return get_script_run_ctx(suppress_warning=True)
+
+
+def _sessao_streamlit():
+    ctx = _contexto_streamlit()
+    return None if ctx is None else ctx.session_id
+
+
+def _reexecucao_fragmento():
+    """ True se a thread atual reexecuta só fragmentos (st.fragment), sem o script inteiro. """
+    ctx = _contexto_streamlit()
+    return ctx is not None and bool(ctx.fragment_ids_this_run)
+
+
+class PerfRecorder:
+    """ Registro das medições: log JSON-lines, execuções por sessão e histórico por etapa. """
+
+    def __init__(self, ativo=PERF_ATIVO, log_path=PERF_LOG, historico=PERF_HISTORICO):
+        self.ativo = ativo
+        self.log_path = log_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._arquivo = None
+        self._ids = itertools.count(1)
+        self._duracoes = defaultdict(lambda: deque(maxlen=historico))
+        self._execucoes = defaultdict(lambda: deque(maxlen=PERF_EXECUCOES))
+
+    # --- Execuções do app ---
+
+    def begin_run(self, tipo="script"):
+        """ Abre uma execução na thread atual (o Streamlit roda cada execução em uma thread nova). """
+        if not self.ativo:
+            return
+        self._local.execucao = {'id': next(self._ids), 'sessao': _sessao_streamlit(), 'tipo': tipo,
+                                'ts': time.time(), 'inicio': time.perf_counter(), 'etapas': []}
+        self._local.nivel = 0
+
+    def end_run(self, **atributos):
+        """ Fecha a execução da thread, com os `atributos` extras (ex.: memória dos dados) no registro. """
+        execucao = getattr(self._local, 'execucao', None) if self.ativo else None
+        if execucao is None:
+            return
+        self._local.execucao = None
+        execucao['ms'] = (time.perf_counter() - execucao.pop('inicio')) * 1000
+        execucao.update(atributos)
+        self._write({'ts': execucao['ts'], 'sessao': execucao['sessao'], 'execucao': execucao['id'],
+                     'etapa': f"execucao:{execucao['tipo']}", 'ms': round(execucao['ms'], 3), **atributos})
+        with self._lock:
+            self._execucoes[execucao['sessao']].append(execucao)
+
+    # --- Etapas ---
+
+    def span(self, etapa, **atributos):
+        """ Contexto que mede o bloco como `etapa` (contexto vazio com a medição desligada). """
+        if not self.ativo:
+            return _SEM_MEDICAO
+        return self._span(etapa, atributos)
+
+    @contextmanager
+    def _span(self, etapa, atributos):
+        nivel = getattr(self._local, 'nivel', 0)
+        self._local.nivel = nivel + 1
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.nivel = nivel
+            self._record(etapa, inicio, time.perf_counter(), nivel, atributos)
+
+    def timed(self, etapa=None):
+        """
+        Decorador que mede cada chamada da função (etapa = nome da função, se
+        não informada). Com a medição desligada, devolve a função sem mudança.
+        Chamada na reexecução de um fragmento (sem execução aberta), abre e
+        fecha a própria execução.
+        """
+        def decorator(func):
+            if not self.ativo:
+                return func
+            nome = etapa or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if getattr(self._local, 'execucao', None) is not None or not _reexecucao_fragmento():
+                    with self._span(nome, {}):
+                        return func(*args, **kwargs)
+                self.begin_run("fragmento")
+                try:
+                    with self._span(nome, {}):
+                        return func(*args, **kwargs)
+                finally:
+                    self.end_run()
+            return wrapper
+        return decorator
+
+    def instrument(self, objeto, atributo, etapa=None):
+        """ Troca `objeto.atributo` (ex.: st.plotly_chart) por uma versão medida; chamadas repetidas não a medem duas vezes. """
+        if not self.ativo:
+            return
+        funcao = getattr(objeto, atributo)
+        if getattr(funcao, '__perf_medida__', False):
+            return
+        medida = self.timed(etapa or atributo)(funcao)
+        medida.__perf_medida__ = True
+        setattr(objeto, atributo, medida)
+
+    def _record(self, etapa, inicio, fim, nivel, atributos):
+        execucao = getattr(self._local, 'execucao', None)
+        ms = (fim - inicio) * 1000
+        registro = {'ts': time.time(), 'sessao': execucao['sessao'] if execucao else None,
+                    'execucao': execucao['id'] if execucao else None, 'thread': threading.current_thread().name,
+                    'etapa': etapa, 'ms': round(ms, 3), 'nivel': nivel, **atributos}
+        if execucao is not None:
+            # Início relativo ao da execução: o painel mostra as etapas na ordem em que começaram
+            registro['inicio_ms'] = round((inicio - execucao['inicio']) * 1000, 3)
+            execucao['etapas'].append(registro)
+        with self._lock:
+            self._duracoes[etapa].append(ms)
+        self._write(registro)
+
+    def _write(self, registro):
+        linha = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._arquivo is None:
+                self._arquivo = open(self.log_path, "a", encoding="utf-8", buffering=1)
+            self._arquivo.write(linha)
+
+    # --- Consulta (painel de desempenho) ---
+
+    def runs(self, sessao=None):
+        """ Execuções recentes da sessão (a da thread atual, se não informada), da mais nova para a mais antiga. """
+        sessao = _sessao_streamlit() if sessao is None else sessao
+        with self._lock:
+            return list(reversed(self._execucoes.get(sessao, ())))
+
+    def stage_stats(self):
+        """ {etapa: (chamadas, p50 ms, p95 ms)} do histórico de todas as sessões. """
+        with self._lock:
+            duracoes = {etapa: np.fromiter(valores, dtype=float) for etapa, valores in self._duracoes.items()}
+        return {etapa: (len(valores), float(np.percentile(valores, 50)), float(np.percentile(valores, 95)))
+                for etapa, valores in duracoes.items() if len(valores)}
+
+
+# Instância única por processo
+PERF = PerfRecorder()
@@ -0,0 +1,680 @@
+"""
+Dados do painel sem Streamlit: esquema das planilhas, carga e limpeza,
+agregados, índices e os gráficos da Visão Geral.
+
+O app (app_v2.py) e o relatório em lote (batch_report.py) usam as mesmas
+funções; nada aqui chama `st.*`, então o módulo pode ser importado em
+scripts e em processos de um pool. Erros de carga são levantados como
+WorkbookLoadError.
+"""
+import hashlib
+import zipfile
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from dataset_store import DATASET_STORE
+from indicator_series import build_indicator_series, build_scorecard
+from ingestion import WorkbookLoadError
+from lookup_index import build_indicadores_index, build_riscos_index
+from perf_trace import PERF
+from workbook_cache import WORKBOOK_CACHE, make_cache_key
+from workbook_reader import SheetNotFoundError, probe_workbook, read_sheets
+
+# --- Nomes das Abas Esperadas no Arquivo ---
+SHEET_MAPA = "Mapa de Riscos"
+SHEET_PLANO = "Plano de Respostas"
+SHEET_INDICADORES = "1.1. Plano de Ação"
+
+# --- Linha de cabeçalho de cada aba (índice 0, como no pd.read_excel) ---
+HEADER_MAPA = 9
+HEADER_PLANO = 8
+HEADER_INDICADORES = 9
+
+# --- Nomes das Colunas (Programático) ---
+
+# Colunas dos arquivos de Risco (sem mudança)
+mapa_cols = [
+    'col_vazia', 'acao_estrategica', 'evento_risco', 'causas', 'consequencias',
+    'classificacao', 'gestor_risco', 'gp', 'gi', 'nivel_ri', 'avaliacao_ri',
+    'desc_controle', 'nivel_controle', 'avaliacao_controle_ac', 'nivel_rr',
+    'avaliacao_rr', 'resposta_risco', 'plano_resposta'
+]
+plano_cols = [
+    'col_vazia', 'acao_estrategica', 'evento_risco', 'causas', 'resposta',
+    'o_que', 'quando', 'onde', 'por_que', 'por_quem', 'como', 'custo'
+]
+# Colunas programáticas para '1.1. Plano de Ação' (28 colunas)
+indicadores_cols = [
+    'objetivo_estrategico', 'iniciativa', 'acao_estrategica', 'situacao_acao', 'responsavel_acao',  # A-E
+    'ind_titulo', 'ind_formula', 'ind_unidade', 'ind_sit_inicial', 'ind_valor', 'ind_parametro',  # F-K
+    'mes_01', 'mes_02', 'mes_03', 'mes_04', 'mes_05', 'mes_06',  # L-Q
+    'mes_07', 'mes_08', 'mes_09', 'mes_10', 'mes_11', 'mes_12',  # R-W
+    'ind_realizado',  # X (Unnamed: 23)
+    'ind_alcance_meta',  # Y (Unnamed: 24)
+    'ind_status_painel',  # Z (Para o cálculo no painel)
+    'unnamed_26', 'unnamed_27'  # AA-AB
+]
+
+# (ATUALIZADO) Constantes programáticas
+COL_OBJETIVO = "objetivo_estrategico"
+COL_INICIATIVA = "iniciativa"
+COL_ACAO = "acao_estrategica"
+COL_IND_TITULO = "ind_titulo"
+COL_IND_FORMULA = "ind_formula"
+COL_IND_UNIDADE = "ind_unidade"
+COL_IND_SIT_INICIAL = "ind_sit_inicial"
+COL_IND_VALOR = "ind_valor"
+COL_IND_PARAMETRO = "ind_parametro"
+# (NOVAS) Constantes para Monitoramento
+COL_IND_REALIZADO = "ind_realizado"
+COL_IND_ALCANCE = "ind_alcance_meta"
+COL_MESES = [f"mes_{i:02d}" for i in range(1, 13)]  # ['mes_01', 'mes_02', ...]
+# Unidade de origem de cada linha no modo Portfólio (várias planilhas de Riscos)
+COL_UNIDADE = "unidade"
+
+# (ATUALIZADO) Lista de colunas que vamos extrair da aba de indicadores
+INDICADORES_COLS_REQUERIDAS = [
+                                  COL_OBJETIVO, COL_INICIATIVA, COL_ACAO,
+                                  COL_IND_TITULO, COL_IND_FORMULA, COL_IND_UNIDADE,
+                                  COL_IND_SIT_INICIAL, COL_IND_VALOR, COL_IND_PARAMETRO,
+                                  COL_IND_REALIZADO, COL_IND_ALCANCE  # <-- Adicionadas
+                              ] + COL_MESES  # <-- Adicionados os 12 meses
+
+# Colunas-chave que foram mescladas e precisarão de ffill()
+INDICADORES_COLS_FFILL = [COL_OBJETIVO, COL_INICIATIVA, COL_ACAO]
+
+# Linha de cabeçalho e número de colunas esperados por aba (usados na sondagem do arquivo)
+SHEET_HEADERS = {SHEET_MAPA: HEADER_MAPA, SHEET_PLANO: HEADER_PLANO, SHEET_INDICADORES: HEADER_INDICADORES}
+SHEET_N_COLS = {SHEET_MAPA: len(mapa_cols), SHEET_PLANO: len(plano_cols), SHEET_INDICADORES: len(indicadores_cols)}
+
+# Assinaturas do esquema esperado (entram na chave do cache de planilhas)
+SCHEMA_RISCOS = [SHEET_MAPA, HEADER_MAPA, mapa_cols, SHEET_PLANO, HEADER_PLANO, plano_cols]
+SCHEMA_INDICADORES = [SHEET_INDICADORES, HEADER_INDICADORES, indicadores_cols, INDICADORES_COLS_REQUERIDAS]
+
+# --- (ATUALIZADO) Dicionário de Nomes Amigáveis para Exibição ---
+FRIENDLY_NAMES = {
+    'acao_estrategica': 'Ação Estratégica',
+    'evento_risco': 'Evento de Risco',
+    'classificacao': 'Classificação',
+    'gestor_risco': 'Gestor de Risco',
+    'gp': 'Probabilidade (GP)',
+    'gi': 'Impacto (GI)',
+    'nivel_ri': 'Nível Risco Inerente (RI)',
+    'avaliacao_ri': 'Avaliação Risco Inerente',
+    'nivel_rr': 'Nível Risco Residual (RR)',
+    'avaliacao_rr': 'Avaliação Risco Residual',
+    'causas': 'Causas',
+    'consequencias': 'Consequências',
+    'desc_controle': 'Descrição dos Controles',
+    'nivel_controle': 'Nível do Controle',
+    'avaliacao_controle_ac': 'Avaliação do Controle Aceitável',
+    'resposta_risco': 'Resposta ao Risco',
+    'contagem': 'Contagem de Riscos',
+    'plano_resposta': 'Plano de Resposta',
+    'o_que': 'O Quê (Ação)', 'quando': 'Quando (Prazo)', 'onde': 'Onde (Local)',
+    'por_que': 'Por Quê (Justificativa)', 'por_quem': 'Por Quem (Responsável)',
+    'como': 'Como (Detalhamento)', 'custo': 'Custo Estimado',
+    COL_UNIDADE: 'Unidade',
+    # Nomes dos Indicadores
+    COL_OBJETIVO: 'Objetivo Estratégico',
+    COL_INICIATIVA: 'Iniciativa',
+    COL_ACAO: 'Ação Estratégica',
+    COL_IND_TITULO: 'Indicador (Título)',
+    COL_IND_FORMULA: 'Fórmula',
+    COL_IND_UNIDADE: 'Unidade de Medida',
+    COL_IND_SIT_INICIAL: 'Situação Inicial',
+    COL_IND_VALOR: 'Valor (Meta)',
+    COL_IND_PARAMETRO: 'Parâmetro',
+    # (NOVOS) Nomes do Monitoramento
+    COL_IND_REALIZADO: 'Realizado (Situação Atual)',
+    COL_IND_ALCANCE: 'Alcance da Meta (%)'
+}
+
+# --- Paletas de Cores e Categorias ---
+RISK_COLORS = {
+    'Inaceitável': '#D32F2F', 'Indesejável': '#F57C00',
+    'Gerenciável': '#FBC02D', 'Aceitável': '#388E3C'
+}
+CAT_AVALIACAO = ['Aceitável', 'Gerenciável', 'Indesejável', 'Inaceitável']
+CAT_IMPACTO_PROB = [1, 2, 3, 4]
+CONTROLES_PESOS = {
+    "INEXISTENTE": 1.0, "FRACO": 0.8, "MEDIANO": 0.6,
+    "SATISFATÓRIO": 0.4, "FORTE": 0.2
+}
+CONTROLES_NIVEIS = list(CONTROLES_PESOS.keys())
+
+# --- Compactação dos dados carregados ---
+# Colunas de texto com poucos valores distintos, guardadas como categorias
+# (com a ordem de exibição, quando ela existe)
+MAPA_COLS_CATEGORIA = {
+    'avaliacao_ri': CAT_AVALIACAO, 'avaliacao_rr': CAT_AVALIACAO, 'nivel_controle': CONTROLES_NIVEIS,
+    'classificacao': None, 'gestor_risco': None, 'resposta_risco': None, 'acao_estrategica': None
+}
+MAPA_COLS_NUMERICAS_COMPACTAS = ['gp', 'gi', 'nivel_ri', 'nivel_rr']
+INDICADORES_COLS_CATEGORIA = {COL_OBJETIVO: None, COL_INICIATIVA: None, COL_ACAO: None}
+
+# --- Cubo de agregados da Visão Geral ---
+# Contagem de riscos por combinação destas dimensões; KPIs, gráficos e filtros
+# da Visão Geral saem de fatias do cubo, sem percorrer o Mapa de Riscos
+CUBO_DIMENSOES = ['gp', 'gi', 'avaliacao_ri', 'avaliacao_rr', 'classificacao', 'gestor_risco', 'acao_estrategica']
+
+
+# ==================================================================
+# CARGA E LIMPEZA DAS PLANILHAS
+# ==================================================================
+
+@PERF.timed()
+def check_workbook_schema(uploaded_file, sheet_names):
+    """
+    Sondagem rápida (só lista de abas e cabeçalho) antes da leitura completa.
+    Levanta WorkbookLoadError com todos os problemas encontrados se o arquivo não serve.
+    """
+    expected = {name: (SHEET_HEADERS[name], SHEET_N_COLS[name]) for name in sheet_names}
+    try:
+        report = probe_workbook(uploaded_file, expected)
+    except zipfile.BadZipFile:
+        raise WorkbookLoadError(f"O arquivo '{getattr(uploaded_file, 'name', '')}' não é uma planilha .xlsx válida.")
+    except Exception:
+        # Estrutura interna incomum: a leitura completa decide
+        return
+
+    mensagens = [f"Erro ao ler a aba '{sheet_name}'. Verifique o nome da aba. "
+                 f"Abas esperadas: {', '.join(repr(name) for name in sheet_names)}."
+                 for sheet_name in report.missing_sheets]
+    mensagens += [f"Erro na aba '{sheet.sheet_name}': Estrutura de colunas inesperada. "
+                  f"Esperava {sheet.expected_columns} colunas, encontrou {sheet.found_columns}."
+                  for sheet in report.column_mismatches]
+    if mensagens:
+        raise WorkbookLoadError(mensagens)
+
+
+def read_workbook_sheets(uploaded_file, sheet_headers):
+    """ Lê todas as abas pedidas em uma única abertura do arquivo. """
+    try:
+        return read_sheets(uploaded_file, sheet_headers)
+    except SheetNotFoundError as e:
+        raise WorkbookLoadError(f"Erro ao ler a aba '{e.sheet_name}'. Verifique o nome da aba. Erro: {e}") from e
+    except Exception as e:
+        raise WorkbookLoadError(f"Erro ao ler o arquivo '{getattr(uploaded_file, 'name', '')}'. Erro: {e}") from e
+
+
+@PERF.timed()
+def clean_riscos_data(df_mapa, df_plano):
+    """ Valida e limpa as abas de Riscos (Mapa e Plano) já lidas do arquivo. """
+    if len(df_mapa.columns) != len(mapa_cols):
+        raise WorkbookLoadError(f"Erro na aba '{SHEET_MAPA}': Estrutura de colunas inesperada.")
+    if len(df_plano.columns) != len(plano_cols):
+        raise WorkbookLoadError(f"Erro na aba '{SHEET_PLANO}': Estrutura de colunas inesperada.")
+    df_mapa.columns = mapa_cols
+    df_plano.columns = plano_cols
+
+    # Limpeza (Riscos)
+    df_mapa.drop(columns=['col_vazia'], inplace=True, errors='ignore')
+    df_plano.drop(columns=['col_vazia'], inplace=True, errors='ignore')
+    df_mapa.dropna(subset=['acao_estrategica'], inplace=True)
+    df_plano.dropna(subset=['acao_estrategica'], inplace=True)
+    cols_num_mapa = ['gp', 'gi', 'nivel_ri', 'avaliacao_controle_ac', 'nivel_rr']
+    for col in cols_num_mapa:
+        if col in df_mapa.columns:
+            df_mapa[col] = pd.to_numeric(df_mapa[col], errors='coerce')
+    df_plano.replace('#REF!', pd.NA, inplace=True)
+    df_mapa['acao_estrategica'] = df_mapa['acao_estrategica'].str.strip()
+    df_mapa['evento_risco'] = df_mapa['evento_risco'].str.strip()
+    df_plano['evento_risco'] = df_plano['evento_risco'].str.strip()
+    compact_frame(df_mapa, MAPA_COLS_CATEGORIA, MAPA_COLS_NUMERICAS_COMPACTAS)
+    compact_frame(df_plano, {}, [])
+    return df_mapa, df_plano
+
+
+@PERF.timed()
+def clean_indicadores_data(df):
+    """ Valida e limpa a aba '1.1. Plano de Ação' já lida do arquivo. """
+    try:
+        # Verifica se o número de colunas bate
+        if len(df.columns) != len(indicadores_cols):
+            raise WorkbookLoadError(
+                f"Erro na aba '{SHEET_INDICADORES}': Estrutura de colunas inesperada. Esperava {len(indicadores_cols)} colunas, encontrou {len(df.columns)}.")
+
+        # Força a renomeação de TODAS as colunas
+        df.columns = indicadores_cols
+
+        # Seleciona apenas as colunas que nos interessam (agora incluindo meses e status)
+        df_indicadores = df[INDICADORES_COLS_REQUERIDAS].copy()
+
+        # Limpeza de Dados
+        df_indicadores[INDICADORES_COLS_FFILL] = df_indicadores[INDICADORES_COLS_FFILL].ffill()
+        df_indicadores.dropna(subset=[COL_IND_TITULO], inplace=True)
+        df_indicadores[COL_ACAO] = df_indicadores[COL_ACAO].str.strip()
+        compact_frame(df_indicadores, INDICADORES_COLS_CATEGORIA, COL_MESES)
+        return df_indicadores
+
+    except WorkbookLoadError:
+        raise
+    except Exception as e:
+        raise WorkbookLoadError(
+            f"Erro ao ler a aba '{SHEET_INDICADORES}'. Verifique o nome da aba e a estrutura. Erro: {e}") from e
+
+
+def to_category(series, order=None):
+    """
+    Converte uma coluna de texto repetitivo em categoria. Com `order`, a
+    categoria é ordenada; valores fora da lista entram no final (nada é perdido).
+    """
+    if pd.api.types.infer_dtype(series, skipna=True) != 'string':
+        return series  # Colunas com tipos misturados continuam como estão
+    if order is None:
+        return series.astype('category')
+    extras = sorted(set(series.dropna()) - set(order))
+    return series.astype(pd.CategoricalDtype(list(order) + extras, ordered=True))
+
+
+def downcast_numeric(series):
+    """
+    Menor tipo inteiro para colunas só com inteiros (int8 para 1-4). Colunas
+    com decimais ou vazios ficam em float64: em float32, 619.12 viraria
+    619.1199951171875 nos gráficos, nas tabelas e nos arquivos Arrow.
+    """
+    if series.notna().all() and (series % 1 == 0).all():
+        return pd.to_numeric(series, downcast='integer')
+    return series.astype('float64')
+
+
+@PERF.timed()
+def compact_frame(df, category_cols, numeric_cols):
+    """
+    Etapa de compactação pós-carga: categorias para textos repetitivos e tipos
+    numéricos menores. A memória antes/depois fica registrada em df.attrs['memoria'].
+    """
+    memoria_antes = int(df.memory_usage(deep=True).sum())
+    for col, order in category_cols.items():
+        if col in df.columns:
+            df[col] = to_category(df[col], order)
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = downcast_numeric(pd.to_numeric(df[col], errors='coerce'))
+    df.attrs['memoria'] = {'antes': memoria_antes, 'depois': int(df.memory_usage(deep=True).sum())}
+    return df
+
+
+def format_memory_report(frames):
+    """ Texto com a memória ocupada pelos DataFrames e a economia obtida na compactação. """
+    antes = sum(df.attrs.get('memoria', {}).get('antes', 0) for df in frames)
+    depois = sum(int(df.memory_usage(deep=True).sum()) for df in frames)
+    texto = f"Memória dos dados: {depois / 1024 ** 2:.1f} MB"
+    if antes > depois:
+        texto += f" (economia de {1 - depois / antes:.0%} com a compactação)"
+    return texto
+
+
+def ignore_progress(fracao, etapa):
+    """ Callback de progresso padrão dos carregadores (carga sem barra de progresso). """
+
+
+@PERF.timed()
+def load_riscos_data(uploaded_file, progress=ignore_progress):
+    """
+    Carrega os dados de Riscos (Mapa e Plano) do arquivo de upload.
+    Devolve um handle para o dataset compartilhado ('df_mapa', 'df_plano');
+    levanta WorkbookLoadError se o arquivo não puder ser carregado.
+    """
+    # Um novo upload do mesmo arquivo é atendido pelo cache, sem reler o Excel
+    progress(0.05, "Procurando a planilha de Riscos no cache")
+    with PERF.span("leitura_upload"):
+        cache_key = make_cache_key(uploaded_file.getvalue(), "riscos", SCHEMA_RISCOS)
+    cached = WORKBOOK_CACHE.get(cache_key)
+    if cached is not None:
+        return DATASET_STORE.acquire(cache_key, cached)
+
+    progress(0.1, "Verificando a estrutura da planilha de Riscos")
+    check_workbook_schema(uploaded_file, [SHEET_MAPA, SHEET_PLANO])
+    progress(0.2, f"Lendo as abas '{SHEET_MAPA}' e '{SHEET_PLANO}'")
+    sheets = read_workbook_sheets(uploaded_file, {SHEET_MAPA: HEADER_MAPA, SHEET_PLANO: HEADER_PLANO})
+    progress(0.7, "Limpando os dados de Riscos")
+    df_mapa, df_plano = clean_riscos_data(sheets[SHEET_MAPA], sheets[SHEET_PLANO])
+
+    frames = {"df_mapa": df_mapa, "df_plano": df_plano}
+    WORKBOOK_CACHE.put(cache_key, frames)
+    return DATASET_STORE.acquire(cache_key, frames)
+
+
+# (ATUALIZADO) Função de Carga para Indicadores
+@PERF.timed()
+def load_indicadores_data(uploaded_file, progress=ignore_progress):
+    """
+    Carrega e limpa os dados de Indicadores da aba '1.1. Plano de Ação'.
+    Devolve um handle para o dataset compartilhado ('df_indicadores');
+    levanta WorkbookLoadError se o arquivo não puder ser carregado.
+    """
+    progress(0.05, "Procurando a planilha de Planejamento no cache")
+    with PERF.span("leitura_upload"):
+        cache_key = make_cache_key(uploaded_file.getvalue(), "indicadores", SCHEMA_INDICADORES)
+    cached = WORKBOOK_CACHE.get(cache_key)
+    if cached is not None:
+        return DATASET_STORE.acquire(cache_key, cached)
+
+    progress(0.1, "Verificando a estrutura da planilha de Planejamento")
+    check_workbook_schema(uploaded_file, [SHEET_INDICADORES])
+    progress(0.2, f"Lendo a aba '{SHEET_INDICADORES}'")
+    sheets = read_workbook_sheets(uploaded_file, {SHEET_INDICADORES: HEADER_INDICADORES})
+    progress(0.7, "Limpando os dados de Indicadores")
+    df_indicadores = clean_indicadores_data(sheets[SHEET_INDICADORES])
+
+    frames = {"df_indicadores": df_indicadores}
+    WORKBOOK_CACHE.put(cache_key, frames)
+    return DATASET_STORE.acquire(cache_key, frames)
+
+
+@PERF.timed()
+def load_integrated_data(uploaded_file, progress=ignore_progress):
+    """
+    Carrega Riscos e Indicadores quando as três abas estão no mesmo arquivo:
+    o arquivo é aberto uma única vez para todas elas. Devolve os dois handles.
+    """
+    progress(0.05, "Procurando a planilha no cache")
+    with PERF.span("leitura_upload"):
+        file_bytes = uploaded_file.getvalue()
+        key_riscos = make_cache_key(file_bytes, "riscos", SCHEMA_RISCOS)
+        key_indicadores = make_cache_key(file_bytes, "indicadores", SCHEMA_INDICADORES)
+    cached_riscos = WORKBOOK_CACHE.get(key_riscos)
+    cached_indicadores = WORKBOOK_CACHE.get(key_indicadores)
+
+    sheet_names = []
+    if cached_riscos is None:
+        sheet_names += [SHEET_MAPA, SHEET_PLANO]
+    if cached_indicadores is None:
+        sheet_names.append(SHEET_INDICADORES)
+    sheets = {}
+    if sheet_names:
+        progress(0.1, "Verificando a estrutura da planilha")
+        check_workbook_schema(uploaded_file, sheet_names)
+        progress(0.2, f"Lendo as abas {', '.join(repr(name) for name in sheet_names)}")
+        sheets = read_workbook_sheets(uploaded_file, {name: SHEET_HEADERS[name] for name in sheet_names})
+
+    progress(0.7, "Limpando os dados")
+    if cached_riscos is None:
+        df_mapa, df_plano = clean_riscos_data(sheets[SHEET_MAPA], sheets[SHEET_PLANO])
+        cached_riscos = {"df_mapa": df_mapa, "df_plano": df_plano}
+        WORKBOOK_CACHE.put(key_riscos, cached_riscos)
+
+    if cached_indicadores is None:
+        df_indicadores = clean_indicadores_data(sheets[SHEET_INDICADORES])
+        cached_indicadores = {"df_indicadores": df_indicadores}
+        WORKBOOK_CACHE.put(key_indicadores, cached_indicadores)
+
+    return (DATASET_STORE.acquire(key_riscos, cached_riscos),
+            DATASET_STORE.acquire(key_indicadores, cached_indicadores))
+
+
+# --- Cargas em segundo plano (executadas no INGESTION_POOL) ---
+# Além de ler a planilha, já montam os agregados e índices usados pelas páginas.
+# O resultado é {chave na sessão: handle do dataset}.
+
+@PERF.timed()
+def prepare_riscos(dataset):
+    """ Agregados da Visão Geral e índices de consulta, prontos já na carga. """
+    get_overview_cube(dataset)
+    get_riscos_index(dataset)
+
+
+@PERF.timed()
+def prepare_indicadores(dataset):
+    get_indicadores_index(dataset)
+    get_scorecard(dataset)
+
+
+def ingest_riscos(uploaded_file, progress=ignore_progress):
+    dataset_riscos = load_riscos_data(uploaded_file, progress)
+    progress(0.9, "Montando índices e agregados de Riscos")
+    prepare_riscos(dataset_riscos)
+    progress(1.0, "Riscos carregados")
+    return {'dataset_riscos': dataset_riscos}
+
+
+def ingest_indicadores(uploaded_file, progress=ignore_progress):
+    dataset_indicadores = load_indicadores_data(uploaded_file, progress)
+    progress(0.9, "Montando índices e scorecard dos Indicadores")
+    prepare_indicadores(dataset_indicadores)
+    progress(1.0, "Indicadores carregados")
+    return {'dataset_indicadores': dataset_indicadores}
+
+
+def ingest_integrated(uploaded_file, progress=ignore_progress):
+    dataset_riscos, dataset_indicadores = load_integrated_data(uploaded_file, progress)
+    progress(0.9, "Montando índices e agregados")
+    prepare_riscos(dataset_riscos)
+    prepare_indicadores(dataset_indicadores)
+    progress(1.0, "Dados carregados")
+    return {'dataset_riscos': dataset_riscos, 'dataset_indicadores': dataset_indicadores}
+
+
+@PERF.timed()
+def combine_units(unidades):
+    """
+    Portfólio: junta os Mapas e Planos de várias unidades ({nome da unidade:
+    handle do dataset de Riscos}) em um único dataset compartilhado, com a
+    coluna COL_UNIDADE indicando a origem de cada linha. As linhas mantêm o
+    índice da planilha de origem. Devolve o handle do dataset combinado; os
+    handles das unidades continuam com quem chamou.
+    """
+    nomes = list(unidades)
+    frames = {}
+    for nome_frame, cols_categoria, cols_numericas in [
+            ('df_mapa', MAPA_COLS_CATEGORIA, MAPA_COLS_NUMERICAS_COMPACTAS), ('df_plano', {}, [])]:
+        partes = [handle[nome_frame] for handle in unidades.values()]
+        df = pd.concat(partes)
+        # Categoria montada direto dos códigos: um inteiro por linha, sem repetir o texto
+        codigos = np.repeat(np.arange(len(partes), dtype=np.int32), [len(parte) for parte in partes])
+        df.insert(0, COL_UNIDADE, pd.Categorical.from_codes(codigos, categories=nomes))
+        # Categorias diferentes entre as unidades viram texto no concat: compacta de novo
+        compact_frame(df, cols_categoria, cols_numericas)
+        df.attrs['memoria']['antes'] = sum(parte.attrs.get('memoria', {}).get('antes', 0) for parte in partes)
+        frames[nome_frame] = df
+
+    # Mesmas planilhas com os mesmos nomes de unidade = mesmo portfólio (compartilhado entre sessões)
+    composicao = "\n".join(f"{nome}\t{handle.key}" for nome, handle in unidades.items())
+    chave = "portfolio-" + hashlib.sha256(composicao.encode("utf-8")).hexdigest()
+    return DATASET_STORE.acquire(chave, frames)
+
+
+# ==================================================================
+# AGREGADOS E ÍNDICES
+# ==================================================================
+
+def get_avaliacao_from_nivel(nivel):
+    if nivel <= 2:
+        return "Aceitável"
+    elif nivel <= 6:
+        return "Gerenciável"
+    elif nivel <= 9:
+        return "Indesejável"
+    else:
+        return "Inaceitável"
+
+
+@PERF.timed()
+def build_overview_cube(df_mapa):
+    """
+    Contagem de riscos por combinação de CUBO_DIMENSOES (apenas combinações
+    existentes, inclusive vazias). No Portfólio, a unidade também é dimensão.
+    """
+    dimensoes = CUBO_DIMENSOES + [COL_UNIDADE] if COL_UNIDADE in df_mapa.columns else CUBO_DIMENSOES
+    return (df_mapa.groupby(dimensoes, observed=True, dropna=False)
+            .size().reset_index(name='contagem'))
+
+
+def get_overview_cube(dataset):
+    """ Cubo da Visão Geral do dataset, calculado uma vez e compartilhado entre as sessões. """
+    return dataset.derived("cubo_visao_geral", lambda ds: build_overview_cube(ds.frames['df_mapa']))
+
+
+def slice_cube(cubo, acoes=None, gestores=None):
+    """ Fatia do cubo para as Ações Estratégicas e Gestores selecionados (lista vazia = todos). """
+    mascara = pd.Series(True, index=cubo.index)
+    if acoes:
+        mascara &= cubo['acao_estrategica'].isin(acoes)
+    if gestores:
+        mascara &= cubo['gestor_risco'].isin(gestores)
+    return cubo[mascara]
+
+
+def cube_counts(cubo, dimensao):
+    """ Equivalente a df_mapa[dimensao].value_counts() calculado sobre o cubo. """
+    contagem = cubo.groupby(dimensao, observed=True)['contagem'].sum()
+    contagem = contagem[contagem > 0].sort_values(ascending=False, kind='stable')
+    return contagem.rename('count').reset_index()
+
+
+def cube_total(cubo, dimensao=None, valor=None):
+    """ Total de riscos da fatia (opcionalmente só os com `dimensao == valor`). """
+    if dimensao is None:
+        return int(cubo['contagem'].sum())
+    return int(cubo.loc[cubo[dimensao] == valor, 'contagem'].sum())
+
+
+def get_unidades(dataset):
+    """ Unidades do Portfólio, na ordem de carga (lista vazia fora do modo Portfólio). """
+    def build(ds):
+        df_mapa = ds.frames['df_mapa']
+        return df_mapa[COL_UNIDADE].cat.categories.tolist() if COL_UNIDADE in df_mapa.columns else []
+    return dataset.derived("unidades", build)
+
+
+def select_units(dataset, unidades):
+    """
+    Recorte do Portfólio só com as `unidades` escolhidas (lista vazia ou todas
+    = o próprio dataset). O recorte tem seus próprios cubo, índices e tabelas,
+    e as páginas o usam no lugar do dataset inteiro.
+    """
+    todas = get_unidades(dataset)
+    escolhidas = set(unidades)
+    if not escolhidas or escolhidas.issuperset(todas):
+        return dataset
+    selecao = [unidade for unidade in todas if unidade in escolhidas]
+
+    def build(ds):
+        return {nome: df[df[COL_UNIDADE].isin(selecao)] for nome, df in ds.frames.items()}
+    return dataset.view("unidades=" + "\t".join(selecao), build)
+
+
+def get_riscos_index(dataset):
+    """ Índices de riscos, planos, ações e gestores do dataset (montados uma vez, compartilhados). """
+    return dataset.derived(
+        "indice_riscos", lambda ds: build_riscos_index(ds.frames['df_mapa'], ds.frames['df_plano']))
+
+
+def get_indicadores_index(dataset):
+    """ Índices de ações e indicadores do dataset de Indicadores. """
+    return dataset.derived(
+        "indice_indicadores",
+        lambda ds: build_indicadores_index(ds.frames['df_indicadores'], COL_ACAO, COL_IND_TITULO))
+
+
+def get_indicator_series(dataset):
+    """ Valores mensais numéricos de todos os indicadores (matriz e formato longo). """
+    return dataset.derived(
+        "series_indicadores", lambda ds: build_indicator_series(ds.frames['df_indicadores'], COL_MESES))
+
+
+def get_scorecard(dataset):
+    """ Scorecard de todos os indicadores, com Ação e Indicador para exibição (uma linha por indicador_id). """
+    def build(ds):
+        df_indicadores = ds.frames['df_indicadores']
+        scorecard = build_scorecard(get_indicator_series(dataset), df_indicadores,
+                                    COL_IND_VALOR, COL_IND_REALIZADO, COL_IND_ALCANCE)
+        scorecard.insert(0, COL_ACAO, df_indicadores[COL_ACAO].to_numpy())
+        scorecard.insert(1, COL_IND_TITULO, df_indicadores[COL_IND_TITULO].to_numpy())
+        scorecard.insert(2, COL_IND_UNIDADE, df_indicadores[COL_IND_UNIDADE].to_numpy())
+        return scorecard
+    return dataset.derived("scorecard_indicadores", build)
+
+
+def get_acoes_integradas(dataset_riscos, dataset_indicadores):
+    """ Lista ordenada das Ações Estratégicas presentes nos Riscos ou nos Indicadores. """
+    acoes = get_riscos_index(dataset_riscos).acoes + get_indicadores_index(dataset_indicadores).acoes
+    return dataset_riscos.derived(f"acoes_integradas:{dataset_indicadores.key}", lambda ds: sorted(set(acoes)))
+
+
+# ==================================================================
+# VISÃO GERAL (KPIs E GRÁFICOS)
+# ==================================================================
+
+def build_heatmap_figure(cubo):
+    """ Heatmap do Risco Inerente (GP x GI) com a contagem de riscos da fatia do cubo. """
+    df_ri_matrix = cubo.groupby(['gp', 'gi'], observed=True)['contagem'].sum().reset_index()
+    fig_ri = px.density_heatmap(
+        df_ri_matrix, x='gi', y='gp', z='contagem', text_auto=True,
+        title="Heatmap Risco Inerente (GP x GI)", labels=FRIENDLY_NAMES,
+        category_orders={'gi': CAT_IMPACTO_PROB, 'gp': CAT_IMPACTO_PROB},
+        color_continuous_scale='YlOrRd'
+    )
+    fig_ri.update_layout(xaxis_title=FRIENDLY_NAMES['gi'], yaxis_title=FRIENDLY_NAMES['gp'],
+                         xaxis=dict(tickmode='linear'), yaxis=dict(tickmode='linear'),
+                         margin=dict(l=0, r=0, t=40, b=0))
+    return fig_ri
+
+
+def build_avaliacao_figure(cubo, dimensao, titulo):
+    """ Barras por avaliação (RI ou RR), nas cores da escala de risco. """
+    fig = px.bar(
+        cube_counts(cubo, dimensao), x=dimensao, y='count', text_auto=True, title=titulo,
+        labels={dimensao: FRIENDLY_NAMES[dimensao], 'count': FRIENDLY_NAMES['contagem']},
+        category_orders={dimensao: CAT_AVALIACAO},
+        color=dimensao, color_discrete_map=RISK_COLORS
+    )
+    fig.update_layout(xaxis_title=FRIENDLY_NAMES[dimensao], yaxis_title=FRIENDLY_NAMES['contagem'],
+                      margin=dict(l=0, r=0, t=40, b=0), showlegend=False)
+    return fig
+
+
+def build_contagem_figure(cubo, dimensao, titulo):
+    """ Barras com a contagem de riscos por valor da dimensão (classificação, gestor...). """
+    fig = px.bar(
+        cube_counts(cubo, dimensao), x=dimensao, y='count', title=titulo,
+        labels={dimensao: FRIENDLY_NAMES[dimensao], 'count': FRIENDLY_NAMES['contagem']},
+        text_auto=True, color_discrete_sequence=['#003366']  # Sua cor azul marinho
+    )
+    fig.update_layout(xaxis_title=FRIENDLY_NAMES[dimensao], yaxis_title=FRIENDLY_NAMES['contagem'],
+                      margin=dict(l=0, r=0, t=40, b=0))
+    return fig
+
+
+# Gráficos da Visão Geral, na ordem da página: chave -> montagem a partir do cubo
+OVERVIEW_FIGURES = {
+    'heatmap_ri': build_heatmap_figure,
+    'avaliacao_ri': lambda cubo: build_avaliacao_figure(
+        cubo, 'avaliacao_ri', "Contagem de Riscos por Avaliação Inerente"),
+    'avaliacao_rr': lambda cubo: build_avaliacao_figure(
+        cubo, 'avaliacao_rr', "Contagem de Riscos por Avaliação Residual"),
+    'classificacao': lambda cubo: build_contagem_figure(
+        cubo, 'classificacao', "Contagem de Riscos por Classificação"),
+    'gestor_risco': lambda cubo: build_contagem_figure(cubo, 'gestor_risco', "Contagem de Riscos por Gestor"),
+}
+
+
+def heatmap_matrix(cubo):
+    """ Contagem de riscos GP (linhas) x GI (colunas), com todos os níveis de 1 a 4. """
+    matriz = cubo.groupby(['gp', 'gi'], observed=True)['contagem'].sum().unstack(fill_value=0)
+    return matriz.reindex(index=CAT_IMPACTO_PROB, columns=CAT_IMPACTO_PROB, fill_value=0).astype(int)
+
+
+def overview_summary(cubo):
+    """ Números da Visão Geral de uma fatia do cubo, só com tipos nativos (pronto para JSON). """
+    def contagens(dimensao):
+        tabela = cube_counts(cubo, dimensao)
+        return {str(valor): int(total) for valor, total in zip(tabela[dimensao], tabela['count'])}
+
+    riscos_ri_inaceitavel = cube_total(cubo, 'avaliacao_ri', 'Inaceitável')
+    riscos_rr_inaceitavel = cube_total(cubo, 'avaliacao_rr', 'Inaceitável')
+    return {
+        'total_riscos': cube_total(cubo),
+        'ri_inaceitavel': riscos_ri_inaceitavel,
+        'rr_inaceitavel': riscos_rr_inaceitavel,
+        'delta_inaceitavel': riscos_rr_inaceitavel - riscos_ri_inaceitavel,
+        'por_avaliacao_ri': contagens('avaliacao_ri'),
+        'por_avaliacao_rr': contagens('avaliacao_rr'),
+        'por_classificacao': contagens('classificacao'),
+        'por_gestor': contagens('gestor_risco'),
+        'matriz_gp_gi': heatmap_matrix(cubo).to_numpy().tolist(),
+    }
@@ -0,0 +1,209 @@
+"""
+Memória das sessões: despejo dos dados ociosos para o disco local.
+
+Os DataFrames de cada planilha ficam no DATASET_STORE enquanto alguma sessão
+tiver um handle para eles, mesmo com a aba aberta e esquecida. O gerenciador
+verifica os datasets a cada MEMORIA_VERIFICACAO_SEGUNDOS e tira da memória:
+  - os que nenhuma sessão usa há mais de SESSAO_TTL_SEGUNDOS;
+  - com MEMORIA_ORCAMENTO_MB > 0, os menos usados recentemente (sem uso há
+    pelo menos OCIOSO_MINIMO_SEGUNDOS) até a memória voltar ao orçamento.
+Os DataFrames são gravados em Arrow IPC em SPILL_DIR e saem da memória com
+os derivados; quando uma sessão volta, o próximo acesso os lê de volta
+(mapa de memória) sem que o app perceba, e os derivados são refeitos sob
+demanda. O arquivo no disco é reaproveitado em novos despejos e apagado
+quando o dataset sai do registro.
+
+O painel dos operadores (?memoria na URL) lista as sessões e as chaves dos
+datasets e só aparece com PAINEL_MEMORIA_PAINEL=1.
+"""
+import atexit
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+
+from dataset_store import DATASET_STORE
+from workbook_cache import WORKBOOK_CACHE, arrow_safe, from_arrow
+
+# --- Configuração (pode ser sobrescrita por variáveis de ambiente) ---
+SESSAO_TTL_SEGUNDOS = int(os.environ.get("PAINEL_SESSAO_TTL", "1800"))
+MEMORIA_ORCAMENTO_MB = int(os.environ.get("PAINEL_MEMORIA_MB", "0"))  # 0 = sem orçamento
+OCIOSO_MINIMO_SEGUNDOS = int(os.environ.get("PAINEL_OCIOSO_MINIMO", "60"))
+MEMORIA_VERIFICACAO_SEGUNDOS = float(os.environ.get("PAINEL_MEMORIA_VERIFICACAO", "60"))
+SPILL_DIR = os.environ.get("PAINEL_SPILL_DIR", os.path.join(tempfile.gettempdir(), f"painel_spill_{os.getpid()}"))
+MEMORIA_PAINEL = os.environ.get("PAINEL_MEMORIA_PAINEL", "").lower() not in ("", "0", "false", "nao", "não")
+
+
+def write_frames(pasta, frames):
+    """
+    Grava cada DataFrame em um arquivo Arrow IPC da pasta. Cada arquivo é
+    gravado ao lado e trocado de uma vez: um arquivo antigo ainda mapeado
+    na memória nunca é sobrescrito.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    for nome, df in frames.items():
+        tabela = pa.Table.from_pandas(arrow_safe(df))
+        caminho = os.path.join(pasta, f"{nome}.arrow")
+        with pa.OSFile(f"{caminho}.tmp", "wb") as destino:
+            with pa.ipc.new_file(destino, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+        os.replace(f"{caminho}.tmp", caminho)
+
+
+def read_frames(pasta, nomes):
+    return {nome: from_arrow(pa.ipc.open_file(pa.memory_map(os.path.join(pasta, f"{nome}.arrow"))).read_all()
+                             .to_pandas())
+            for nome in nomes}
+
+
+class SessionMemoryManager:
+    """ Despejo e reidratação dos datasets ociosos, com estatísticas por dataset e por sessão. """
+
+    def __init__(self, store=DATASET_STORE, directory=SPILL_DIR, ttl=SESSAO_TTL_SEGUNDOS,
+                 orcamento_mb=MEMORIA_ORCAMENTO_MB, ocioso_minimo=OCIOSO_MINIMO_SEGUNDOS,
+                 intervalo=MEMORIA_VERIFICACAO_SEGUNDOS):
+        self.store = store
+        self.directory = directory
+        self.ttl = ttl
+        self.orcamento_mb = orcamento_mb
+        self.ocioso_minimo = ocioso_minimo
+        self.intervalo = intervalo
+        self._sessoes = {}
+        self._despejados = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self.contadores = {"despejos_ttl": 0, "despejos_orcamento": 0, "reidratacoes": 0, "falhas_despejo": 0,
+                           "mb_despejados": 0.0, "segundos_reidratacao": 0.0}
+
+    def start(self):
+        """ Inicia a verificação periódica (chamadas repetidas não criam outra thread). """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="painel-memoria", daemon=True)
+            self._thread.start()
+        atexit.register(shutil.rmtree, self.directory, True)
+
+    def stop(self):
+        self._parar.set()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            self.sweep()
+
+    def touch(self, sessao, handles):
+        """ Registra os datasets que a sessão está usando (a cada execução do app). """
+        with self._lock:
+            self._sessoes[sessao] = {"visto_em": time.time(), "chaves": [handle.key for handle in handles]}
+
+    # --- Despejo ---
+
+    def sweep(self, agora=None):
+        """ Uma verificação: limpa o que saiu do registro e despeja por TTL e por orçamento. Devolve os bytes liberados. """
+        agora = time.time() if agora is None else agora
+        datasets = self.store.datasets()
+        self._forget_released({dataset.key for dataset in datasets})
+
+        liberado = 0
+        residentes = sorted((dataset for dataset in datasets if dataset.resident), key=lambda d: d.last_used)
+        for dataset in residentes:
+            if agora - dataset.last_used > self.ttl:
+                liberado += self._spill(dataset, agora - self.ttl, "despejos_ttl")
+
+        if self.orcamento_mb:
+            excesso = sum(d.nbytes for d in residentes if d.resident) - self.orcamento_mb * 1024 ** 2
+            for dataset in residentes:
+                if excesso <= 0 or agora - dataset.last_used < self.ocioso_minimo:
+                    break
+                if dataset.resident:
+                    bytes_liberados = self._spill(dataset, agora - self.ocioso_minimo, "despejos_orcamento")
+                    excesso -= bytes_liberados
+                    liberado += bytes_liberados
+        return liberado
+
+    def _forget_released(self, chaves_vivas):
+        """ Apaga os arquivos dos datasets liberados e esquece as sessões que não têm mais dados. """
+        with self._lock:
+            mortas = [chave for chave in self._despejados if chave not in chaves_vivas]
+            pastas = [self._despejados.pop(chave) for chave in mortas]
+            for sessao in [s for s, info in self._sessoes.items() if not set(info["chaves"]) & chaves_vivas]:
+                del self._sessoes[sessao]
+        for pasta in pastas:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    def _spill(self, dataset, usado_antes_de, motivo):
+        pasta = os.path.join(self.directory, hashlib.sha256(dataset.key.encode("utf-8")).hexdigest()[:24])
+
+        def spill(frames):
+            nomes = list(frames)
+            # Os dados do dataset não mudam: um arquivo de um despejo anterior continua valendo
+            if self._despejados.get(dataset.key) != pasta:
+                write_frames(pasta, frames)
+                with self._lock:
+                    self._despejados[dataset.key] = pasta
+            return lambda: self._rehydrate(pasta, nomes)
+
+        try:
+            liberado = dataset.evict(spill, usado_antes_de)
+        except (OSError, pa.ArrowException):
+            shutil.rmtree(pasta, ignore_errors=True)
+            with self._lock:
+                self._despejados.pop(dataset.key, None)
+                self.contadores["falhas_despejo"] += 1
+            return 0
+        if liberado:
+            # Sem isso a cópia do cache de planilhas manteria os mesmos DataFrames na memória
+            WORKBOOK_CACHE.discard(dataset.key)
+            with self._lock:
+                self.contadores[motivo] += 1
+                self.contadores["mb_despejados"] += liberado / 1024 ** 2
+        return liberado
+
+    def _rehydrate(self, pasta, nomes):
+        inicio = time.perf_counter()
+        frames = read_frames(pasta, nomes)
+        with self._lock:
+            self.contadores["reidratacoes"] += 1
+            self.contadores["segundos_reidratacao"] += time.perf_counter() - inicio
+        return frames
+
+    # --- Consulta (painel dos operadores) ---
+
+    def stats(self):
+        """ Datasets (em memória ou no disco), sessões registradas e contadores de despejo. """
+        agora = time.time()
+        datasets = self.store.datasets()
+        por_chave = {dataset.key: dataset for dataset in datasets}
+        with self._lock:
+            sessoes = {sessao: dict(info) for sessao, info in self._sessoes.items()}
+            contadores = dict(self.contadores)
+
+        def mb(chaves, em_memoria):
+            # Um dataset compartilhado conta inteiro para cada sessão que o usa
+            return sum(por_chave[chave].nbytes for chave in chaves
+                       if chave in por_chave and por_chave[chave].resident == em_memoria) / 1024 ** 2
+
+        return {
+            "datasets": [
+                {"chave": dataset.key, "sessoes": dataset.refcount, "mb": dataset.nbytes / 1024 ** 2,
+                 "em_memoria": dataset.resident, "ocioso_s": agora - dataset.last_used}
+                for dataset in datasets
+            ],
+            "sessoes": [
+                {"sessao": sessao, "visto_ha_s": agora - info["visto_em"],
+                 "mb_memoria": mb(info["chaves"], True), "mb_disco": mb(info["chaves"], False)}
+                for sessao, info in sessoes.items()
+            ],
+            "memoria_mb": sum(d.nbytes for d in datasets if d.resident) / 1024 ** 2,
+            "disco_mb": sum(d.nbytes for d in datasets if not d.resident) / 1024 ** 2,
+            "contadores": contadores,
+        }
+
+
+# Instância única por processo, compartilhada por todas as sessões do Streamlit
+SESSION_MEMORY = SessionMemoryManager()
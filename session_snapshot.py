@@ -0,0 +1,140 @@
+"""
+Análise salva: os DataFrames limpos e o modo do app em um único arquivo
+colunar (.painel), para reabrir o painel sem passar de novo pelo Excel.
+
+O arquivo é um zip sem compressão do zip em si: um manifesto JSON e um
+arquivo Arrow IPC por DataFrame, com os buffers comprimidos em zstd. Cada
+tabela fica contígua no arquivo e é lida direto do mapa de memória (ou do
+buffer do upload), sem cópia dos bytes; só a descompressão gera memória nova.
+
+O manifesto vem de um arquivo enviado pelo usuário e não é confiável: modo,
+datasets e nomes dos DataFrames só são aceitos se forem os do painel, e os
+dados restaurados são registrados sob uma chave própria, derivada do hash do
+arquivo, nunca sob a chave de uma planilha carregada por outra sessão.
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+import zipfile
+from datetime import datetime
+
+import pyarrow as pa
+
+from dataset_store import DATASET_STORE
+from ingestion import WorkbookLoadError
+from perf_trace import PERF
+from workbook_cache import CACHE_VERSAO, arrow_safe, from_arrow
+
+SNAPSHOT_VERSAO = 1
+SNAPSHOT_EXTENSAO = "painel"
+SNAPSHOT_COMPRESSAO = "zstd"
+_MANIFESTO = "manifest.json"
+# DataFrames de cada dataset da sessão e datasets de cada modo do app
+SNAPSHOT_FRAMES = {'dataset_riscos': ('df_mapa', 'df_plano'), 'dataset_indicadores': ('df_indicadores',)}
+SNAPSHOT_MODOS = {'risk_only': ('dataset_riscos',), 'integrated': ('dataset_riscos', 'dataset_indicadores'),
+                  'portfolio': ('dataset_riscos',)}
+# Cabeçalho local de cada membro do zip: 30 bytes fixos + nome + campo extra
+_CABECALHO_LOCAL = struct.Struct("<IHHHHHIIIHH")
+
+
+@PERF.timed()
+def write_snapshot(modo, datasets, extras=None):
+    """
+    Bytes do arquivo da análise. `datasets` mapeia a chave da sessão
+    ('dataset_riscos', ...) para o handle do dataset; `extras` vai para o
+    manifesto como está (ex.: falhas do Portfólio).
+    """
+    manifesto = {'versao': SNAPSHOT_VERSAO, 'cache_versao': CACHE_VERSAO, 'modo': modo,
+                 'criado_em': datetime.now().isoformat(timespec='seconds'), 'datasets': {}, 'extras': extras or {}}
+    opcoes = pa.ipc.IpcWriteOptions(compression=SNAPSHOT_COMPRESSAO)
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_STORED) as arquivo:
+        for chave_sessao, dataset in datasets.items():
+            nomes = list(dataset.dataset.frames)
+            manifesto['datasets'][chave_sessao] = {'frames': nomes}
+            for nome in nomes:
+                tabela = pa.Table.from_pandas(arrow_safe(dataset[nome]))
+                destino = pa.BufferOutputStream()
+                with pa.ipc.new_file(destino, tabela.schema, options=opcoes) as escritor:
+                    escritor.write_table(tabela)
+                arquivo.writestr(f"{chave_sessao}/{nome}.arrow", destino.getvalue().to_pybytes())
+        arquivo.writestr(_MANIFESTO, json.dumps(manifesto, ensure_ascii=False, indent=2))
+    return saida.getvalue()
+
+
+def _open_buffer(source):
+    """ Buffer Arrow do arquivo: mapa de memória para caminhos, o próprio buffer do upload para arquivos enviados. """
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(source), "r").read_buffer()
+    if hasattr(source, 'getbuffer'):
+        return pa.py_buffer(source.getbuffer())
+    return pa.py_buffer(source)
+
+
+def _check_manifest(manifesto, nome):
+    """ Recusa manifestos com modo, datasets, DataFrames ou extras que o painel não gera. """
+    invalido = WorkbookLoadError(f"O arquivo '{nome}' não é uma análise salva do painel: conteúdo inesperado.")
+    modo = manifesto.get('modo')
+    datasets = manifesto.get('datasets')
+    if modo not in SNAPSHOT_MODOS or not isinstance(datasets, dict) or set(datasets) != set(SNAPSHOT_MODOS[modo]):
+        raise invalido
+    for chave_sessao, conteudo in datasets.items():
+        frames = conteudo.get('frames') if isinstance(conteudo, dict) else None
+        if not isinstance(frames, list) or sorted(frames) != sorted(SNAPSHOT_FRAMES[chave_sessao]):
+            raise invalido
+    extras = manifesto.get('extras')
+    falhas = extras.get('portfolio_falhas', {}) if isinstance(extras, dict) else None
+    if not isinstance(falhas, dict) or not all(
+            isinstance(unidade, str) and isinstance(mensagens, list) and all(isinstance(m, str) for m in mensagens)
+            for unidade, mensagens in falhas.items()):
+        raise invalido
+
+
+def _member(buffer, info):
+    """ Fatia do buffer com o conteúdo de um membro não comprimido do zip (sem cópia). """
+    cabecalho = _CABECALHO_LOCAL.unpack(buffer.slice(info.header_offset, _CABECALHO_LOCAL.size).to_pybytes())
+    inicio = info.header_offset + _CABECALHO_LOCAL.size + cabecalho[9] + cabecalho[10]
+    return buffer.slice(inicio, info.file_size)
+
+
+@PERF.timed()
+def read_snapshot(source):
+    """
+    Restaura uma análise salva. Devolve (modo, {chave da sessão: handle}, extras);
+    levanta WorkbookLoadError se o arquivo não for uma análise salva válida.
+    """
+    nome = getattr(source, 'name', str(source))
+    try:
+        buffer = _open_buffer(source)
+        with zipfile.ZipFile(pa.BufferReader(buffer)) as arquivo:
+            manifesto = json.loads(arquivo.read(_MANIFESTO))
+            membros = {info.filename: info for info in arquivo.infolist()}
+        if not isinstance(manifesto, dict):
+            raise WorkbookLoadError(f"O arquivo '{nome}' não foi gerado pelo painel.")
+        if manifesto.get('versao') != SNAPSHOT_VERSAO or manifesto.get('cache_versao') != CACHE_VERSAO:
+            # A limpeza dos dados mudou desde que a análise foi salva
+            raise WorkbookLoadError(f"A análise salva '{nome}' é de uma versão anterior do painel. "
+                                    "Carregue a planilha novamente e salve uma nova análise.")
+        if any(info.compress_type != zipfile.ZIP_STORED for info in membros.values()):
+            raise WorkbookLoadError(f"O arquivo '{nome}' não foi gerado pelo painel.")
+        _check_manifest(manifesto, nome)
+        conteudo_hash = hashlib.sha256(memoryview(buffer)).hexdigest()
+        datasets = {}
+        for chave_sessao in manifesto['datasets']:
+            frames = {}
+            for frame in SNAPSHOT_FRAMES[chave_sessao]:
+                tabela = pa.ipc.open_file(_member(buffer, membros[f"{chave_sessao}/{frame}.arrow"])).read_all()
+                frames[frame] = from_arrow(tabela.to_pandas())
+            datasets[chave_sessao] = frames
+    except WorkbookLoadError:
+        raise
+    except (zipfile.BadZipFile, KeyError, TypeError, ValueError, OSError, pa.ArrowException) as e:
+        raise WorkbookLoadError(f"O arquivo '{nome}' não é uma análise salva do painel. Erro: {e}") from e
+
+    # Chave do próprio arquivo: sessões que reabrem o mesmo arquivo compartilham os dados,
+    # e um manifesto editado não alcança os datasets das planilhas carregadas
+    handles = {chave_sessao: DATASET_STORE.acquire(f"snapshot-{conteudo_hash}-{chave_sessao}", frames)
+               for chave_sessao, frames in datasets.items()}
+    return manifesto['modo'], handles, manifesto['extras']
@@ -0,0 +1,284 @@
+"""
+Simulação "e se" dos controles para o portfólio inteiro de riscos.
+
+O Simulador de Controles avalia um risco por vez. Aqui a mesma conta
+(Risco Residual = Nível RI × peso do controle) é feita para todo o Mapa de
+Riscos de uma só vez com NumPy, a partir de um mapeamento de níveis de
+controle (ex.: todo controle FRACO passa a MEDIANO).
+
+Também há uma simulação de Monte Carlo, em que GP, GI e a eficácia do
+controle de cada risco são sorteados em torno dos valores da planilha, para
+estimar a probabilidade de cada faixa de avaliação residual.
+"""
+import contextlib
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Escala de avaliação do nível de risco (mesmos cortes de get_avaliacao_from_nivel)
+LIMITES_AVALIACAO = np.array([2, 6, 9])
+AVALIACOES = np.array(['Aceitável', 'Gerenciável', 'Indesejável', 'Inaceitável'], dtype=object)
+
+
+def avaliacao_from_niveis(niveis):
+    """
+    Versão vetorizada de get_avaliacao_from_nivel: nível <= 2 é Aceitável,
+    <= 6 Gerenciável, <= 9 Indesejável e o resto (inclusive vazio) Inaceitável.
+    """
+    niveis = np.asarray(niveis, dtype=float)
+    # searchsorted coloca NaN depois de todos os cortes, como o `else` da versão escalar
+    return AVALIACOES[np.searchsorted(LIMITES_AVALIACAO, niveis, side='left')]
+
+
+@dataclass
+class WhatIfResult:
+    """ Resultado da simulação: distribuição antes/depois e detalhes risco a risco. """
+    antes: pd.Series
+    depois: pd.Series
+    detalhes: pd.DataFrame
+
+    @property
+    def distribuicao(self):
+        """ Contagem por avaliação residual, antes e depois, com a variação. """
+        tabela = pd.DataFrame({'antes': self.antes, 'depois': self.depois})
+        tabela['variacao'] = tabela['depois'] - tabela['antes']
+        return tabela
+
+    @property
+    def alterados(self):
+        """ Apenas os riscos cujo controle foi alterado pelo mapeamento. """
+        return self.detalhes[self.detalhes['controle_alterado']]
+
+
+def simulate_control_mapping(df_mapa, mapeamento, pesos):
+    """
+    Aplica `mapeamento` ({nível atual: nível simulado}) aos controles de todos
+    os riscos do Mapa. Riscos cujo controle não muda mantêm o Risco Residual
+    da planilha; os demais são recalculados com o peso (`pesos`) do novo nível.
+    """
+    controles = df_mapa['nivel_controle']
+    if not isinstance(controles.dtype, pd.CategoricalDtype):
+        controles = controles.astype('category')
+    categorias = controles.cat.categories
+    codigos = controles.cat.codes.to_numpy()
+
+    # Tabelas por categoria (poucas), aplicadas aos riscos por indexação
+    novo_por_categoria = np.array([mapeamento.get(nivel, nivel) for nivel in categorias] + [np.nan], dtype=object)
+    alterado_por_categoria = np.array(
+        [mapeamento.get(nivel, nivel) != nivel for nivel in categorias] + [False])
+    peso_por_categoria = np.array(
+        [pesos.get(mapeamento.get(nivel, nivel), np.nan) for nivel in categorias] + [np.nan])
+    # Código -1 (controle vazio) aponta para a última posição das tabelas
+    codigos = np.where(codigos < 0, len(categorias), codigos)
+
+    alterado = alterado_por_categoria[codigos]
+    nivel_ri = df_mapa['nivel_ri'].to_numpy(dtype=float, na_value=np.nan)
+    nivel_rr = df_mapa['nivel_rr'].to_numpy(dtype=float, na_value=np.nan)
+    avaliacao_rr = df_mapa['avaliacao_rr'].to_numpy(dtype=object)
+
+    nivel_rr_simulado = np.where(alterado, nivel_ri * peso_por_categoria[codigos], nivel_rr)
+    avaliacao_rr_simulada = np.where(alterado, avaliacao_from_niveis(nivel_rr_simulado), avaliacao_rr)
+
+    detalhes = pd.DataFrame({
+        'evento_risco': df_mapa['evento_risco'].to_numpy(),
+        'acao_estrategica': df_mapa['acao_estrategica'].to_numpy(),
+        'nivel_ri': nivel_ri,
+        'nivel_controle': controles.to_numpy(),
+        'nivel_controle_simulado': novo_por_categoria[codigos],
+        'nivel_rr': nivel_rr,
+        'nivel_rr_simulado': nivel_rr_simulado,
+        'variacao_nivel_rr': nivel_rr_simulado - nivel_rr,
+        'avaliacao_rr': avaliacao_rr,
+        'avaliacao_rr_simulada': avaliacao_rr_simulada,
+        'controle_alterado': alterado,
+    }, index=df_mapa.index)
+
+    ordem = list(AVALIACOES)
+    antes = pd.Series(avaliacao_rr).value_counts().reindex(ordem, fill_value=0)
+    depois = pd.Series(avaliacao_rr_simulada).value_counts().reindex(ordem, fill_value=0)
+    return WhatIfResult(antes=antes, depois=depois, detalhes=detalhes)
+
+
+# ==================================================================
+# MONTE CARLO DO RISCO RESIDUAL
+# ==================================================================
+
+# Elementos (riscos x sorteios) gerados de cada vez dentro de um bloco
+MC_ELEMENTOS_POR_LOTE = 2 ** 21
+# Processos do pool do Monte Carlo, um só para todas as sessões do servidor
+MC_PROCESSOS = int(os.environ.get("PAINEL_MC_PROCESSOS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def simulation_pool():
+    """
+    Pool de processos do Monte Carlo, criado no primeiro uso e reaproveitado.
+    Os processos são iniciados com "spawn": um fork do servidor do Streamlit
+    copiaria o processo com as threads dele (tornado, cargas, observador de
+    pastas) paradas no meio, com risco de travar o processo filho.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MC_PROCESSOS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+@contextlib.contextmanager
+def _spawn_main():
+    """
+    Os processos "spawn" importam o sys.modules['__main__'] do processo pai.
+    Sob o Streamlit ele é o script do app (o ScriptRunner troca o __main__ a
+    cada execução), que os processos executariam inteiro e falhariam fora do
+    servidor. Enquanto os processos são criados, o __main__ é este módulo.
+    """
+    with _pool_lock:
+        principal = sys.modules['__main__']
+        sys.modules['__main__'] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = principal
+
+
+def _discard_pool(pool):
+    """ Descarta um pool quebrado (processo encerrado à força); o próximo uso cria outro. """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _sample_grau(rng, grau, incerteza_escala, forma):
+    """ Grau (GP ou GI) sorteado: sobe ou desce um nível com probabilidade `incerteza_escala` (cada lado). """
+    u = rng.random(forma, dtype=np.float32)
+    desvio = (u > 1 - incerteza_escala).astype(np.int8) - (u < incerteza_escala)
+    return np.clip(grau[:, None] + desvio, 1, 4)
+
+
+def _sample_triangular(rng, minimo, moda, maximo, forma):
+    """ Distribuição triangular por parâmetros de cada risco (inversa da acumulada). """
+    u = rng.random(forma)
+    largura = maximo - minimo
+    corte = np.divide(moda - minimo, largura, out=np.zeros_like(largura), where=largura > 0)
+    inferior = minimo + np.sqrt(u * largura * (moda - minimo))
+    superior = maximo - np.sqrt((1 - u) * largura * (maximo - moda))
+    return np.where(u < corte, inferior, superior)
+
+
+def _monte_carlo_bloco(gp, gi, peso, sorteios, incerteza_escala, incerteza_controle, seed):
+    """
+    Sorteios de um bloco de riscos (executado no próprio processo ou em um
+    processo do pool). Devolve a contagem por faixa de cada risco, a soma dos
+    níveis residuais e o número de riscos 'Inaceitável' em cada sorteio.
+    """
+    rng = np.random.default_rng(seed)
+    n_riscos = len(gp)
+    gp = gp.astype(np.int8)
+    gi = gi.astype(np.int8)
+    # Contagem acumulada: sorteios com nível <= cada corte da escala
+    acumulado = np.zeros((n_riscos, len(LIMITES_AVALIACAO)), dtype=np.int64)
+    soma_niveis = np.zeros(n_riscos)
+    inaceitaveis = np.zeros(sorteios, dtype=np.int32)
+    peso_moda = peso[:, None]
+    peso_min = np.clip(peso_moda - incerteza_controle, 0, 1)
+    peso_max = np.clip(peso_moda + incerteza_controle, 0, 1)
+    lote = max(1, MC_ELEMENTOS_POR_LOTE // max(n_riscos, 1))
+
+    for inicio in range(0, sorteios, lote):
+        forma = (n_riscos, min(lote, sorteios - inicio))
+        # GP x GI é inteiro (até 16); o nível é calculado em float64, como na versão escalar
+        grau = _sample_grau(rng, gp, incerteza_escala, forma) * _sample_grau(rng, gi, incerteza_escala, forma)
+        if incerteza_controle > 0:
+            niveis = grau * _sample_triangular(rng, peso_min, peso_moda, peso_max, forma)
+        else:
+            niveis = grau * peso_moda
+
+        for k, limite in enumerate(LIMITES_AVALIACAO):
+            acumulado[:, k] += np.count_nonzero(niveis <= limite, axis=1)
+        soma_niveis += niveis.sum(axis=1)
+        inaceitaveis[inicio:inicio + forma[1]] = np.count_nonzero(niveis > LIMITES_AVALIACAO[-1], axis=0)
+
+    contagens = np.diff(acumulado, axis=1, prepend=0, append=sorteios)
+    return contagens, soma_niveis, inaceitaveis
+
+
+@dataclass
+class MonteCarloResult:
+    """ Resultado do Monte Carlo: probabilidades por risco e visão do portfólio. """
+    probabilidades: pd.DataFrame
+    inaceitaveis_por_sorteio: np.ndarray
+    sorteios: int
+
+    @property
+    def portfolio(self):
+        """ Número esperado de riscos e participação de cada faixa no portfólio. """
+        probs = self.probabilidades[list(AVALIACOES)].dropna()
+        tabela = pd.DataFrame({'riscos_esperados': probs.sum(), 'participacao': probs.mean()})
+        return tabela.rename_axis('avaliacao_rr')
+
+    def percentis_inaceitaveis(self, percentis=(5, 50, 95)):
+        """ Percentis do número de riscos 'Inaceitável' por sorteio. """
+        return dict(zip(percentis, np.percentile(self.inaceitaveis_por_sorteio, percentis)))
+
+
+def monte_carlo_residual(df_mapa, pesos, sorteios=100_000, incerteza_escala=0.2, incerteza_controle=0.1,
+                         seed=0, paralelo=False, riscos_por_bloco=256):
+    """
+    Simula o Risco Residual de todo o portfólio com `sorteios` cenários por
+    risco, em blocos de riscos vetorizados (sem laço por sorteio). Com
+    `paralelo`, os blocos são distribuídos no pool de processos compartilhado
+    (até MC_PROCESSOS); cada bloco tem sua própria semente, então o resultado
+    não depende do paralelismo.
+    Riscos sem GP/GI ou com nível de controle desconhecido ficam sem probabilidades.
+    """
+    if not 0 <= incerteza_escala <= 0.5:
+        raise ValueError("incerteza_escala deve estar entre 0 e 0.5")
+    gp = pd.to_numeric(df_mapa['gp'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    gi = pd.to_numeric(df_mapa['gi'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    peso = df_mapa['nivel_controle'].map(pesos).astype(float).to_numpy(na_value=np.nan)
+    validos = np.flatnonzero(~(np.isnan(gp) | np.isnan(gi) | np.isnan(peso)))
+
+    blocos = [validos[inicio:inicio + riscos_por_bloco] for inicio in range(0, len(validos), riscos_por_bloco)]
+    sementes = np.random.SeedSequence(seed).spawn(len(blocos))
+    argumentos = [
+        (gp[bloco], gi[bloco], peso[bloco], sorteios, incerteza_escala, incerteza_controle, semente)
+        for bloco, semente in zip(blocos, sementes)
+    ]
+    resultados = None
+    if paralelo and MC_PROCESSOS > 1 and len(blocos) > 1:
+        pool = simulation_pool()
+        try:
+            # Os processos do pool são criados (sob demanda) ao enviar os blocos
+            with _spawn_main():
+                blocos_enviados = pool.map(_monte_carlo_bloco, *zip(*argumentos))
+            resultados = list(blocos_enviados)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+    if resultados is None:
+        resultados = [_monte_carlo_bloco(*args) for args in argumentos]
+
+    contagens = np.full((len(df_mapa), len(AVALIACOES)), np.nan)
+    nivel_medio = np.full(len(df_mapa), np.nan)
+    inaceitaveis = np.zeros(sorteios, dtype=np.int64)
+    for bloco, (contagem_bloco, soma_bloco, inaceitaveis_bloco) in zip(blocos, resultados):
+        contagens[bloco] = contagem_bloco / sorteios
+        nivel_medio[bloco] = soma_bloco / sorteios
+        inaceitaveis += inaceitaveis_bloco
+
+    probabilidades = pd.DataFrame(contagens, columns=list(AVALIACOES), index=df_mapa.index)
+    probabilidades.insert(0, 'evento_risco', df_mapa['evento_risco'].to_numpy())
+    probabilidades.insert(1, 'avaliacao_rr', df_mapa['avaliacao_rr'].to_numpy())
+    probabilidades['nivel_rr_medio'] = nivel_medio
+    return MonteCarloResult(probabilidades=probabilidades, inaceitaveis_por_sorteio=inaceitaveis,
+                            sorteios=sorteios)
@@ -0,0 +1,104 @@
+"""
+Configuração comum dos testes: raiz do projeto no sys.path, cache de
+planilhas em uma pasta temporária e planilhas geradas pelo gerador dos
+benchmarks (mesmo formato do template), e reexecuções de fragmentos no
+AppTest.
+"""
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+from urllib import parse
+
+import pytest
+from streamlit.runtime.fragment import MemoryFragmentStorage
+from streamlit.runtime.scriptrunner import RerunData
+from streamlit.testing.v1.element_tree import parse_tree_from_messages
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner, require_widgets_deltas
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+# Antes de importar os módulos do painel: os testes não usam o cache em disco do projeto
+os.environ.setdefault("PAINEL_CACHE_DIR", tempfile.mkdtemp(prefix="painel_testes_cache_"))
+
+from benchmarks.generate_workbooks import generate_workbook  # noqa: E402
+
+LINHAS_PLANILHA = 200
+
+
+class Upload(io.BytesIO):
+    """ Arquivo enviado pelo st.file_uploader (BytesIO com nome). """
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+@pytest.fixture(scope="session")
+def planilha(tmp_path_factory):
+    """ Caminho de uma planilha sintética com as três abas do painel. """
+    return generate_workbook(tmp_path_factory.mktemp("planilhas") / "painel.xlsx", LINHAS_PLANILHA)
+
+
+@pytest.fixture
+def upload(planilha):
+    return Upload(planilha.read_bytes(), planilha.name)
+
+
+class FragmentReruns:
+    """
+    O AppTest sempre executa o script inteiro, com um armazenamento de
+    fragmentos novo a cada execução. Aqui o armazenamento é mantido entre as
+    execuções e `interact` faz a reexecução só do fragmento do widget, como o
+    navegador pede quando o usuário mexe nele.
+    """
+
+    def __init__(self, monkeypatch):
+        self.storage = MemoryFragmentStorage()
+        self.fragmento = None
+        self.mensagens = []
+        init_original = LocalScriptRunner.__init__
+        harness = self
+
+        def init(runner, *args, **kwargs):
+            init_original(runner, *args, **kwargs)
+            runner._fragment_storage = harness.storage
+
+        def run(runner, widget_state=None, query_params=None, timeout=3, page_hash=""):
+            fila = [harness.fragmento] if harness.fragmento else []
+            runner.request_rerun(RerunData(
+                widget_states=widget_state, query_string=parse.urlencode(query_params or {}, doseq=True),
+                page_script_hash=page_hash, fragment_id_queue=fila, is_fragment_scoped_rerun=bool(fila)))
+            if not runner._script_thread:
+                runner.start()
+            require_widgets_deltas(runner, timeout)
+            harness.mensagens = runner.forward_msgs()
+            return parse_tree_from_messages(harness.mensagens)
+
+        monkeypatch.setattr(LocalScriptRunner, "__init__", init)
+        monkeypatch.setattr(LocalScriptRunner, "run", run)
+
+    def fragment_of(self, widget):
+        """ Fragmento que desenhou o widget na última execução. """
+        for mensagem in self.mensagens:
+            if mensagem.HasField("delta") and mensagem.delta.HasField("new_element"):
+                elemento = mensagem.delta.new_element
+                if getattr(getattr(elemento, elemento.WhichOneof("type")), "id", None) == widget.id:
+                    return mensagem.delta.fragment_id
+        raise LookupError(f"Widget '{widget.label}' não encontrado nas mensagens")
+
+    def interact(self, app, widget, valor):
+        self.fragmento = self.fragment_of(widget)
+        assert self.fragmento, f"'{widget.label}' não está em um fragmento"
+        try:
+            widget.set_value(valor)
+            app.run()
+        finally:
+            self.fragmento = None
+
+
+@pytest.fixture
+def fragmentos(monkeypatch):
+    """ AppTest com o armazenamento de fragmentos mantido entre as execuções (FragmentReruns). """
+    return FragmentReruns(monkeypatch)
@@ -0,0 +1,45 @@
+"""
+Paridade entre os backends de leitura: a mesma planilha, lida por cada
+backend disponível, gera os mesmos DataFrames limpos.
+"""
+import pandas as pd
+import pytest
+
+import risk_data
+import workbook_reader
+from dataset_store import DatasetStore
+from workbook_cache import WorkbookCache
+from workbook_reader import available_backends
+
+FRAMES = ["df_mapa", "df_plano", "df_indicadores"]
+
+
+def load_with_backend(monkeypatch, tmp_path, upload, backend):
+    """ DataFrames limpos carregados com o backend forçado, sem passar pelo cache. """
+    monkeypatch.setattr(workbook_reader, "BACKEND_PADRAO", backend)
+    monkeypatch.setattr(risk_data, "DATASET_STORE", DatasetStore())
+    monkeypatch.setattr(risk_data, "WORKBOOK_CACHE", WorkbookCache(directory=str(tmp_path / backend)))
+    dataset_riscos = risk_data.load_riscos_data(upload)
+    dataset_indicadores = risk_data.load_indicadores_data(upload)
+    return {"df_mapa": dataset_riscos["df_mapa"], "df_plano": dataset_riscos["df_plano"],
+            "df_indicadores": dataset_indicadores["df_indicadores"]}
+
+
+def test_backends_disponiveis():
+    assert {"openpyxl", "xml"} <= set(available_backends())
+
+
+@pytest.mark.parametrize("backend", [name for name in available_backends() if name != "openpyxl"])
+def test_dados_limpos_iguais_ao_openpyxl(monkeypatch, tmp_path, upload, backend):
+    referencia = load_with_backend(monkeypatch, tmp_path, upload, "openpyxl")
+    frames = load_with_backend(monkeypatch, tmp_path, upload, backend)
+    for nome in FRAMES:
+        assert len(referencia[nome]) > 0
+        pd.testing.assert_frame_equal(frames[nome], referencia[nome], obj=f"{nome} ({backend})")
+
+
+def test_abas_brutas_iguais(planilha):
+    sheet_headers = {name: risk_data.SHEET_HEADERS[name]
+                     for name in (risk_data.SHEET_MAPA, risk_data.SHEET_PLANO, risk_data.SHEET_INDICADORES)}
+    divergencias = workbook_reader.check_backend_parity(str(planilha), sheet_headers)
+    assert divergencias == {name: [] for name in available_backends()}
@@ -0,0 +1,48 @@
+"""
+Cache de figuras: acertos, montagens e bytes guardados, e a exibição desses
+números no painel de desempenho (?perf).
+"""
+import plotly.graph_objects as go
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import perf_trace
+import risk_data
+from conftest import RAIZ
+from figure_cache import FigureCache, figure_to_spec
+
+
+def build():
+    return go.Figure(go.Bar(x=["a", "b"], y=[1, 2]))
+
+
+def test_contadores_e_bytes():
+    cache = FigureCache()
+    assert cache.usage() == {"hits": 0, "misses": 0, "figuras": 0, "bytes": 0, "max_bytes": cache._specs.maxsize}
+    cache.get_or_build("grafico", build)
+    cache.get_or_build("grafico", build)
+    cache.get_or_build("outro", build)
+
+    uso = cache.usage()
+    assert (uso["hits"], uso["misses"], uso["figuras"]) == (1, 2, 2)
+    assert uso["bytes"] == 2 * len(figure_to_spec(build()))
+
+
+def test_painel_de_desempenho_mostra_o_cache(monkeypatch, tmp_path, upload):
+    monkeypatch.setattr(perf_trace, "PERF", perf_trace.PerfRecorder(ativo=True, log_path=str(tmp_path / "perf.jsonl")))
+    # O app troca st.plotly_chart e st.dataframe pelas versões medidas
+    monkeypatch.setattr(st, "plotly_chart", st.plotly_chart)
+    monkeypatch.setattr(st, "dataframe", st.dataframe)
+    dataset_riscos = risk_data.load_riscos_data(upload)
+    try:
+        app = AppTest.from_file(str(RAIZ / "app_v2.py"), default_timeout=60)
+        app.session_state['app_mode'] = 'risk_only'
+        app.session_state['dataset_riscos'] = dataset_riscos
+        app.query_params['perf'] = ""
+        app.run()
+        assert not app.exception
+        legendas = [legenda.value for legenda in app.sidebar.caption if legenda.value.startswith("Cache de figuras")]
+        assert len(legendas) == 1
+        assert " MB" in legendas[0]
+    finally:
+        dataset_riscos.release()
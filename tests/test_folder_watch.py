@@ -0,0 +1,113 @@
+"""
+Pasta monitorada: a planilha só é relida quando o conteúdo muda, e um
+arquivo que não pôde ser lido fica com o erro registrado e é verificado de
+novo no próximo evento.
+"""
+import os
+import pathlib
+
+import pytest
+
+from benchmarks.generate_workbooks import generate_workbook
+from conftest import LINHAS_PLANILHA
+from folder_watch import FolderWatcher
+
+NOME = "unidade.xlsx"
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    generate_workbook(tmp_path / NOME, LINHAS_PLANILHA)
+    watcher = FolderWatcher(tmp_path)
+    assert watcher.refresh(NOME)
+    yield watcher
+    for nome in watcher.available():
+        watcher.status(nome).handle.release()
+
+
+@pytest.fixture
+def leituras_do_disco(monkeypatch):
+    """ Arquivos lidos por inteiro (Path.read_bytes) durante o teste. """
+    lidos = []
+    read_bytes = pathlib.Path.read_bytes
+
+    def contar(path):
+        lidos.append(path.name)
+        return read_bytes(path)
+    monkeypatch.setattr(pathlib.Path, "read_bytes", contar)
+    return lidos
+
+
+def advance_mtime(path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_conteudo_alterado_gera_nova_versao(watcher):
+    planilha = watcher.status(NOME)
+    versao, chave = planilha.versao, planilha.handle.key
+    path = watcher.directory / NOME
+    generate_workbook(path, LINHAS_PLANILHA, seed=1)
+    advance_mtime(path)
+
+    assert watcher.refresh(NOME)
+    assert planilha.versao > versao
+    assert planilha.handle.key != chave
+    assert planilha.leituras == 2
+    assert planilha.erros == []
+
+
+def test_so_a_data_mudou_nao_reler(watcher):
+    planilha = watcher.status(NOME)
+    versao = planilha.versao
+    advance_mtime(watcher.directory / NOME)
+
+    assert not watcher.refresh(NOME)
+    assert planilha.versao == versao
+    assert planilha.leituras == 1
+
+
+def test_arquivo_intacto_nao_e_lido(watcher, leituras_do_disco):
+    planilha = watcher.status(NOME)
+    for _ in range(3):
+        assert not watcher.refresh(NOME)
+    assert leituras_do_disco == []
+    assert planilha.leituras == 1
+    assert planilha.verificacoes == 4
+
+
+def test_arquivo_ilegivel_registra_o_erro(watcher, monkeypatch):
+    planilha = watcher.status(NOME)
+    versao = planilha.versao
+    path = watcher.directory / NOME
+    generate_workbook(path, LINHAS_PLANILHA, seed=1)
+    advance_mtime(path)
+
+    def bloqueado(path):
+        raise PermissionError(13, "Permission denied", str(path))
+    with monkeypatch.context() as patch:
+        patch.setattr(pathlib.Path, "read_bytes", bloqueado)
+        assert not watcher.refresh(NOME)
+    assert planilha.versao == versao
+    assert planilha.erros and NOME in planilha.erros[0]
+    assert [p["erros"] for p in watcher.stats()] == [planilha.erros]
+
+    # Com o arquivo liberado, a verificação seguinte carrega a nova versão
+    assert watcher.refresh(NOME)
+    assert planilha.versao > versao
+    assert planilha.erros == []
+
+
+def test_falha_ao_preparar_libera_o_dataset(tmp_path):
+    generate_workbook(tmp_path / NOME, LINHAS_PLANILHA)
+    handles = []
+
+    def falhar(handle):
+        handles.append(handle)
+        raise ValueError("falha")
+    watcher = FolderWatcher(tmp_path, prepare=falhar)
+
+    assert not watcher.refresh(NOME)
+    assert watcher.status(NOME).erros
+    assert watcher.available() == []
+    assert handles[0].dataset.refcount == 0
@@ -0,0 +1,120 @@
+"""
+Reexecuções parciais (st.fragment): mexer em um widget de uma página
+reexecuta só o fragmento dele, sem o script inteiro (título, CSS, sidebar,
+roteador e cargas). As funções executadas em cada interação são contadas
+pelas execuções do PerfRecorder, que separa execuções do script e de
+fragmentos.
+"""
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import perf_trace
+import risk_data
+import session_snapshot
+from conftest import RAIZ
+
+# session_id das execuções do AppTest
+SESSAO_TESTE = "test session id"
+CARREGADORES = [(risk_data, "load_riscos_data"), (risk_data, "load_indicadores_data"),
+                (risk_data, "load_integrated_data"), (session_snapshot, "read_snapshot")]
+
+
+@pytest.fixture
+def contagem(monkeypatch, tmp_path):
+    """ Execuções medidas (PerfRecorder próprio do teste) e chamadas do título e dos carregadores. """
+    perf = perf_trace.PerfRecorder(ativo=True, log_path=str(tmp_path / "perf.jsonl"))
+    monkeypatch.setattr(perf_trace, "PERF", perf)
+    # O app troca st.plotly_chart e st.dataframe pelas versões medidas
+    monkeypatch.setattr(st, "plotly_chart", st.plotly_chart)
+    monkeypatch.setattr(st, "dataframe", st.dataframe)
+    chamadas = []
+
+    def contar(nome, funcao):
+        def contada(*args, **kwargs):
+            chamadas.append(nome)
+            return funcao(*args, **kwargs)
+        return contada
+
+    monkeypatch.setattr(st, "title", contar("st.title", st.title))
+    for modulo, nome in CARREGADORES:
+        monkeypatch.setattr(modulo, nome, contar(nome, getattr(modulo, nome)))
+    return perf, chamadas
+
+
+@pytest.fixture
+def app(fragmentos, upload, contagem):
+    """ App no modo integrado, com os dados já carregados na sessão. """
+    dataset_riscos, dataset_indicadores = risk_data.load_integrated_data(upload)
+    app = AppTest.from_file(str(RAIZ / "app_v2.py"), default_timeout=60)
+    app.session_state['app_mode'] = 'integrated'
+    app.session_state['dataset_riscos'] = dataset_riscos
+    app.session_state['dataset_indicadores'] = dataset_indicadores
+    app.run()
+    assert not app.exception
+    yield app, fragmentos
+    dataset_riscos.release()
+    dataset_indicadores.release()
+
+
+def last_run(perf):
+    """ Tipo da última execução e as funções medidas no primeiro nível dela. """
+    execucao = perf.runs(SESSAO_TESTE)[0]
+    return execucao['tipo'], [etapa['etapa'] for etapa in execucao['etapas'] if etapa['nivel'] == 0]
+
+
+def open_page(app, pagina):
+    app.sidebar.radio[0].set_value(pagina).run()
+    assert not app.exception
+
+
+def test_execucao_completa_passa_pelo_script(app, contagem):
+    app, _ = app
+    perf, chamadas = contagem
+    chamadas.clear()
+    open_page(app, "Simulador de Controles")
+    tipo, funcoes = last_run(perf)
+    assert tipo == "script"
+    assert "render_page_simulador" in funcoes
+    assert chamadas == ["st.title"]
+
+
+def test_slider_do_simulador_reexecuta_so_a_simulacao(app, contagem):
+    app, harness = app
+    perf, chamadas = contagem
+    open_page(app, "Simulador de Controles")
+    slider = app.select_slider[0]
+    novo_nivel = next(opcao for opcao in slider.options if opcao != slider.value)
+    execucoes = len(perf.runs(SESSAO_TESTE))
+    chamadas.clear()
+
+    harness.interact(app, slider, novo_nivel)
+
+    assert not app.exception
+    assert len(perf.runs(SESSAO_TESTE)) == execucoes + 1
+    assert last_run(perf) == ("fragmento", ["render_simulacao_controle"])
+    assert chamadas == []
+
+
+def test_indicador_monitorado_nao_reexecuta_o_script(app, contagem):
+    app, harness = app
+    perf, chamadas = contagem
+    open_page(app, "Monitoramento de Indicadores")
+    seletor = next(s for s in app.selectbox if s.label.startswith("2. Selecione o Indicador"))
+    if len(seletor.options) < 2:
+        # Ação com um indicador só: escolhe uma que tenha mais de um
+        acoes = next(s for s in app.selectbox if s.label.startswith("1. Selecione a Ação"))
+        for acao in acoes.options[1:]:
+            harness.interact(app, acoes, acao)
+            app.run()
+            seletor = next(s for s in app.selectbox if s.label.startswith("2. Selecione o Indicador"))
+            if len(seletor.options) > 1:
+                break
+    assert len(seletor.options) > 1
+    chamadas.clear()
+
+    harness.interact(app, seletor, seletor.options[-1])
+
+    assert not app.exception
+    assert last_run(perf) == ("fragmento", ["render_page_monitoramento"])
+    assert chamadas == []
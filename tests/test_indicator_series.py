@@ -0,0 +1,92 @@
+"""
+Scorecard dos indicadores: a tendência (mínimos quadrados com somas
+mascaradas), a previsão de dezembro e os meses em falta conferem com
+np.polyfit sobre os meses reportados de cada indicador.
+"""
+import numpy as np
+import pytest
+
+import risk_data
+from indicator_series import MESES, build_indicator_series, build_scorecard
+from risk_data import COL_IND_ALCANCE, COL_IND_REALIZADO, COL_IND_VALOR, COL_MESES
+
+# Meses reportados (1 a 12) das primeiras linhas; as demais ficam como na planilha
+MESES_REPORTADOS = {
+    0: [1, 2, 5, 9],           # lacunas no meio do ano
+    1: [7],                    # um único mês: sem tendência
+    2: [2, 3, 4, 6],           # meta zero
+    3: [],                     # nenhum mês
+    4: list(range(1, 13)),     # ano completo
+    5: [3, 12],                # dois meses, o último em dezembro
+}
+META_ZERO = 2
+
+
+@pytest.fixture
+def df_indicadores(upload):
+    handle = risk_data.load_indicadores_data(upload)
+    df = handle['df_indicadores'].copy()
+    handle.release()
+    rng = np.random.default_rng(0)
+    for col in COL_MESES:
+        df[col] = df[col].astype(float)
+    df[COL_IND_VALOR] = df[COL_IND_VALOR].astype(object)
+    for linha, meses in MESES_REPORTADOS.items():
+        valores = np.full(len(MESES), np.nan)
+        valores[np.asarray(meses, dtype=int) - 1] = rng.uniform(0, 200, len(meses)).round(2)
+        df.iloc[linha, [df.columns.get_loc(col) for col in COL_MESES]] = valores
+    df.iloc[META_ZERO, df.columns.get_loc(COL_IND_VALOR)] = 0
+    return df
+
+
+@pytest.fixture
+def scorecard(df_indicadores):
+    series = build_indicator_series(df_indicadores, COL_MESES)
+    return build_scorecard(series, df_indicadores, COL_IND_VALOR, COL_IND_REALIZADO, COL_IND_ALCANCE)
+
+
+def expected(valores):
+    """ Meses reportados, último mês, meses em falta, inclinação e previsão de dezembro com np.polyfit. """
+    preenchido = np.isfinite(valores)
+    meses = MESES[preenchido]
+    ultimo = meses.max() if len(meses) else np.nan
+    em_falta = ultimo - len(meses) if len(meses) else 0
+    if len(meses) < 2:
+        return len(meses), ultimo, em_falta, np.nan, np.nan
+    inclinacao, intercepto = np.polyfit(meses, valores[preenchido], 1)
+    return len(meses), ultimo, em_falta, inclinacao, intercepto + inclinacao * 12
+
+
+def test_tendencia_igual_ao_polyfit(df_indicadores, scorecard):
+    valores = df_indicadores[COL_MESES].to_numpy(dtype=float)
+    assert (np.isfinite(valores).sum(axis=1) >= 2).sum() > len(MESES_REPORTADOS)
+    for linha in range(len(df_indicadores)):
+        n_meses, ultimo, em_falta, inclinacao, previsao = expected(valores[linha])
+        obtido = scorecard.iloc[linha]
+        assert obtido['meses_reportados'] == n_meses
+        np.testing.assert_equal(obtido['ultimo_mes'], ultimo)
+        assert obtido['meses_em_falta'] == em_falta
+        np.testing.assert_allclose(obtido['tendencia_mensal'], inclinacao, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(obtido['previsao_dez'], previsao, rtol=1e-9, atol=1e-9)
+
+
+def test_casos_limite(df_indicadores, scorecard):
+    lacunas = scorecard.iloc[0]
+    assert (lacunas['meses_reportados'], lacunas['ultimo_mes'], lacunas['meses_em_falta']) == (4, 9, 5)
+    assert lacunas['ultimo_valor'] == df_indicadores.iloc[0][COL_MESES[8]]
+
+    unico = scorecard.iloc[1]
+    assert (unico['meses_reportados'], unico['ultimo_mes'], unico['meses_em_falta']) == (1, 7, 6)
+    assert np.isnan(unico['tendencia_mensal']) and np.isnan(unico['previsao_dez'])
+    assert np.isnan(unico['previsao_vs_meta'])
+
+    meta_zero = scorecard.iloc[META_ZERO]
+    assert meta_zero['meta'] == 0 and np.isfinite(meta_zero['previsao_dez'])
+    assert np.isnan(meta_zero['alcance_ultimo_mes']) and np.isnan(meta_zero['previsao_vs_meta'])
+
+    vazio = scorecard.iloc[3]
+    assert (vazio['meses_reportados'], vazio['meses_em_falta']) == (0, 0)
+    assert np.isnan(vazio['ultimo_mes']) and np.isnan(vazio['ultimo_valor']) and np.isnan(vazio['tendencia_mensal'])
+
+    assert scorecard.iloc[4]['meses_em_falta'] == 0
+    assert (scorecard.iloc[5]['ultimo_mes'], scorecard.iloc[5]['meses_em_falta']) == (12, 10)
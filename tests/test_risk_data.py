@@ -0,0 +1,38 @@
+"""
+Compactação pós-carga: colunas só com inteiros viram o menor tipo inteiro e
+colunas com decimais continuam em float64, com os valores da planilha.
+"""
+import numpy as np
+import pandas as pd
+
+import risk_data
+from risk_data import COL_MESES, downcast_numeric
+
+
+def test_inteiros_viram_int8():
+    assert downcast_numeric(pd.Series([1.0, 2.0, 4.0])).dtype == np.int8
+
+
+def test_decimais_e_vazios_ficam_em_float64():
+    decimais = downcast_numeric(pd.Series([619.12, 1.5, 0.1]))
+    assert decimais.dtype == np.float64
+    assert decimais.tolist() == [619.12, 1.5, 0.1]
+    assert downcast_numeric(pd.Series([1.0, np.nan])).dtype == np.float64
+
+
+def test_planilha_carregada(upload):
+    dataset_riscos, dataset_indicadores = risk_data.load_integrated_data(upload)
+    try:
+        df_mapa = dataset_riscos['df_mapa']
+        assert {col: df_mapa[col].dtype for col in ['gp', 'gi', 'nivel_ri']} == {
+            'gp': np.int8, 'gi': np.int8, 'nivel_ri': np.int8}
+        assert df_mapa['nivel_rr'].dtype == np.float64
+        meses = dataset_indicadores['df_indicadores'][COL_MESES]
+        assert (meses.dtypes == np.float64).all()
+        # Os valores da planilha têm duas casas decimais e voltam exatamente assim
+        valores = meses.stack()
+        assert len(valores) > 0
+        assert (valores.round(2) == valores).all()
+    finally:
+        dataset_riscos.release()
+        dataset_indicadores.release()
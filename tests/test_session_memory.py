@@ -0,0 +1,114 @@
+"""
+Memória das sessões: depois de um despejo, os DataFrames saem de fato da
+memória (nada do app, nem o armazenamento de fragmentos, os segura), uma
+sessão que só mexe em fragmentos continua contando como ativa e o painel
+dos operadores só aparece quando habilitado.
+"""
+import gc
+import time
+import weakref
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import risk_data
+import session_memory
+from conftest import RAIZ
+from dataset_store import DATASET_STORE, DatasetStore
+from session_memory import SessionMemoryManager
+from workbook_cache import WorkbookCache
+
+PAGINAS = ["Visão Geral (Dashboard)", "Ficha Individual do Risco", "Simulador de Controles",
+           "Análise de Indicadores", "Monitoramento de Indicadores", "Análise Detalhada (Tabelas)"]
+# Bem depois do TTL de qualquer uso feito pelo teste
+DEPOIS_DO_TTL = 3600
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path, fragmentos, upload):
+    """
+    App no modo integrado, com os dados já carregados na sessão. O cache de
+    planilhas é só do teste: o último script executado fica em
+    sys.modules['__main__'] e, com o cache do processo, os datasets de um
+    teste anterior compartilhariam os mesmos DataFrames.
+    """
+    cache = WorkbookCache(directory=str(tmp_path / "cache"))
+    monkeypatch.setattr(risk_data, "WORKBOOK_CACHE", cache)
+    monkeypatch.setattr(session_memory, "WORKBOOK_CACHE", cache)
+    dataset_riscos, dataset_indicadores = risk_data.load_integrated_data(upload)
+    app = AppTest.from_file(str(RAIZ / "app_v2.py"), default_timeout=60)
+    app.session_state['app_mode'] = 'integrated'
+    app.session_state['dataset_riscos'] = dataset_riscos
+    app.session_state['dataset_indicadores'] = dataset_indicadores
+    app.run()
+    assert not app.exception
+    yield app, fragmentos, [dataset_riscos, dataset_indicadores]
+    dataset_riscos.release()
+    dataset_indicadores.release()
+
+
+def frame_refs(handles):
+    return [weakref.ref(df) for handle in handles for df in handle.dataset.frames.values()]
+
+
+def test_despejo_libera_e_reidrata(tmp_path):
+    store = DatasetStore()
+    handle = store.acquire("planilha", {'df_mapa': pd.DataFrame({'a': [1, 2, 3], 'b': ["x", "y", "z"]})})
+    original = handle['df_mapa'].copy()
+    refs = frame_refs([handle])
+    memoria = SessionMemoryManager(store=store, directory=str(tmp_path), ttl=60)
+
+    assert memoria.sweep(agora=time.time() + DEPOIS_DO_TTL) > 0
+    gc.collect()
+
+    assert not handle.dataset.resident
+    assert all(ref() is None for ref in refs)
+    pd.testing.assert_frame_equal(handle['df_mapa'], original)
+    handle.release()
+
+
+def test_despejo_libera_os_dataframes_usados_pelo_app(app, tmp_path):
+    app, fragmentos, handles = app
+    for pagina in PAGINAS:
+        app.sidebar.radio[0].set_value(pagina).run()
+        assert not app.exception
+    app.sidebar.radio[0].set_value("Simulador de Controles").run()
+    slider = app.select_slider[0]
+    fragmentos.interact(app, slider, next(opcao for opcao in slider.options if opcao != slider.value))
+    assert not app.exception
+    assert len(fragmentos.storage._fragments) > 0
+    refs = frame_refs(handles)
+    memoria = SessionMemoryManager(store=DATASET_STORE, directory=str(tmp_path / "spill"), ttl=60)
+
+    memoria.sweep(agora=time.time() + DEPOIS_DO_TTL)
+    gc.collect()
+
+    assert not any(handle.dataset.resident for handle in handles)
+    assert [ref() for ref in refs if ref() is not None] == []
+    # O app continua funcionando: a próxima execução lê os dados de volta do disco
+    app.run()
+    assert not app.exception
+
+
+def test_fragmento_conta_como_uso_do_dataset(app):
+    app, fragmentos, handles = app
+    app.sidebar.radio[0].set_value("Simulador de Controles").run()
+    dataset = handles[0].dataset
+    dataset.last_used = 0
+    slider = app.select_slider[0]
+
+    fragmentos.interact(app, slider, next(opcao for opcao in slider.options if opcao != slider.value))
+
+    assert not app.exception
+    assert time.time() - dataset.last_used < 60
+
+
+@pytest.mark.parametrize("habilitado", [False, True])
+def test_painel_de_memoria_so_com_a_variavel_de_ambiente(app, monkeypatch, habilitado):
+    app, _, _ = app
+    monkeypatch.setattr(session_memory, "MEMORIA_PAINEL", habilitado)
+    app.query_params['memoria'] = ""
+    app.run()
+    assert not app.exception
+    assert any(expander.label == "🧠 Memória do Servidor" for expander in app.expander) == habilitado
@@ -0,0 +1,157 @@
+"""
+Análise salva (.painel): ida e volta dos DataFrames e recusa de manifestos
+adulterados, que não podem escrever fora das pastas do painel nem trocar os
+dados de planilhas carregadas por outras sessões.
+"""
+import io
+import json
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import risk_data
+from conftest import Upload
+from dataset_store import DATASET_STORE
+from ingestion import WorkbookLoadError
+from session_snapshot import SNAPSHOT_COMPRESSAO, read_snapshot, write_snapshot
+from workbook_cache import arrow_safe
+
+
+@pytest.fixture
+def datasets(upload):
+    dataset_riscos, dataset_indicadores = risk_data.load_integrated_data(upload)
+    yield {'dataset_riscos': dataset_riscos, 'dataset_indicadores': dataset_indicadores}
+    dataset_riscos.release()
+    dataset_indicadores.release()
+
+
+@pytest.fixture
+def snapshot(datasets):
+    return write_snapshot('integrated', datasets)
+
+
+def rewrite(dados, editar_manifesto, membros=None):
+    """ Cópia do arquivo com o manifesto editado e, opcionalmente, membros trocados ({nome: bytes ou None}). """
+    membros = membros or {}
+    saida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(dados)) as origem, \
+            zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_STORED) as destino:
+        manifesto = json.loads(origem.read("manifest.json"))
+        editar_manifesto(manifesto)
+        for info in origem.infolist():
+            if info.filename != "manifest.json" and info.filename not in membros:
+                destino.writestr(info.filename, origem.read(info))
+        for nome, conteudo in membros.items():
+            if conteudo is not None:
+                destino.writestr(nome, conteudo)
+        destino.writestr("manifest.json", json.dumps(manifesto))
+    return saida.getvalue()
+
+
+def open_snapshot(dados):
+    modo, handles, extras = read_snapshot(Upload(dados, "analise.painel"))
+    for handle in handles.values():
+        handle.release()
+    return modo, handles, extras
+
+
+def test_ida_e_volta(datasets, snapshot):
+    modo, handles, extras = read_snapshot(Upload(snapshot, "analise.painel"))
+    try:
+        assert modo == 'integrated'
+        assert extras == {}
+        for chave_sessao, handle in handles.items():
+            assert handle.key.startswith("snapshot-")
+            assert handle.key != datasets[chave_sessao].key
+            for nome in handle.dataset.frames:
+                pd.testing.assert_frame_equal(handle[nome], datasets[chave_sessao][nome])
+    finally:
+        for handle in handles.values():
+            handle.release()
+
+
+def test_mesmo_arquivo_compartilha_o_dataset(snapshot):
+    _, primeiro, _ = read_snapshot(Upload(snapshot, "a.painel"))
+    _, segundo, _ = read_snapshot(Upload(snapshot, "b.painel"))
+    try:
+        assert primeiro['dataset_riscos'].dataset is segundo['dataset_riscos'].dataset
+    finally:
+        for handle in [*primeiro.values(), *segundo.values()]:
+            handle.release()
+
+
+def test_manifesto_com_chave_de_planilha_nao_altera_o_dataset_dela(datasets, snapshot):
+    original = datasets['dataset_riscos']
+    mapa_original = original['df_mapa'].copy()
+    mapa_adulterado = original['df_mapa'].copy()
+    mapa_adulterado['evento_risco'] = "adulterado"
+    tabela = pa.Table.from_pandas(arrow_safe(mapa_adulterado))
+    destino = pa.BufferOutputStream()
+    with pa.ipc.new_file(destino, tabela.schema,
+                         options=pa.ipc.IpcWriteOptions(compression=SNAPSHOT_COMPRESSAO)) as escritor:
+        escritor.write_table(tabela)
+
+    def reaproveitar_chave(manifesto):
+        manifesto['datasets']['dataset_riscos']['chave'] = original.key
+    adulterado = rewrite(snapshot, reaproveitar_chave,
+                         {"dataset_riscos/df_mapa.arrow": destino.getvalue().to_pybytes()})
+
+    _, handles, _ = read_snapshot(Upload(adulterado, "analise.painel"))
+    try:
+        assert handles['dataset_riscos'].key != original.key
+        assert (handles['dataset_riscos']['df_mapa']['evento_risco'] == "adulterado").all()
+        pd.testing.assert_frame_equal(original['df_mapa'], mapa_original)
+        chaves = {dataset.key: dataset for dataset in DATASET_STORE.datasets()}
+        assert chaves[original.key] is original.dataset
+    finally:
+        for handle in handles.values():
+            handle.release()
+
+
+def test_nome_de_dataframe_fora_da_lista(snapshot):
+    def escapar(manifesto):
+        manifesto['datasets']['dataset_riscos']['frames'] = ["../../escaped", "df_plano"]
+    adulterado = rewrite(snapshot, escapar, {"dataset_riscos/../../escaped.arrow": b"x"})
+    with pytest.raises(WorkbookLoadError):
+        open_snapshot(adulterado)
+
+
+def test_dataframe_a_mais(snapshot):
+    def incluir(manifesto):
+        manifesto['datasets']['dataset_riscos']['frames'].append("df_indicadores")
+    with pytest.raises(WorkbookLoadError):
+        open_snapshot(rewrite(snapshot, incluir))
+
+
+def test_dataset_desconhecido(snapshot):
+    def incluir(manifesto):
+        manifesto['datasets']['dataset_outro'] = {'frames': ["df_mapa"]}
+    with pytest.raises(WorkbookLoadError):
+        open_snapshot(rewrite(snapshot, incluir))
+
+
+@pytest.mark.parametrize("modo", ["whatever", None, ["integrated"]])
+def test_modo_desconhecido(snapshot, modo):
+    def trocar(manifesto):
+        manifesto['modo'] = modo
+    with pytest.raises(WorkbookLoadError):
+        open_snapshot(rewrite(snapshot, trocar))
+
+
+def test_modo_sem_os_datasets_que_ele_usa(snapshot):
+    def remover_riscos(manifesto):
+        del manifesto['datasets']['dataset_riscos']
+    with pytest.raises(WorkbookLoadError):
+        open_snapshot(rewrite(snapshot, remover_riscos, {"dataset_riscos/df_mapa.arrow": None,
+                                                         "dataset_riscos/df_plano.arrow": None}))
+
+
+def test_falhas_do_portfolio_invalidas(snapshot):
+    def portfolio(manifesto):
+        manifesto['modo'] = 'portfolio'
+        del manifesto['datasets']['dataset_indicadores']
+        manifesto['extras'] = {'portfolio_falhas': {"unidade": "<b>texto</b>"}}
+    with pytest.raises(WorkbookLoadError):
+        open_snapshot(rewrite(snapshot, portfolio))
@@ -0,0 +1,148 @@
+"""
+Simulador de controles para o portfólio: a conta vetorizada dá o mesmo que
+a regra escalar do Simulador (Nível RI × peso do novo controle, avaliado por
+get_avaliacao_from_nivel), e riscos sem alteração mantêm os valores da
+planilha. O Monte Carlo não depende do paralelismo e, sem incerteza, cai
+sempre na faixa da conta determinística.
+"""
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import risk_data
+import simulation
+from conftest import RAIZ
+from risk_data import CONTROLES_PESOS, get_avaliacao_from_nivel
+from simulation import AVALIACOES, avaliacao_from_niveis, monte_carlo_residual, simulate_control_mapping
+
+# Níveis fora do mapeamento (SATISFATÓRIO, FORTE) e um mapeado para ele mesmo (MEDIANO) não mudam
+MAPEAMENTO = {"INEXISTENTE": "FRACO", "FRACO": "MEDIANO", "MEDIANO": "MEDIANO"}
+# (controle, nível RI) das primeiras linhas: cortes 2/6/9 da avaliação, RI vazio e controle vazio
+CASOS_LIMITE = [("INEXISTENTE", 2.5), ("INEXISTENTE", 7.5), ("INEXISTENTE", 11.25), ("FRACO", 10.0),
+                ("FRACO", 15.0), ("INEXISTENTE", np.nan), (np.nan, 8.0)]
+
+
+@pytest.fixture
+def df_mapa(upload):
+    handle = risk_data.load_riscos_data(upload)
+    df = handle['df_mapa'].copy()
+    handle.release()
+    df['nivel_ri'] = df['nivel_ri'].astype(float)
+    for posicao, (controle, nivel_ri) in enumerate(CASOS_LIMITE):
+        df.iloc[posicao, df.columns.get_loc('nivel_controle')] = controle
+        df.iloc[posicao, df.columns.get_loc('nivel_ri')] = nivel_ri
+    return df
+
+
+def simulate_scalar(linha):
+    """ Regra do Simulador de um risco por vez (None: controle sem alteração). """
+    controle = linha['nivel_controle']
+    if pd.isna(controle) or MAPEAMENTO.get(controle, controle) == controle:
+        return None
+    nivel = linha['nivel_ri'] * CONTROLES_PESOS[MAPEAMENTO[controle]]
+    return nivel, get_avaliacao_from_nivel(nivel)
+
+
+def test_avaliacao_vetorizada_igual_a_escalar():
+    niveis = [0, 1, 2, 2.0001, 5.99, 6, 6.01, 8.999, 9, 9.01, 25, np.nan]
+    assert list(avaliacao_from_niveis(niveis)) == [get_avaliacao_from_nivel(nivel) for nivel in niveis]
+
+
+def test_mapeamento_igual_a_regra_escalar(df_mapa):
+    resultado = simulate_control_mapping(df_mapa, MAPEAMENTO, CONTROLES_PESOS)
+    detalhes = resultado.detalhes
+    esperado = [simulate_scalar(linha) for _, linha in df_mapa.iterrows()]
+
+    assert detalhes['controle_alterado'].tolist() == [valor is not None for valor in esperado]
+    assert set(df_mapa.loc[detalhes['controle_alterado'], 'nivel_controle']) == {"INEXISTENTE", "FRACO"}
+    assert {"SATISFATÓRIO", "FORTE", "MEDIANO"} <= set(df_mapa.loc[~detalhes['controle_alterado'], 'nivel_controle'])
+    for posicao, valor in enumerate(esperado):
+        if valor is None:
+            continue
+        nivel, avaliacao = valor
+        np.testing.assert_equal(detalhes['nivel_rr_simulado'].iloc[posicao], nivel)
+        assert detalhes['avaliacao_rr_simulada'].iloc[posicao] == avaliacao
+    # Os cortes caem na faixa de baixo, como na versão escalar
+    assert detalhes['avaliacao_rr_simulada'].iloc[:6].tolist() == [
+        "Aceitável", "Gerenciável", "Indesejável", "Gerenciável", "Indesejável", "Inaceitável"]
+
+
+def test_riscos_sem_alteracao_mantem_a_planilha(df_mapa):
+    detalhes = simulate_control_mapping(df_mapa, MAPEAMENTO, CONTROLES_PESOS).detalhes
+    mantidos = ~detalhes['controle_alterado']
+    assert mantidos.iloc[len(CASOS_LIMITE) - 1]  # controle vazio
+    np.testing.assert_array_equal(detalhes.loc[mantidos, 'nivel_rr_simulado'],
+                                  df_mapa.loc[mantidos, 'nivel_rr'].to_numpy(dtype=float))
+    assert (detalhes.loc[mantidos, 'avaliacao_rr_simulada'].tolist()
+            == df_mapa.loc[mantidos, 'avaliacao_rr'].astype(object).tolist())
+
+
+def test_distribuicao_antes_e_depois(df_mapa):
+    resultado = simulate_control_mapping(df_mapa, MAPEAMENTO, CONTROLES_PESOS)
+    assert resultado.antes.tolist() == [
+        (df_mapa['avaliacao_rr'] == avaliacao).sum() for avaliacao in resultado.antes.index]
+    assert resultado.depois.tolist() == [
+        (resultado.detalhes['avaliacao_rr_simulada'] == avaliacao).sum() for avaliacao in resultado.depois.index]
+    assert resultado.distribuicao['variacao'].sum() == 0
+
+
+@pytest.fixture
+def mapa_original(upload):
+    handle = risk_data.load_riscos_data(upload)
+    yield handle['df_mapa']
+    handle.release()
+
+
+@pytest.fixture
+def pool_de_dois_processos(monkeypatch):
+    """
+    Pool próprio do teste com 2 processos, com o script do app no __main__
+    como sob o Streamlit; devolve quantas vezes o Monte Carlo pediu o pool.
+    """
+    script = types.ModuleType("__main__")
+    script.__file__ = str(RAIZ / "app_v2.py")
+    monkeypatch.setitem(sys.modules, "__main__", script)
+    monkeypatch.setattr(simulation, "MC_PROCESSOS", 2)
+    monkeypatch.setattr(simulation, "_pool", None)
+    pedidos = []
+    simulation_pool = simulation.simulation_pool
+
+    def contar():
+        pedidos.append(True)
+        return simulation_pool()
+    monkeypatch.setattr(simulation, "simulation_pool", contar)
+    yield pedidos
+    if simulation._pool is not None:
+        simulation._pool.shutdown(wait=True)
+
+
+def test_monte_carlo_nao_depende_do_paralelismo(mapa_original, pool_de_dois_processos):
+    parametros = dict(sorteios=2_000, seed=7, riscos_por_bloco=64)
+    sequencial = monte_carlo_residual(mapa_original, CONTROLES_PESOS, paralelo=False, **parametros)
+    assert pool_de_dois_processos == []
+    paralelo = monte_carlo_residual(mapa_original, CONTROLES_PESOS, paralelo=True, **parametros)
+
+    # O pool foi usado e não quebrou (sem volta para o cálculo no próprio processo)
+    assert pool_de_dois_processos == [True] and simulation._pool is not None
+    assert len(mapa_original) > 64
+    pd.testing.assert_frame_equal(paralelo.probabilidades, sequencial.probabilidades)
+    np.testing.assert_array_equal(paralelo.inaceitaveis_por_sorteio, sequencial.inaceitaveis_por_sorteio)
+
+
+def test_monte_carlo_sem_incerteza_fica_na_faixa_deterministica(mapa_original):
+    resultado = monte_carlo_residual(mapa_original, CONTROLES_PESOS, sorteios=500,
+                                     incerteza_escala=0, incerteza_controle=0)
+    probabilidades = resultado.probabilidades.dropna(subset=list(AVALIACOES))
+    assert len(probabilidades) > 0
+    linhas = mapa_original.loc[probabilidades.index]
+    niveis = (linhas['gp'].astype(float) * linhas['gi'].astype(float)
+              * linhas['nivel_controle'].map(CONTROLES_PESOS).astype(float))
+
+    esperado = pd.DataFrame(0.0, index=probabilidades.index, columns=list(AVALIACOES))
+    for indice, nivel in niveis.items():
+        esperado.loc[indice, get_avaliacao_from_nivel(nivel)] = 1.0
+    pd.testing.assert_frame_equal(probabilidades[list(AVALIACOES)], esperado)
+    np.testing.assert_allclose(probabilidades['nivel_rr_medio'], niveis)
@@ -0,0 +1,173 @@
+"""
+Cache das planilhas já processadas, indexado pelo conteúdo do arquivo.
+
+Os DataFrames limpos ficam em memória (LRU com expiração por TTL) e também
+em um armazenamento colunar em disco (Parquet), de modo que um novo upload do
+mesmo arquivo - mesmo depois de reiniciar o servidor - não passe de novo pela
+leitura do Excel.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from cachetools import TTLCache
+
+# --- Configuração (pode ser sobrescrita por variáveis de ambiente) ---
+CACHE_DIR = os.environ.get(
+    "PAINEL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_painel")
+)
+CACHE_MAX_ITENS = int(os.environ.get("PAINEL_CACHE_MAX_ITENS", "32"))
+CACHE_TTL_SEGUNDOS = int(os.environ.get("PAINEL_CACHE_TTL", "3600"))
+CACHE_MAX_DISCO = int(os.environ.get("PAINEL_CACHE_MAX_DISCO", "64"))
+
+# Incrementar sempre que a limpeza dos dados mudar, para invalidar o cache em disco
+CACHE_VERSAO = 3
+
+
+def content_hash(file_bytes):
+    """ SHA-256 (hex) do conteúdo bruto do arquivo. """
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def make_cache_key(file_bytes, kind, schema):
+    """
+    Monta a chave do cache: hash do conteúdo + tipo de carga + assinatura do
+    esquema (abas, linhas de cabeçalho e listas de colunas).
+    """
+    schema_json = json.dumps([CACHE_VERSAO, kind, schema], ensure_ascii=False, default=str)
+    schema_hash = hashlib.sha256(schema_json.encode("utf-8")).hexdigest()[:16]
+    return f"{kind}-{content_hash(file_bytes)}-{schema_hash}"
+
+
+def arrow_safe(df):
+    """
+    Colunas 'object' com tipos misturados (ex.: datas e textos na mesma coluna)
+    não têm representação em Arrow; essas são gravadas como texto.
+    """
+    df = df.copy(deep=False)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+def from_arrow(df):
+    """ Restaura NaN (e não None) nas colunas de texto, como o pd.read_excel entrega. """
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+class WorkbookCache:
+    """ Cache em dois níveis (memória + Parquet em disco) para os DataFrames de cada planilha. """
+
+    def __init__(self, directory=CACHE_DIR, maxsize=CACHE_MAX_ITENS, ttl=CACHE_TTL_SEGUNDOS,
+                 max_disk_entries=CACHE_MAX_DISCO):
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.stats = {"hits_memoria": 0, "hits_disco": 0, "misses": 0}
+
+    def get(self, key):
+        """ Devolve o dicionário {nome: DataFrame} da chave, ou None se não houver cache. """
+        with self._lock:
+            frames = self._memory.get(key)
+            if frames is not None:
+                self.stats["hits_memoria"] += 1
+                return frames
+
+        frames = self._read_disk(key)
+        with self._lock:
+            if frames is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits_disco"] += 1
+            self._memory[key] = frames
+        return frames
+
+    def put(self, key, frames):
+        """ Guarda os DataFrames já limpos em memória e no disco. """
+        with self._lock:
+            self._memory[key] = frames
+        try:
+            self._write_disk(key, frames)
+        except (OSError, pa.ArrowException):
+            # O cache em disco é só uma otimização: falhas de escrita não derrubam o app
+            pass
+
+    def discard(self, key):
+        """ Remove a chave apenas da memória (a cópia em disco é mantida). """
+        with self._lock:
+            self._memory.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # --- Armazenamento em disco ---
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_disk(self, key):
+        entry_dir = self._entry_dir(key)
+        manifest_path = os.path.join(entry_dir, "manifest.json")
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                names = json.load(f)["frames"]
+            frames = {
+                name: from_arrow(pd.read_parquet(os.path.join(entry_dir, f"{name}.parquet")))
+                for name in names
+            }
+        except (OSError, ValueError, KeyError, pa.ArrowException):
+            return None
+        os.utime(entry_dir)  # marca como usado recentemente (para a poda por idade)
+        return frames
+
+    def _write_disk(self, key, frames):
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            for name, df in frames.items():
+                arrow_safe(df).to_parquet(os.path.join(tmp_dir, f"{name}.parquet"), engine="pyarrow")
+            with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump({"frames": list(frames)}, f)
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Outra sessão pode ter gravado a mesma chave ao mesmo tempo
+            if not os.path.isdir(entry_dir):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """ Mantém no disco apenas as CACHE_MAX_DISCO entradas usadas mais recentemente. """
+        entries = [
+            entry for entry in os.scandir(self.directory)
+            if entry.is_dir() and not entry.name.startswith(".tmp-")
+        ]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# Instância única por processo, compartilhada por todas as sessões do Streamlit
+WORKBOOK_CACHE = WorkbookCache()
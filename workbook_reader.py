@@ -0,0 +1,751 @@
+"""
+Leitura das planilhas .xlsx em uma única passada.
+
+A leitura passa por backends intercambiáveis (openpyxl em streaming, XML
+direto e python-calamine, se instalado), escolhidos pelo tamanho do arquivo.
+
+Também oferece uma sondagem rápida do esquema (probe_workbook), que olha só a
+lista de abas e a linha de cabeçalho diretamente no XML do arquivo, para
+recusar planilhas erradas antes da leitura completa.
+
+O pd.read_excel abre (e descompacta) o arquivo a cada chamada e reconstrói a
+tabela de textos compartilhados. Aqui o arquivo é aberto uma única vez, em modo
+somente leitura (streaming), e todas as abas necessárias saem dessa abertura.
+As linhas são lidas até encontrar uma sequência de linhas vazias, em vez de
+percorrer toda a área "usada" da aba.
+"""
+import datetime
+import functools
+import html
+import importlib.util
+import io
+import os
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass, field
+from xml.etree.ElementTree import fromstring, iterparse
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, from_ISO8601, from_excel
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+from perf_trace import PERF
+
+# Quantidade de linhas vazias seguidas (após o cabeçalho) que encerra a leitura da aba
+MAX_LINHAS_VAZIAS = 20
+
+
+class SheetNotFoundError(ValueError):
+    """ A aba pedida não existe no arquivo. """
+
+    def __init__(self, sheet_name):
+        super().__init__(f"Worksheet named '{sheet_name}' not found")
+        self.sheet_name = sheet_name
+
+
+def open_source(source):
+    """ Normaliza o que vem do upload (UploadedFile, bytes, caminho) para algo legível pelo openpyxl. """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if hasattr(source, "getvalue"):
+        return io.BytesIO(source.getvalue())
+    source.seek(0)
+    return source
+
+
+def _convert_cell(cell):
+    """ Mesma conversão de células feita pelo pd.read_excel (engine openpyxl). """
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return float("nan")
+    elif cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+
+def rows_to_frame(data, header):
+    """
+    Transforma as linhas já lidas (listas de valores) em DataFrame, usando o
+    mesmo parser do pd.read_excel para manter tipos e nomes de coluna idênticos.
+    """
+    if not data:
+        return pd.DataFrame()
+    width = max(len(row) for row in data)
+    data = [row + [""] * (width - len(row)) for row in data]
+    try:
+        return TextParser(data, header=header, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
+def trim_rows(rows, header, blank_run):
+    """
+    Corta as células vazias do fim de cada linha e encerra a leitura na
+    primeira sequência de `blank_run` linhas vazias depois do cabeçalho.
+    """
+    data = []
+    last_row_with_data = -1
+    blanks = 0
+    for row_number, row in enumerate(rows):
+        while row and row[-1] == "":
+            row.pop()
+        if row:
+            last_row_with_data = row_number
+            blanks = 0
+        elif row_number > header:
+            blanks += 1
+            if blanks >= blank_run:
+                break
+        data.append(row)
+    return data[:last_row_with_data + 1]
+
+
+# ==================================================================
+# BACKENDS DE LEITURA
+# ==================================================================
+# Todos os backends entregam as linhas de cada aba no mesmo formato do
+# pd.read_excel (engine openpyxl): "" para célula vazia, NaN para erro e
+# inteiro para número sem casas decimais. A conversão final para DataFrame é
+# comum a todos (rows_to_frame), o que garante resultados idênticos.
+
+BACKENDS = {}
+
+# "auto" escolhe pelo tamanho do arquivo; pode ser fixado por variável de ambiente
+BACKEND_PADRAO = os.environ.get("PAINEL_EXCEL_BACKEND", "auto")
+
+# Abaixo deste tamanho o custo fixo dos backends rápidos não compensa
+LIMITE_ARQUIVO_PEQUENO = 512 * 1024
+
+
+def register_backend(cls):
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+class ExcelBackend:
+    """ Interface dos leitores de planilha. """
+    name = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def read_rows(self, source, sheet_headers, blank_run):
+        """ Devolve {aba: linhas}, já cortadas por trim_rows. """
+        raise NotImplementedError
+
+
+@register_backend
+class OpenpyxlBackend(ExcelBackend):
+    """ openpyxl em modo somente leitura (streaming): o mais tolerante a arquivos fora do padrão. """
+    name = "openpyxl"
+
+    def read_rows(self, source, sheet_headers, blank_run):
+        wb = load_workbook(open_source(source), read_only=True, data_only=True, keep_links=False)
+        try:
+            for sheet_name in sheet_headers:
+                if sheet_name not in wb.sheetnames:
+                    raise SheetNotFoundError(sheet_name)
+            data = {}
+            for sheet_name, header in sheet_headers.items():
+                ws = wb[sheet_name]
+                ws.reset_dimensions()
+                rows = ([_convert_cell(cell) for cell in row] for row in ws.rows)
+                data[sheet_name] = trim_rows(rows, header, blank_run)
+            return data
+        finally:
+            wb.close()
+
+
+@register_backend
+class XmlBackend(ExcelBackend):
+    """
+    Leitura direta do XML das abas, sem criar objetos de célula do openpyxl.
+    Datas seguem as mesmas regras do openpyxl (formatos de número do styles.xml
+    e época 1900/1904 do workbook.xml).
+    """
+    name = "xml"
+
+    def read_rows(self, source, sheet_headers, blank_run):
+        with open_xlsx(source) as zf:
+            parts = sheet_parts(zf)
+            for sheet_name in sheet_headers:
+                if parts.get(sheet_name) not in zf.namelist():
+                    raise SheetNotFoundError(sheet_name)
+            shared = read_shared_strings(zf)
+            date_styles, timedelta_styles = _date_styles(zf)
+            epoch = _workbook_epoch(zf)
+            data = {}
+            for sheet_name, header in sheet_headers.items():
+                with zf.open(parts[sheet_name]) as f:
+                    rows = _xml_rows(f, shared, date_styles, timedelta_styles, epoch)
+                    data[sheet_name] = trim_rows(rows, header, blank_run)
+            return data
+
+
+@register_backend
+class CalamineBackend(ExcelBackend):
+    """ python-calamine (leitor em Rust), usado quando estiver instalado. """
+    name = "calamine"
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("python_calamine") is not None
+
+    def read_rows(self, source, sheet_headers, blank_run):
+        from python_calamine import CalamineWorkbook
+
+        wb = CalamineWorkbook.from_filelike(io.BytesIO(_source_bytes(source)))
+        try:
+            for sheet_name in sheet_headers:
+                if sheet_name not in wb.sheet_names:
+                    raise SheetNotFoundError(sheet_name)
+            data = {}
+            for sheet_name, header in sheet_headers.items():
+                sheet = wb.get_sheet_by_name(sheet_name)
+                # iter_rows começa na linha 1, mas só a partir da primeira coluna usada
+                offset = [""] * sheet.start[1] if sheet.start else []
+                rows = (offset + [_convert_calamine(value) for value in row] for row in sheet.iter_rows())
+                data[sheet_name] = trim_rows(rows, header, blank_run)
+            return data
+        finally:
+            wb.close()
+
+
+def _convert_calamine(value):
+    if isinstance(value, float):
+        val = int(value)
+        return val if val == value else value
+    # O openpyxl entrega datas sempre como datetime
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime(value.year, value.month, value.day)
+    return value
+
+
+def _source_bytes(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+
+def source_size(source):
+    """ Tamanho do arquivo em bytes, sem lê-lo quando possível. """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if getattr(source, "size", None) is not None:
+        return source.size
+    return len(_source_bytes(source))
+
+
+def select_backend(source, backend=None):
+    """
+    Escolhe o backend de leitura. `backend` (ou PAINEL_EXCEL_BACKEND) força
+    um backend pelo nome; em "auto", arquivos pequenos usam openpyxl e os
+    maiores usam o backend rápido disponível (calamine, senão XML direto).
+    """
+    name = backend or BACKEND_PADRAO
+    if name != "auto":
+        if name not in BACKENDS or not BACKENDS[name].available():
+            raise ValueError(f"Backend de leitura desconhecido ou não instalado: '{name}'")
+        return BACKENDS[name]()
+    if source_size(source) < LIMITE_ARQUIVO_PEQUENO:
+        return OpenpyxlBackend()
+    for name in ("calamine", "xml"):
+        if BACKENDS[name].available():
+            return BACKENDS[name]()
+    return OpenpyxlBackend()
+
+
+def available_backends():
+    return [name for name, cls in BACKENDS.items() if cls.available()]
+
+
+def read_sheets(source, sheet_headers, blank_run=MAX_LINHAS_VAZIAS, backend=None):
+    """
+    Lê várias abas de uma só vez.
+
+    `sheet_headers` mapeia o nome de cada aba para a linha do cabeçalho
+    (índice 0, como o parâmetro `header` do pd.read_excel). Devolve um
+    dicionário {aba: DataFrame}; levanta SheetNotFoundError se faltar alguma aba.
+    """
+    leitor = select_backend(source, backend)
+    with PERF.span("leitura_xlsx", backend=leitor.name, abas=len(sheet_headers)):
+        data = leitor.read_rows(source, sheet_headers, blank_run)
+    frames = {}
+    for sheet_name, header in sheet_headers.items():
+        with PERF.span("montagem_dataframe", aba=sheet_name, linhas=len(data[sheet_name])):
+            frames[sheet_name] = rows_to_frame(data[sheet_name], header)
+    return frames
+
+
+def check_backend_parity(source, sheet_headers, backends=None):
+    """
+    Lê o arquivo com cada backend disponível e confere se os DataFrames são
+    idênticos. Devolve {backend: [abas divergentes]}; lista vazia = paridade.
+    """
+    backends = backends or available_backends()
+    reference = read_sheets(source, sheet_headers, backend=backends[0])
+    result = {backends[0]: []}
+    for name in backends[1:]:
+        frames = read_sheets(source, sheet_headers, backend=name)
+        result[name] = []
+        for sheet_name, df in frames.items():
+            try:
+                pd.testing.assert_frame_equal(df, reference[sheet_name])
+            except AssertionError:
+                result[name].append(sheet_name)
+    return result
+
+
+# ==================================================================
+# SONDAGEM DO ESQUEMA (SÓ LISTA DE ABAS E CABEÇALHO)
+# ==================================================================
+
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_SI_START = re.compile(rb"<si[\s>/]")
+
+
+def _local(tag):
+    """ Nome da tag sem o namespace (cobre também o formato 'Strict' do OOXML). """
+    return tag.rsplit("}", 1)[-1]
+
+
+def _column_number(letters):
+    number = 0
+    for char in letters:
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+def open_xlsx(source):
+    """ Abre o .xlsx como arquivo zip (o formato é um zip de XMLs). """
+    return zipfile.ZipFile(open_source(source))
+
+
+def sheet_parts(zf):
+    """ Mapeia o nome de cada aba para o XML correspondente dentro do zip. """
+    rels = {}
+    with zf.open("xl/_rels/workbook.xml.rels") as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == "Relationship":
+                target = elem.get("Target")
+                if target.startswith("/"):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join("xl", target))
+                rels[elem.get("Id")] = target
+    parts = {}
+    with zf.open("xl/workbook.xml") as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == "sheet":
+                rel_id = elem.get(f"{_REL_NS}id") or elem.get("id")
+                parts[elem.get("name")] = rels.get(rel_id)
+    return parts
+
+
+def _shared_string_text(elem):
+    """ Texto de um <si>: junta os trechos <t>, ignorando a transcrição fonética (<rPh>). """
+    parts = []
+    for child in elem:
+        tag = _local(child.tag)
+        if tag == "t":
+            parts.append(child.text or "")
+        elif tag == "r":
+            parts.extend(t.text or "" for t in child if _local(t.tag) == "t")
+    return "".join(parts)
+
+
+def read_shared_strings(zf):
+    """ Lê toda a tabela de textos compartilhados do arquivo. """
+    strings = []
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return strings
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == "si":
+                strings.append(_shared_string_text(elem))
+                elem.clear()
+    return strings
+
+
+def read_shared_strings_at(zf, indexes):
+    """
+    Lê apenas as entradas pedidas da tabela de textos compartilhados.
+    As posições dos <si> são localizadas por varredura dos bytes, e só as
+    entradas necessárias passam pelo parser de XML.
+    """
+    wanted = set(indexes)
+    if not wanted or "xl/sharedStrings.xml" not in zf.namelist():
+        return {}
+    data = zf.read("xl/sharedStrings.xml")
+    found = {}
+    for position, match in enumerate(_SI_START.finditer(data)):
+        if position not in wanted:
+            continue
+        if match.group().endswith(b"/"):
+            found[position] = ""
+        else:
+            end = data.find(b"</si>", match.start()) + len(b"</si>")
+            found[position] = _shared_string_text(fromstring(data[match.start():end]))
+        if len(found) == len(wanted):
+            break
+    if not found:
+        # Prefixo de namespace nas tags (<x:si>): usa a leitura completa
+        strings = read_shared_strings(zf)
+        found = {index: strings[index] for index in wanted if index < len(strings)}
+    return found
+
+
+def _read_top_rows(zf, part, last_row):
+    """
+    Lê do XML da aba apenas as linhas 1..last_row (numeração do Excel) e a
+    referência <dimension>. Devolve ({linha: {coluna: (tipo, valor)}}, ultima_coluna_dimensao).
+    """
+    rows = {}
+    dimension_cols = None
+    cell_ref = cell_type = value = None
+    with zf.open(part) as f:
+        for event, elem in iterparse(f, events=("start", "end")):
+            tag = _local(elem.tag)
+            if event == "start":
+                if tag == "row" and elem.get("r") and int(elem.get("r")) > last_row:
+                    break
+                if tag == "c":
+                    cell_ref, cell_type, value = elem.get("r"), elem.get("t", "n"), None
+                continue
+            if tag == "dimension":
+                last_ref = elem.get("ref", "").split(":")[-1]
+                match = _CELL_REF.match(last_ref)
+                dimension_cols = _column_number(match.group(1)) if match else None
+            elif tag in ("v", "t") and cell_ref is not None:
+                value = (value or "") + (elem.text or "")
+            elif tag == "c" and cell_ref is not None:
+                match = _CELL_REF.match(cell_ref)
+                if match and value not in (None, ""):
+                    row_number = int(match.group(2))
+                    rows.setdefault(row_number, {})[_column_number(match.group(1))] = (cell_type, value)
+                cell_ref = None
+            elif tag == "row":
+                elem.clear()
+    return rows, dimension_cols
+
+
+@dataclass
+class SheetReport:
+    """ Resultado da sondagem de uma aba. """
+    sheet_name: str
+    expected_columns: int
+    found: bool = True
+    header: list = field(default_factory=list)
+    min_columns: int = 0
+    max_columns: int = None
+
+    @property
+    def columns_ok(self):
+        # A leitura completa encontra entre min_columns e max_columns colunas
+        if self.min_columns > self.expected_columns:
+            return False
+        return self.max_columns is None or self.max_columns >= self.expected_columns
+
+    @property
+    def ok(self):
+        return self.found and self.columns_ok
+
+    @property
+    def found_columns(self):
+        if self.min_columns > self.expected_columns or self.max_columns is None:
+            return self.min_columns
+        return self.max_columns
+
+
+@dataclass
+class SchemaReport:
+    """ Relatório da sondagem: abas ausentes e divergências de colunas. """
+    sheets: list
+
+    @property
+    def ok(self):
+        return all(sheet.ok for sheet in self.sheets)
+
+    @property
+    def missing_sheets(self):
+        return [sheet.sheet_name for sheet in self.sheets if not sheet.found]
+
+    @property
+    def column_mismatches(self):
+        return [sheet for sheet in self.sheets if sheet.found and not sheet.columns_ok]
+
+
+def probe_workbook(source, expected):
+    """
+    Confere rapidamente se o arquivo tem as abas e o número de colunas esperados.
+
+    `expected` mapeia o nome da aba para (linha_do_cabecalho, numero_de_colunas),
+    com a linha no mesmo formato do parâmetro `header` do pd.read_excel. Só a
+    lista de abas e as linhas até o cabeçalho são lidas. Como as linhas de dados
+    não são lidas, a largura é estimada por um intervalo: o mínimo vem das linhas
+    lidas e o máximo da referência <dimension> da aba. A sondagem só recusa o que
+    a leitura completa certamente recusaria.
+    """
+    with open_xlsx(source) as zf:
+        parts = sheet_parts(zf)
+        top_rows = {}
+        for sheet_name, (header, _) in expected.items():
+            if parts.get(sheet_name) in zf.namelist():
+                top_rows[sheet_name] = _read_top_rows(zf, parts[sheet_name], header + 1)
+
+        # Textos compartilhados: só as entradas usadas nas linhas lidas
+        shared = read_shared_strings_at(zf, [
+            int(value)
+            for rows, _ in top_rows.values() for cells in rows.values()
+            for cell_type, value in cells.values() if cell_type == "s"
+        ])
+
+    reports = []
+    for sheet_name, (header, n_columns) in expected.items():
+        if sheet_name not in top_rows:
+            reports.append(SheetReport(sheet_name, n_columns, found=False))
+            continue
+        rows, dimension_cols = top_rows[sheet_name]
+        min_columns = max((max(cells) for cells in rows.values()), default=0)
+        header_cells = rows.get(header + 1, {})
+        header_texts = [
+            shared.get(int(value), "") if cell_type == "s" else value
+            for _, (cell_type, value) in sorted(header_cells.items())
+        ]
+        # Uma <dimension> menor que as linhas já vistas está desatualizada: é ignorada
+        max_columns = dimension_cols if dimension_cols and dimension_cols >= min_columns else None
+        reports.append(SheetReport(sheet_name, n_columns, header=header_texts,
+                                   min_columns=min_columns, max_columns=max_columns))
+    return SchemaReport(reports)
+
+
+# ==================================================================
+# LEITURA DIRETA DO XML (BACKEND "xml")
+# ==================================================================
+
+def _workbook_epoch(zf):
+    """ Época das datas do arquivo (sistema 1900 ou 1904, definido no workbook.xml). """
+    with zf.open("xl/workbook.xml") as f:
+        for _, elem in iterparse(f):
+            if _local(elem.tag) == "workbookPr":
+                if elem.get("date1904", "").lower() in ("1", "true"):
+                    return MAC_EPOCH
+                break
+    return WINDOWS_EPOCH
+
+
+def _date_styles(zf):
+    """ Índices de estilo que o openpyxl trata como data e como duração. """
+    if "xl/styles.xml" not in zf.namelist():
+        return set(), set()
+    stylesheet = Stylesheet.from_tree(fromstring(zf.read("xl/styles.xml")))
+    return stylesheet.date_formats, stylesheet.timedelta_formats
+
+
+def _cell_value(cell_type, value, style, shared, date_styles, timedelta_styles, epoch):
+    """ Converte o conteúdo de um <c> exatamente como openpyxl + pd.read_excel. """
+    if cell_type == "n":
+        number = float(value) if ("." in value or "e" in value or "E" in value) else int(value)
+        if style in date_styles:
+            try:
+                return from_excel(number, epoch, timedelta=style in timedelta_styles)
+            except (OverflowError, ValueError):
+                return float("nan")
+        as_int = int(number)
+        return as_int if as_int == number else float(number)
+    if cell_type == "s":
+        return shared[int(value)]
+    if cell_type == "b":
+        return bool(int(value))
+    if cell_type == "e":
+        return float("nan")
+    if cell_type == "d":
+        return from_ISO8601(value)
+    return value  # "str" e "inlineStr"
+
+
+_ROW_START = re.compile(rb"<row\b([^>]*?)(/?)>")
+_CELL_START = re.compile(rb"<c\b([^>]*?)(/?)>")
+_ATTR = re.compile(rb"\s(r|t|s)=\"([^\"]*)\"")
+_INLINE_TEXT = re.compile(rb"<t(?:\s[^>]*)?>([^<]*)</t>")
+_PHONETIC = re.compile(rb"<rPh\b.*?</rPh>", re.S)
+_CHUNK_SIZE = 1 << 20
+
+
+@functools.lru_cache(maxsize=None)
+def _column_of(letters):
+    return _column_number(letters.decode())
+
+
+def _split_rows(buffer, end):
+    """ Gera (atributos, conteúdo) de cada <row> completo em buffer[:end]. """
+    position = 0
+    while True:
+        match = _ROW_START.search(buffer, position, end)
+        if match is None:
+            return
+        if match.group(2):
+            position = match.end()
+            yield match.group(1), b""
+        else:
+            close = buffer.find(b"</row>", match.end(), end)
+            position = close + len(b"</row>")
+            yield match.group(1), buffer[match.end():close]
+
+
+def _xml_text(raw):
+    text = raw.decode("utf-8")
+    return html.unescape(text) if "&" in text else text
+
+
+def _xml_rows(f, shared, date_styles, timedelta_styles, epoch):
+    """
+    Gera as linhas da aba (a partir da linha 1 e da coluna A), preenchendo
+    lacunas. O XML é varrido em blocos com expressões regulares sobre os bytes,
+    o que evita criar um objeto por tag; arquivos com prefixo de namespace nas
+    tags (<x:row>) usam o parser de XML.
+    """
+    buffer = f.read(_CHUNK_SIZE)
+    if b"<sheetData" not in buffer and b"<row" not in buffer:
+        # Cabeçalho longo ou tags com prefixo: confere com o parser de XML
+        f.seek(0)
+        yield from _xml_rows_iterparse(f, shared, date_styles, timedelta_styles, epoch)
+        return
+
+    next_row = 1
+    row_number = 0
+    while True:
+        chunk = f.read(_CHUNK_SIZE)
+        # Só processa até a última linha completa do bloco
+        end = len(buffer) if not chunk else buffer.rfind(b"</row>") + len(b"</row>")
+        if chunk and end < len(b"</row>"):
+            buffer += chunk
+            continue
+        for row_attrs, row_body in _split_rows(buffer, end):
+            row_attrs = dict(_ATTR.findall(row_attrs))
+            row_number = int(row_attrs[b"r"]) if b"r" in row_attrs else row_number + 1
+            # Linhas ausentes no XML são linhas vazias na planilha
+            while next_row < row_number:
+                next_row += 1
+                yield []
+            next_row += 1
+            row = []
+            for cell_match in _CELL_START.finditer(row_body):
+                attrs = dict(_ATTR.findall(cell_match.group(1)))
+                ref = attrs.get(b"r")
+                column = _column_of(ref.rstrip(b"0123456789")) if ref else len(row) + 1
+                cell_type = attrs.get(b"t", b"n")
+                converted = ""
+                if not cell_match.group(2):  # <c .../> é célula vazia (só com estilo)
+                    body_start = cell_match.end()
+                    body_end = row_body.find(b"</c>", body_start)
+                    if cell_type == b"inlineStr":
+                        body = _PHONETIC.sub(b"", row_body[body_start:body_end])
+                        converted = "".join(_xml_text(t) for t in _INLINE_TEXT.findall(body))
+                    else:
+                        value_start = row_body.find(b"<v>", body_start, body_end)
+                        if value_start >= 0:
+                            raw = row_body[value_start + 3:row_body.find(b"</v>", value_start)]
+                            if raw and cell_type == b"s":
+                                converted = shared[int(raw)]
+                            elif raw:
+                                converted = _cell_value(cell_type.decode(), _xml_text(raw), int(attrs.get(b"s", 0)),
+                                                        shared, date_styles, timedelta_styles, epoch)
+                if column > len(row) + 1:
+                    row.extend([""] * (column - len(row) - 1))
+                row.append(converted)
+            yield row
+        if not chunk:
+            return
+        buffer = buffer[end:] + chunk
+
+
+def _xml_rows_iterparse(f, shared, date_styles, timedelta_styles, epoch):
+    """ Mesmo resultado de _xml_rows, usando o parser de XML (caminho mais lento e mais tolerante). """
+    next_row = 1
+    row_number = 0
+    row = []
+    column = 0
+    cell_ref = cell_type = style = value = None
+    inline = []
+    for event, elem in iterparse(f, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            if tag == "row":
+                row_number = int(elem.get("r")) if elem.get("r") else row_number + 1
+                row = []
+                column = 0
+            elif tag == "c":
+                cell_ref = elem.get("r")
+                cell_type = elem.get("t", "n")
+                style = int(elem.get("s", 0))
+                value = None
+                inline = []
+            continue
+        if tag == "v":
+            value = elem.text
+        elif tag == "t" and cell_type == "inlineStr":
+            inline.append(elem.text or "")
+        elif tag == "rPh":
+            # Transcrição fonética não faz parte do texto da célula
+            inline = inline[:-1]
+        elif tag == "c":
+            match = _CELL_REF.match(cell_ref) if cell_ref else None
+            column = _column_number(match.group(1)) if match else column + 1
+            if cell_type == "inlineStr":
+                converted = "".join(inline) if inline else ""
+            elif value:
+                converted = _cell_value(cell_type, value, style, shared, date_styles, timedelta_styles, epoch)
+            else:
+                converted = ""
+            if column > len(row) + 1:
+                row.extend([""] * (column - len(row) - 1))
+            row.append(converted)
+        elif tag == "row":
+            # Linhas ausentes no XML são linhas vazias na planilha
+            while next_row < row_number:
+                next_row += 1
+                yield []
+            next_row += 1
+            yield row
+            elem.clear()
+
+
+if __name__ == "__main__":
+    # Conferência de paridade entre backends:
+    #   python workbook_reader.py arquivo.xlsx "Mapa de Riscos:9" "Plano de Respostas:8"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Confere se todos os backends de leitura produzem os mesmos dados.")
+    parser.add_argument("arquivo")
+    parser.add_argument("abas", nargs="+", help="aba:linha_do_cabecalho (índice 0)")
+    args = parser.parse_args()
+    sheet_headers = {}
+    for spec in args.abas:
+        sheet_name, header = spec.rsplit(":", 1)
+        sheet_headers[sheet_name] = int(header)
+    result = check_backend_parity(args.arquivo, sheet_headers)
+    for name, divergent in result.items():
+        print(f"{name}: {'OK' if not divergent else 'DIVERGE em ' + ', '.join(divergent)}")
+    raise SystemExit(1 if any(result.values()) else 0)